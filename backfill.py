@@ -0,0 +1,39 @@
+"""Archive historical Synoptic observations as Parquet, one file per station and month.
+
+    python backfill.py FPS KSLC --start 2024-03 --end 2024-05 [--archive archive] [--workers 4] [--force]
+
+Needs pyarrow (`pip install soarbot[archive]`). Station-months already in the
+archive are skipped, so an interrupted backfill resumes by running it again.
+"""
+import argparse
+import logging
+
+from utils.archive import ARCHIVE_DIR, ObservationArchive, backfill, months
+from utils.providers import FETCH_WORKERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("stations", nargs="+", help="Synoptic station ids")
+    parser.add_argument("--start", required=True, help="first month to archive (YYYY-MM)")
+    parser.add_argument("--end", required=True, help="last month to archive, inclusive (YYYY-MM)")
+    parser.add_argument("--archive", default=ARCHIVE_DIR, help="archive directory")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS, help="concurrent requests")
+    parser.add_argument("--token", help="Synoptic API token (default: the configured token)")
+    parser.add_argument("--force", action="store_true", help="fetch months that are already archived again")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    stats = backfill(
+        ObservationArchive(args.archive),
+        args.stations,
+        months(args.start, args.end),
+        token=args.token,
+        max_workers=args.workers,
+        force=args.force,
+    )
+    print(f"{stats['requests']} requests ({stats['failed']} failed), {stats['rows']} observations archived")
+
+
+if __name__ == "__main__":
+    main()
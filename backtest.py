@@ -0,0 +1,71 @@
+"""Replay archived observations through the notification rules to see how often each subscription would fire.
+
+    python backtest.py --start 2024-04-01 --end 2024-10-01 [--rows .cache/config_snapshot.json]
+        [--archive archive] [--set wind_speed_min=10 --set window_readings=4] [--out backtest]
+
+Subscriptions come from a saved config snapshot (or any JSON list of
+user_configurations_with_stations rows); `--set` overrides a column on every
+row to try other thresholds. Observations come from the archive written by
+backfill.py. Writes summary.csv and notifications.csv to `--out`.
+"""
+import argparse
+import json
+import logging
+import os
+
+import pandas as pd
+
+from utils.archive import ARCHIVE_DIR, ObservationArchive
+from utils.backtest import replay
+from utils.config_snapshot import CACHE_DIR
+from utils.records import build_user_configs
+from utils.sun_times import DEFAULT_TIMEZONE
+
+
+def load_rows(path, overrides):
+    with open(path) as f:
+        rows = json.load(f)
+    if isinstance(rows, dict):
+        rows = rows["rows"]  # a ConfigSnapshotCache file
+    for override in overrides:
+        column, value = override.split("=", 1)
+        for row in rows:
+            row[column] = json.loads(value)
+    return [row for row in rows if row.get("notifications_enabled", True)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--start", required=True, help="first day to replay (YYYY-MM-DD, UTC)")
+    parser.add_argument("--end", required=True, help="day to stop before (YYYY-MM-DD, UTC)")
+    parser.add_argument("--rows", default=os.path.join(CACHE_DIR, "config_snapshot.json"),
+                        help="JSON user_configurations_with_stations rows or config snapshot")
+    parser.add_argument("--archive", default=ARCHIVE_DIR, help="archive directory")
+    parser.add_argument("--timezone", default=DEFAULT_TIMEZONE, help="timezone of the archived observation times")
+    parser.add_argument("--set", action="append", default=[], metavar="COLUMN=VALUE",
+                        help="override a column on every row (JSON value)")
+    parser.add_argument("--out", default="backtest", help="directory for summary.csv and notifications.csv")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    users = build_user_configs(load_rows(args.rows, args.set))
+    archive = ObservationArchive(args.archive)
+    # Pad by a day so local times around the UTC bounds and the first lookback are covered
+    start, end = pd.Timestamp(args.start), pd.Timestamp(args.end)
+    station_ids = {subscription.station_id for user in users for subscription in user.stations}
+    observations = {
+        station_id: archive.load(station_id, start - pd.Timedelta(days=1), end + pd.Timedelta(days=1))
+        for station_id in station_ids
+    }
+
+    result = replay(users, observations, start, end, args.timezone)
+    os.makedirs(args.out, exist_ok=True)
+    result.summary.to_csv(os.path.join(args.out, "summary.csv"), index=False)
+    result.notifications.to_csv(os.path.join(args.out, "notifications.csv"), index=False)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(result.summary.drop(columns=["first_notification", "last_notification"]).to_string(index=False))
+    print(f"{len(result.notifications)} notifications to {result.notifications['user_id'].nunique()} users")
+
+
+if __name__ == "__main__":
+    main()
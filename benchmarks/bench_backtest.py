@@ -0,0 +1,99 @@
+"""Time utils.backtest.replay over synthetic archived seasons.
+
+    python benchmarks/bench_backtest.py [--days 365] [--stations 50] [--users 1000] [--stations-per-user 3]
+
+Each station gets 5-minute observations with a daily wind cycle plus noise and
+random dropouts; users pick stations and thresholds at random from a few
+common settings, as real subscribers tend to.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.backtest import replay  # noqa: E402
+from utils.records import build_user_configs  # noqa: E402
+
+START = pd.Timestamp("2024-01-01")
+
+
+def synthetic_observations(stations, days, rng):
+    times = pd.date_range(START - pd.Timedelta(days=1), periods=(days + 2) * 288, freq="5min")
+    cycle = np.sin((times.hour + times.minute / 60 - 9) / 24 * 2 * np.pi)
+    observations = {}
+    for i in range(stations):
+        speed = np.clip(7 + 8 * cycle + rng.normal(0, 3, len(times)), 0, None)
+        keep = rng.random(len(times)) > 0.03
+        observations[f"ST{i:03d}"] = pd.DataFrame(
+            {
+                "date_time": times[keep],
+                "wind_speed_set_1": speed[keep],
+                "wind_gust_set_1": (speed + rng.exponential(3, len(times)))[keep],
+                "wind_direction_set_1": (rng.normal(160 + 60 * cycle, 30, len(times)) % 360)[keep],
+                "precip_accum_five_minute_set_1": np.where(rng.random(len(times)) < 0.02, 0.01, 0.0)[keep],
+            }
+        )
+    return observations
+
+
+def synthetic_rows(users, stations, stations_per_user, rng):
+    rows = []
+    for user in range(users):
+        picks = rng.choice(stations, size=min(stations_per_user, stations), replace=False)
+        for priority, station in enumerate(picks, start=1):
+            rows.append(
+                {
+                    "user_id": f"00000000-0000-0000-0000-{user:012d}",
+                    "telegram_chat_id": str(100000000 + user),
+                    "notification_cooldown_hours": float(rng.choice([2, 4, 8])),
+                    "timezone": "America/Denver",
+                    "enable_winter_midday": bool(rng.random() < 0.8),
+                    "quiet_hours_start": "21:00" if rng.random() < 0.5 else None,
+                    "quiet_hours_end": "07:00",
+                    "station_id": f"ST{station:03d}",
+                    "station_name": f"ST{station:03d}",
+                    "latitude": 40.5247,
+                    "longitude": -111.8638,
+                    "api_config": {"lookback_minutes": 120},
+                    "wind_speed_min": float(rng.choice([6, 8.5, 10])),
+                    "wind_speed_max": float(rng.choice([14, 16, 20])),
+                    "wind_direction_min": 130,
+                    "wind_direction_max": 180,
+                    "max_gust_differential": float(rng.choice([4, 5, 7])),
+                    "priority": priority,
+                    "station_enabled": True,
+                    "window_readings": int(rng.choice([2, 3, 4])),
+                    "release_readings": int(rng.choice([1, 2])),
+                }
+            )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--stations", type=int, default=50)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--stations-per-user", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    observations = synthetic_observations(args.stations, args.days, rng)
+    users = build_user_configs(synthetic_rows(args.users, args.stations, args.stations_per_user, rng))
+
+    start = time.perf_counter()
+    result = replay(users, observations, START, START + pd.Timedelta(days=args.days))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.days} days x {args.stations} stations x {args.users} users "
+        f"({len(result.summary)} subscriptions): {elapsed:.2f} s, {len(result.notifications)} notifications"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Time the e-ink display path stage by stage on a recorded fixture.
+
+    python benchmarks/bench_display.py [--repeat 20] [--driver]
+
+Stages: render (PIL + matplotlib drawing), pack (1-bit buffer packing), and
+transfer (the byte stream the driver pushes over SPI, against VirtualEPD).
+`--driver` also times the reference per-pixel packing in configs/epd7in5_V2.py
+using the fake GPIO backend.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.eink_utils import draw_frame  # noqa: E402
+from utils.virtual_epd import VirtualEPD  # noqa: E402
+from utils.weather_utils import load_station_data_fixture  # noqa: E402
+
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "synoptic_fps.json")
+
+
+def time_stage(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def report(name, timings):
+    print(f"{name:<14} min {min(timings) * 1000:8.2f} ms   median {statistics.median(timings) * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--driver", action="store_true", help="also time the driver's per-pixel getbuffer")
+    args = parser.parse_args()
+
+    station_data = load_station_data_fixture(args.fixture)
+    epd = VirtualEPD()
+
+    image, render_timings = time_stage(lambda: draw_frame(epd, station_data), args.repeat)
+    buffer, pack_timings = time_stage(lambda: epd.getbuffer(image), args.repeat)
+    _, transfer_timings = time_stage(lambda: epd.display(buffer), args.repeat)
+
+    print(f"{len(station_data)} observations, {args.repeat} repeats")
+    report("render", render_timings)
+    report("pack", pack_timings)
+    report("transfer", transfer_timings)
+
+    if args.driver:
+        os.environ.setdefault("EPD_BACKEND", "fake")
+        from configs import epd7in5_V2
+
+        driver = epd7in5_V2.EPD()
+        _, driver_timings = time_stage(lambda: driver.getbuffer(image), max(1, args.repeat // 5))
+        report("pack (driver)", driver_timings)
+
+
+if __name__ == "__main__":
+    main()
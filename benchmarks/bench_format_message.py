@@ -0,0 +1,63 @@
+"""Microbenchmark format_message against the old iterrows implementation.
+
+    python benchmarks/bench_format_message.py [--number 200]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.weather_utils import format_message  # noqa: E402
+
+
+def format_message_iterrows(station_data, rows=6, html=True):
+    """The pre-vectorization implementation, kept here as the baseline."""
+    latest = station_data.tail(rows).iloc[::-1].fillna({"wind_cardinal_direction_set_1d": "-"})
+    message = "<pre>" if html else "       Speed   Dir \n"
+    for index, row in latest.iterrows():
+        message += "{:%H:%M} {:>3.0f}g{:<2.0f}   {:<5} \n".format(
+            row["date_time"],
+            row["wind_speed_set_1"],
+            row["wind_gust_set_1"],
+            row["wind_cardinal_direction_set_1d"],
+        )
+    if html:
+        message += "</pre>"
+    return message
+
+
+def synthetic_station_data(n=120):
+    rng = np.random.default_rng(0)
+    speeds = rng.uniform(0, 25, n)
+    return pd.DataFrame(
+        {
+            "date_time": pd.date_range("2024-05-14 08:00", periods=n, freq="5min"),
+            "wind_speed_set_1": speeds,
+            "wind_gust_set_1": np.where(rng.random(n) < 0.1, np.nan, speeds + rng.uniform(0, 8, n)),
+            "wind_direction_set_1": rng.integers(0, 360, n),
+            "wind_cardinal_direction_set_1d": rng.choice(["S", "SSE", "SE", None], n),
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    station_data = synthetic_station_data()
+    print(f"{'rows':>5} {'iterrows':>12} {'vectorized':>12} {'speedup':>8}")
+    for rows in (6, 10, 60):
+        assert format_message(station_data, rows=rows) == format_message_iterrows(station_data, rows=rows)
+        old = timeit.timeit(lambda: format_message_iterrows(station_data, rows=rows), number=args.number)
+        new = timeit.timeit(lambda: format_message(station_data, rows=rows), number=args.number)
+        print(f"{rows:>5} {old / args.number * 1e6:>10.1f}us {new / args.number * 1e6:>10.1f}us {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Measure how lambda_handler scales with the number of users.
+
+    python benchmarks/bench_lambda_scale.py [--users 10 100 1000 10000] [--stations-per-user 3]
+        [--station-pool 50] [--latency-ms supabase=20 telegram=50] [--error-rate telegram=0.01]
+        [--prefilter]
+
+For each size, synthetic users x stations shaped like database_schema.sql are
+served by local stand-ins for Supabase PostgREST, Synoptic and Telegram
+(benchmarks/standins.py). lambda_handler runs unmodified in a fresh child
+process pointed at them, with "now" pinned to a summer midday so conditions
+can be met. Half of the stations report flyable wind.
+
+Reports runtime, requests per service and the child's peak RSS.
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from standins import start_standins, synthetic_tables  # noqa: E402
+
+# Pinned run time: 12:00 MDT on a summer day, daytime at every synthetic station
+AT_UTC = datetime.datetime(2024, 6, 15, 18, 0, tzinfo=datetime.timezone.utc)
+AT_LOCAL = datetime.datetime(2024, 6, 15, 12, 0)
+
+CHILD = """
+import datetime, json, resource, sys, time
+sys.path.insert(0, {root!r})
+import lambda_function as lf
+from utils.time_context import TimeContext
+
+at = datetime.datetime.fromisoformat({at!r})
+lf.TimeContext = lambda now_utc=None: TimeContext(at)
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+result = lf.lambda_handler({{}}, {{}})
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "runtime_s": elapsed,
+    "rss_before_kib": rss_before,
+    "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "status": result["statusCode"],
+    "body": json.loads(result["body"]),
+}}))
+"""
+
+
+def parse_service_values(items):
+    values = {}
+    for item in items or []:
+        service, _, value = item.partition("=")
+        values[service] = float(value)
+    return values
+
+
+def run_size(users, args):
+    tables = synthetic_tables(users, args.stations_per_user, args.station_pool)
+    calm = [station["station_id"] for station in tables["wind_stations"][::2]]
+    standins = start_standins(
+        tables,
+        AT_LOCAL,
+        calm_stations=calm,
+        latency_ms=parse_service_values(args.latency_ms),
+        error_rate=parse_service_values(args.error_rate),
+    )
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = dict(
+                os.environ,
+                SUPABASE_URL=standins["supabase"].url,
+                SUPABASE_SERVICE_ROLE_KEY="load.test.key",
+                SYNOPTIC_API_URL=standins["synoptic"].url,
+                SYNOPTIC_API_TOKEN="load-test-token",
+                TELEGRAM_API_URL=standins["telegram"].url,
+                TELEGRAM_BOT_TOKEN="load-test-bot",
+                SOARBOT_CACHE_DIR=cache_dir,
+                LOG_LEVEL="WARNING",
+            )
+            if args.prefilter:
+                env["SOARBOT_SQL_PREFILTER"] = "1"
+            env.pop("ADMIN_TELEGRAM_CHAT_ID", None)
+            child = subprocess.run(
+                [sys.executable, "-c", CHILD.format(root=ROOT, at=AT_UTC.isoformat())],
+                env=env,
+                cwd=ROOT,
+                capture_output=True,
+                text=True,
+            )
+        if child.returncode != 0:
+            raise RuntimeError(child.stderr)
+        report = json.loads(child.stdout.strip().splitlines()[-1])
+    finally:
+        for standin in standins.values():
+            standin.stop()
+
+    report["users"] = users
+    report["subscriptions"] = len(tables["user_configurations_with_stations"])
+    report["requests"] = {name: standin.requests for name, standin in standins.items()}
+    report["injected_errors"] = {name: standin.errors for name, standin in standins.items()}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--stations-per-user", type=int, default=3)
+    parser.add_argument("--station-pool", type=int, default=50)
+    parser.add_argument("--latency-ms", nargs="*", metavar="SERVICE=MS")
+    parser.add_argument("--error-rate", nargs="*", metavar="SERVICE=FRACTION")
+    parser.add_argument("--prefilter", action="store_true", help="use the candidate_subscriptions RPC")
+    parser.add_argument("--json", action="store_true", help="print one JSON report per size")
+    args = parser.parse_args()
+
+    if not args.json:
+        print(
+            f"{'users':>7} {'subs':>7} {'runtime':>9} {'sent':>6} "
+            f"{'supabase':>9} {'synoptic':>9} {'telegram':>9} {'peak RSS':>10}"
+        )
+    for users in args.users:
+        report = run_size(users, args)
+        if args.json:
+            print(json.dumps(report))
+            continue
+        requests = report["requests"]
+        print(
+            f"{users:>7} {report['subscriptions']:>7} {report['runtime_s']:>8.2f}s "
+            f"{report['body'].get('notifications_sent', 0):>6} {requests['supabase']:>9} "
+            f"{requests['synoptic']:>9} {requests['telegram']:>9} "
+            f"{report['peak_rss_kib'] / 1024:>7.1f}MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
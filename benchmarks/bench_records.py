@@ -0,0 +1,163 @@
+"""Compare the old nested-dict user grouping with utils.records at scale.
+
+    python benchmarks/bench_records.py [--subscriptions 10000] [--stations-per-user 5]
+
+Rows are round-tripped through JSON so every string is a fresh object, as it is
+when PostgREST responses are parsed. Reports build time and the memory the
+resulting users + station details keep alive once the raw rows are dropped
+(tracemalloc, measured in a second, separately timed pass).
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.records import StationDetail, build_user_configs  # noqa: E402
+
+STATIONS = ["FPS", "KSLC", "KOGD", "UTPOM", "UT5", "KPVU", "KHCR", "UTLPK"]
+
+
+def synthetic_rows(subscriptions, stations_per_user):
+    rows = []
+    for i in range(subscriptions):
+        user = i // stations_per_user
+        station = STATIONS[i % stations_per_user % len(STATIONS)]
+        rows.append(
+            {
+                "user_id": f"00000000-0000-0000-0000-{user:012d}",
+                "telegram_chat_id": str(100000000 + user),
+                "username": f"pilot{user}",
+                "first_name": "Pilot",
+                "last_name": None,
+                "notification_cooldown_hours": 4,
+                "timezone": "America/Denver",
+                "notifications_enabled": True,
+                "include_weather_chart": False,
+                "message_rows": 6,
+                "enable_winter_midday": True,
+                "quiet_hours_start": "22:00:00",
+                "quiet_hours_end": "06:00:00",
+                "station_id": station,
+                "station_name": f"{station} station",
+                "station_description": "Synthetic benchmark station",
+                "latitude": 40.5247,
+                "longitude": -111.8638,
+                "api_provider": "synoptic",
+                "api_config": {"lookback_minutes": 120},
+                "wind_speed_min": 8.5,
+                "wind_speed_max": 16.0,
+                "wind_direction_min": 130,
+                "wind_direction_max": 180,
+                "max_gust_differential": 5.0,
+                "priority": i % stations_per_user + 1,
+                "custom_name": None,
+                "station_enabled": True,
+                "min_visibility_miles": None,
+                "max_precipitation_rate": None,
+            }
+        )
+    return json.dumps(rows)
+
+
+def build_dicts(rows):
+    """The previous get_active_users_with_configs grouping, for comparison."""
+    users_dict = {}
+    for row in rows:
+        user_id = row["user_id"]
+        if user_id not in users_dict:
+            users_dict[user_id] = {
+                "user_id": user_id,
+                "telegram_chat_id": row["telegram_chat_id"],
+                "username": row["username"],
+                "first_name": row["first_name"],
+                "last_name": row["last_name"],
+                "preferences": {
+                    "notification_cooldown_hours": row["notification_cooldown_hours"],
+                    "timezone": row["timezone"],
+                    "notifications_enabled": row["notifications_enabled"],
+                    "include_weather_chart": row["include_weather_chart"],
+                    "message_rows": row["message_rows"],
+                    "enable_winter_midday": row["enable_winter_midday"],
+                    "quiet_hours_start": row.get("quiet_hours_start"),
+                    "quiet_hours_end": row.get("quiet_hours_end"),
+                },
+                "stations": [],
+            }
+        users_dict[user_id]["stations"].append(
+            {
+                "station_id": row["station_id"],
+                "station_name": row["station_name"],
+                "station_description": row["station_description"],
+                "api_provider": row["api_provider"],
+                "api_config": row["api_config"],
+                "latitude": row.get("latitude"),
+                "longitude": row.get("longitude"),
+                "wind_speed_min": row["wind_speed_min"],
+                "wind_speed_max": row["wind_speed_max"],
+                "wind_direction_min": row["wind_direction_min"],
+                "wind_direction_max": row["wind_direction_max"],
+                "max_gust_differential": row["max_gust_differential"],
+                "priority": row["priority"],
+                "custom_name": row["custom_name"],
+                "station_enabled": row["station_enabled"],
+                "min_visibility_miles": row.get("min_visibility_miles"),
+                "max_precipitation_rate": row.get("max_precipitation_rate"),
+            }
+        )
+    for user_data in users_dict.values():
+        user_data["stations"].sort(key=lambda x: x["priority"])
+    users = list(users_dict.values())
+    details = [
+        {"user_id": user["user_id"], "station_id": station["station_id"], "has_data": False}
+        for user in users
+        for station in user["stations"]
+    ]
+    return users, details
+
+
+def build_records(rows):
+    users = build_user_configs(rows)
+    details = [StationDetail(user.user_id, station) for user in users for station in user.stations]
+    return users, details
+
+
+def measure(builder, payload):
+    rows = json.loads(payload)
+    gc.collect()
+    start = time.perf_counter()
+    builder(rows)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    rows = json.loads(payload)
+    result = builder(rows)
+    # Drop the raw rows so only what the structure itself keeps alive is counted
+    del rows
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscriptions", type=int, default=10000)
+    parser.add_argument("--stations-per-user", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = synthetic_rows(args.subscriptions, args.stations_per_user)
+    print(f"{args.subscriptions} subscriptions, {args.stations_per_user} per user")
+    for name, builder in (("dicts", build_dicts), ("records", build_records)):
+        elapsed, retained = measure(builder, payload)
+        print(f"{name:<8} build {elapsed * 1000:8.1f} ms   retained {retained / 1024 / 1024:7.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""Local HTTP stand-ins for Supabase PostgREST, Synoptic and Telegram, plus synthetic data.
+
+Each stand-in is a real HTTP server on 127.0.0.1 with configurable latency and
+error rate, counting the requests it receives, so lambda_handler can run
+unmodified against it (SUPABASE_URL, SYNOPTIC_API_URL, TELEGRAM_API_URL).
+"""
+import datetime
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+from utils.prefilter import could_match
+
+FPS_LATITUDE = 40.5247
+FPS_LONGITUDE = -111.8638
+
+
+class StandIn:
+    """Base HTTP stand-in; subclasses implement `handle(method, path, query, body)`."""
+
+    name = "service"
+
+    def __init__(self, latency_ms: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency_s = latency_ms / 1000
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this, Nagle + delayed ACK add ~40 ms
+            disable_nagle_algorithm = True
+
+            def _dispatch(self, method):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                # sendPhoto uploads are multipart; only JSON bodies are parsed
+                is_json = "json" in (self.headers.get("Content-Type") or "")
+                body = json.loads(raw) if raw and is_json else None
+                with standin.lock:
+                    standin.requests += 1
+                    fail = standin.rng.random() < standin.error_rate
+                    if fail:
+                        standin.errors += 1
+                if standin.latency_s:
+                    time.sleep(standin.latency_s)
+                if fail:
+                    status, payload = 503, {"message": "injected error"}
+                else:
+                    status, payload = standin.handle(method, url.path, parse_qsl(url.query), body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def handle(self, method: str, path: str, query: List[Tuple[str, str]], body: Any) -> Tuple[int, Any]:
+        raise NotImplementedError
+
+    def start(self) -> "StandIn":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _matches(row: Dict[str, Any], column: str, condition: str) -> bool:
+    op, _, value = condition.partition(".")
+    actual = row.get(column)
+    if op == "eq":
+        return str(actual) == value
+    if op == "in":
+        return str(actual) in value.strip("()").split(",")
+    if actual is None:
+        return False
+    if op == "gt":
+        return str(actual) > value
+    if op == "gte":
+        return str(actual) >= value
+    if op == "lt":
+        return str(actual) < value
+    if op == "lte":
+        return str(actual) <= value
+    raise ValueError(f"Unsupported filter {condition}")
+
+
+class PostgRESTStandIn(StandIn):
+    """The subset of PostgREST SoarBot uses: select/eq/gt/in/order/limit, inserts and the prefilter RPC."""
+
+    name = "supabase"
+
+    def __init__(self, tables: Dict[str, List[Dict[str, Any]]], **kwargs):
+        super().__init__(**kwargs)
+        self.tables = tables
+
+    def handle(self, method, path, query, body):
+        table = path.rsplit("/", 1)[-1]
+        if "/rpc/" in path:
+            if table != "candidate_subscriptions":
+                return 404, {"message": f"Unknown function {table}"}
+            with self.lock:
+                return 200, self.candidate_subscriptions(body["summaries"])
+        with self.lock:
+            rows = self.tables.setdefault(table, [])
+            if method == "POST":
+                new_rows = body if isinstance(body, list) else [body]
+                now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+                for row in new_rows:
+                    row.setdefault("id", str(uuid.uuid4()))
+                    row.setdefault("created_at", now)
+                    if table == "notification_history":
+                        row.setdefault("sent_at", now)
+                        self._update_last_notified(row)
+                rows.extend(new_rows)
+                return 201, new_rows
+
+            select, order, limit, filters = "*", None, None, []
+            for key, value in query:
+                if key == "select":
+                    select = value
+                elif key == "order":
+                    order = value
+                elif key == "limit":
+                    limit = int(value)
+                else:
+                    filters.append((key, value))
+            data = [row for row in rows if all(_matches(row, c, v) for c, v in filters)]
+        if order:
+            column, _, direction = order.partition(".")
+            data.sort(key=lambda row: str(row.get(column)), reverse=direction.startswith("desc"))
+        if limit is not None:
+            data = data[:limit]
+        if select != "*":
+            columns = select.split(",")
+            data = [{column: row.get(column) for column in columns} for row in data]
+        return 200, data
+
+
+    def _update_last_notified(self, row: Dict[str, Any]) -> None:
+        """The update_user_station_last_notified trigger."""
+        if not row.get("user_id") or not row.get("station_id"):
+            return
+        last_notified = self.tables.setdefault("user_station_last_notified", [])
+        for existing in last_notified:
+            if existing["user_id"] == row["user_id"] and existing["station_id"] == row["station_id"]:
+                existing["last_sent_at"] = max(existing["last_sent_at"], row["sent_at"])
+                return
+        last_notified.append(
+            {"user_id": row["user_id"], "station_id": row["station_id"], "last_sent_at": row["sent_at"]}
+        )
+
+    def candidate_subscriptions(self, summaries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """candidate_subscriptions from database_schema.sql, evaluated over the in-memory tables."""
+        by_station = {summary["station_id"]: summary for summary in summaries}
+        station_uuids = {row["station_id"]: row["id"] for row in self.tables["wind_stations"]}
+        now = datetime.datetime.now(datetime.timezone.utc)
+        last_sent = {
+            (row["user_id"], row["station_id"]): datetime.datetime.fromisoformat(row["last_sent_at"])
+            for row in self.tables.get("user_station_last_notified", [])
+        }
+
+        candidates = []
+        for row in self.tables["user_configurations_with_stations"]:
+            summary = by_station.get(row["station_id"])
+            if summary is None or not could_match(summary, SimpleNamespace(**row)):
+                continue
+            sent_at = last_sent.get((row["user_id"], station_uuids.get(row["station_id"])))
+            cooldown = datetime.timedelta(hours=row["notification_cooldown_hours"] or 4)
+            if sent_at is None or now - sent_at >= cooldown:
+                candidates.append({"user_id": row["user_id"], "station_id": row["station_id"]})
+        return candidates
+
+
+class SynopticStandIn(StandIn):
+    """Synoptic timeseries endpoint serving synthetic 5-minute observations ending at `now_local`.
+
+    Stations in `calm_stations` report winds below any sensible threshold;
+    every other station reports flyable conditions.
+    """
+
+    name = "synoptic"
+
+    def __init__(self, now_local: datetime.datetime, calm_stations=(), **kwargs):
+        super().__init__(**kwargs)
+        self.now_local = now_local.replace(second=0, microsecond=0)
+        self.calm_stations = set(calm_stations)
+
+    def observations(self, stid: str, recent_minutes: int) -> Dict[str, List[Any]]:
+        count = max(1, recent_minutes // 5)
+        times = [self.now_local - datetime.timedelta(minutes=5 * i) for i in range(count)][::-1]
+        speed_kph = 3.0 if stid in self.calm_stations else 10.0  # parse_synoptic_response scales by 1.15
+        return {
+            "date_time": [t.strftime("%Y-%m-%dT%H:%M:%S-0600") for t in times],
+            "air_temp_set_1": [70.0] * count,
+            "wind_speed_set_1": [speed_kph] * count,
+            "wind_gust_set_1": [speed_kph + 2] * count,
+            "wind_direction_set_1": [160] * count,
+            "precip_accum_five_minute_set_1": [0.0] * count,
+            "wind_cardinal_direction_set_1d": ["SSE"] * count,
+        }
+
+    def handle(self, method, path, query, body):
+        params = dict(query)
+        recent = int(params.get("recent", 120))
+        stations = [
+            {"STID": stid, "OBSERVATIONS": self.observations(stid, recent)}
+            for stid in params.get("stid", "").split(",")
+            if stid
+        ]
+        return 200, {"STATION": stations, "SUMMARY": {"RESPONSE_CODE": 1}}
+
+
+class TelegramStandIn(StandIn):
+    """Bot API `sendMessage` / `sendPhoto` that accepts everything."""
+
+    name = "telegram"
+
+    def handle(self, method, path, query, body):
+        result = {"message_id": self.requests, "chat": {"id": (body or {}).get("chat_id")}}
+        if path.endswith("/sendPhoto"):
+            result["photo"] = [{"file_id": f"photo-{self.requests}"}]
+        return 200, {"ok": True, "result": result}
+
+
+def synthetic_tables(
+    users: int, stations_per_user: int = 3, station_pool: int = 50, seed: int = 0
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Rows for the tables in database_schema.sql plus the user_configurations_with_stations view."""
+    rng = random.Random(seed)
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    station_pool = max(station_pool, stations_per_user)
+
+    wind_stations = [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "station_id": f"S{i:04d}",
+            "name": f"Synthetic station {i}",
+            "description": "Load-test station",
+            "latitude": round(FPS_LATITUDE + rng.uniform(-0.5, 0.5), 4),
+            "longitude": round(FPS_LONGITUDE + rng.uniform(-0.5, 0.5), 4),
+            "elevation_ft": 4500,
+            "timezone": "America/Denver",
+            "api_provider": "synoptic",
+            "api_config": {"lookback_minutes": 120},
+            "is_active": True,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(station_pool)
+    ]
+
+    tables: Dict[str, List[Dict[str, Any]]] = {
+        "users": [],
+        "user_preferences": [],
+        "user_station_configs": [],
+        "wind_stations": wind_stations,
+        "notification_history": [],
+        "user_station_last_notified": [],
+        "run_metrics": [],
+        "user_configurations_with_stations": [],
+    }
+    view = tables["user_configurations_with_stations"]
+    for u in range(users):
+        user = {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "telegram_chat_id": str(100000000 + u),
+            "username": f"pilot{u}",
+            "first_name": "Pilot",
+            "last_name": None,
+            "is_active": True,
+            "created_at": now,
+            "updated_at": now,
+        }
+        preferences = {
+            "user_id": user["id"],
+            "notification_cooldown_hours": 4,
+            "timezone": "America/Denver",
+            "notifications_enabled": True,
+            "include_weather_chart": False,
+            "message_rows": 6,
+            "enable_winter_midday": True,
+            "quiet_hours_start": "22:00:00",
+            "quiet_hours_end": "06:00:00",
+            "updated_at": now,
+        }
+        tables["users"].append(user)
+        tables["user_preferences"].append(preferences)
+        for priority, station in enumerate(rng.sample(wind_stations, stations_per_user), start=1):
+            config = {
+                "user_id": user["id"],
+                "station_id": station["id"],
+                "wind_speed_min": 8.5,
+                "wind_speed_max": 16.0,
+                "wind_direction_min": 130,
+                "wind_direction_max": 180,
+                "max_gust_differential": 5.0,
+                "priority": priority,
+                "custom_name": None,
+                "is_enabled": True,
+                "min_visibility_miles": None,
+                "max_precipitation_rate": None,
+                "window_readings": 3,
+                "release_readings": 1,
+                "updated_at": now,
+            }
+            tables["user_station_configs"].append(config)
+            view.append(_view_row(user, preferences, station, config))
+    return tables
+
+
+def _view_row(user, preferences, station, config) -> Dict[str, Any]:
+    """One row of user_configurations_with_stations, joined as the SQL view does."""
+    return {
+        "user_id": user["id"],
+        "telegram_chat_id": user["telegram_chat_id"],
+        "username": user["username"],
+        "first_name": user["first_name"],
+        "last_name": user["last_name"],
+        "notification_cooldown_hours": preferences["notification_cooldown_hours"],
+        "timezone": preferences["timezone"],
+        "notifications_enabled": preferences["notifications_enabled"],
+        "include_weather_chart": preferences["include_weather_chart"],
+        "message_rows": preferences["message_rows"],
+        "enable_winter_midday": preferences["enable_winter_midday"],
+        "quiet_hours_start": preferences["quiet_hours_start"],
+        "quiet_hours_end": preferences["quiet_hours_end"],
+        "station_id": station["station_id"],
+        "station_name": station["name"],
+        "station_description": station["description"],
+        "latitude": station["latitude"],
+        "longitude": station["longitude"],
+        "elevation_ft": station["elevation_ft"],
+        "api_provider": station["api_provider"],
+        "api_config": station["api_config"],
+        "wind_speed_min": config["wind_speed_min"],
+        "wind_speed_max": config["wind_speed_max"],
+        "wind_direction_min": config["wind_direction_min"],
+        "wind_direction_max": config["wind_direction_max"],
+        "max_gust_differential": config["max_gust_differential"],
+        "priority": config["priority"],
+        "custom_name": config["custom_name"],
+        "station_enabled": config["is_enabled"],
+        "min_visibility_miles": config["min_visibility_miles"],
+        "max_precipitation_rate": config["max_precipitation_rate"],
+        "window_readings": config["window_readings"],
+        "release_readings": config["release_readings"],
+    }
+
+
+def start_standins(
+    tables: Dict[str, List[Dict[str, Any]]],
+    now_local: datetime.datetime,
+    calm_stations=(),
+    latency_ms: Optional[Dict[str, float]] = None,
+    error_rate: Optional[Dict[str, float]] = None,
+) -> Dict[str, StandIn]:
+    latency_ms = latency_ms or {}
+    error_rate = error_rate or {}
+
+    def options(name):
+        return {"latency_ms": latency_ms.get(name, 0.0), "error_rate": error_rate.get(name, 0.0)}
+
+    return {
+        "supabase": PostgRESTStandIn(tables, **options("supabase")).start(),
+        "synoptic": SynopticStandIn(now_local, calm_stations, **options("synoptic")).start(),
+        "telegram": TelegramStandIn(**options("telegram")).start(),
+    }
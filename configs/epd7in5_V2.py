@@ -30,12 +30,15 @@
 
 import logging
 
-import epdconfig
+from . import epdconfig
 
 # Display resolution
 EPD_WIDTH       = 800
 EPD_HEIGHT      = 480
 
+# A full refresh takes a few seconds; past this the panel is considered wedged
+BUSY_TIMEOUT_S  = 40
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -44,6 +47,7 @@ class EPD:
         self.cs_pin = epdconfig.CS_PIN
         self.width = EPD_WIDTH
         self.height = EPD_HEIGHT
+        self.busy_timeout = BUSY_TIMEOUT_S
     
     # Hardware reset
     def reset(self):
@@ -68,11 +72,9 @@ class EPD:
         
     def ReadBusy(self):
         logging.debug("e-Paper busy")
-        self.send_command(0x71)
-        busy = epdconfig.digital_read(self.busy_pin)
-        while(busy == 0):
-            self.send_command(0x71)
-            busy = epdconfig.digital_read(self.busy_pin)
+        # 0x71 (GET_STATUS) refreshes the BUSY pin; raises epdconfig.BusyTimeoutError if wedged
+        epdconfig.wait_until_idle(self.busy_pin, idle_level=1, timeout_s=self.busy_timeout,
+                                  before_read=lambda: self.send_command(0x71))
         epdconfig.delay_ms(200)
         
     def init(self):
@@ -33,6 +33,10 @@ import sys
 import time
 
 
+class BusyTimeoutError(RuntimeError):
+    """The panel kept its BUSY line asserted longer than the allowed timeout."""
+
+
 class RaspberryPi:
     # Pin definition
     RST_PIN         = 17
@@ -61,6 +65,15 @@ class RaspberryPi:
     def spi_writebyte(self, data):
         self.SPI.writebytes(data)
 
+    def wait_for_edge(self, pin, rising, timeout_ms):
+        """Block until `pin` changes level. Returns False on timeout, None if unsupported."""
+        edge = self.GPIO.RISING if rising else self.GPIO.FALLING
+        try:
+            return self.GPIO.wait_for_edge(pin, edge, timeout=max(int(timeout_ms), 1)) is not None
+        except RuntimeError:
+            # e.g. edge detection already claimed on this channel
+            return None
+
     def module_init(self):
         self.GPIO.setmode(self.GPIO.BCM)
         self.GPIO.setwarnings(False)
@@ -121,6 +134,14 @@ class JetsonNano:
     def spi_writebyte(self, data):
         self.SPI.SYSFS_software_spi_transfer(data[0])
 
+    def wait_for_edge(self, pin, rising, timeout_ms):
+        """Block until `pin` changes level. Returns False on timeout, None if unsupported."""
+        edge = self.GPIO.RISING if rising else self.GPIO.FALLING
+        try:
+            return self.GPIO.wait_for_edge(pin, edge, timeout=max(int(timeout_ms), 1)) is not None
+        except RuntimeError:
+            return None
+
     def module_init(self):
         self.GPIO.setmode(self.GPIO.BCM)
         self.GPIO.setwarnings(False)
@@ -142,7 +163,88 @@ class JetsonNano:
         self.GPIO.cleanup()
 
 
-if os.path.exists('/sys/bus/platform/drivers/gpiomem-bcm2835'):
+class FakeGPIO:
+    """In-memory backend for running the drivers without hardware (EPD_BACKEND=fake).
+
+    The BUSY pin reads 0 (busy) until `set_busy(seconds)` elapses. SPI writes are
+    only counted. `edge_detection = False` makes `wait_for_edge` report itself as
+    unsupported so the polling fallback can be exercised.
+    """
+    # Pin definition
+    RST_PIN         = 17
+    DC_PIN          = 25
+    CS_PIN          = 8
+    BUSY_PIN        = 24
+
+    def __init__(self):
+        self.pins = {}
+        self.busy_until = 0.0
+        self.edge_detection = True
+        self.busy_reads = 0
+        self.spi_bytes = 0
+
+    def set_busy(self, seconds):
+        self.busy_until = time.monotonic() + seconds
+
+    def digital_write(self, pin, value):
+        self.pins[pin] = value
+
+    def digital_read(self, pin):
+        if pin == self.BUSY_PIN:
+            self.busy_reads += 1
+            return 0 if time.monotonic() < self.busy_until else 1
+        return self.pins.get(pin, 0)
+
+    def delay_ms(self, delaytime):
+        time.sleep(delaytime / 1000.0)
+
+    def spi_writebyte(self, data):
+        self.spi_bytes += len(data)
+
+    def wait_for_edge(self, pin, rising, timeout_ms):
+        if not self.edge_detection:
+            return None
+        remaining_s = self.busy_until - time.monotonic()
+        if remaining_s * 1000.0 <= timeout_ms:
+            time.sleep(max(remaining_s, 0))
+            return True
+        time.sleep(timeout_ms / 1000.0)
+        return False
+
+    def module_init(self):
+        return 0
+
+    def module_exit(self):
+        logging.debug("fake module exit")
+
+
+def wait_until_idle(pin, idle_level=1, timeout_s=30.0, poll_ms=10, max_poll_ms=200, before_read=None):
+    """Wait for a BUSY pin to reach `idle_level` without spinning a core.
+
+    Each slice blocks on a GPIO edge when the backend supports it and otherwise
+    sleeps, doubling the slice from `poll_ms` up to `max_poll_ms`. `before_read`
+    runs before every read (some panels need a status command to refresh the pin).
+    Raises BusyTimeoutError once `timeout_s` has passed.
+    """
+    deadline = time.monotonic() + timeout_s
+    interval_ms = poll_ms
+    while True:
+        if before_read is not None:
+            before_read()
+        if digital_read(pin) == idle_level:
+            return
+        remaining_ms = (deadline - time.monotonic()) * 1000.0
+        if remaining_ms <= 0:
+            raise BusyTimeoutError(f"e-Paper still busy after {timeout_s}s")
+        slice_ms = min(interval_ms, remaining_ms)
+        if wait_for_edge(pin, idle_level == 1, slice_ms) is None:
+            delay_ms(slice_ms)
+        interval_ms = min(interval_ms * 2, max_poll_ms)
+
+
+if os.getenv('EPD_BACKEND') == 'fake':
+    implementation = FakeGPIO()
+elif os.path.exists('/sys/bus/platform/drivers/gpiomem-bcm2835'):
     implementation = RaspberryPi()
 else:
     implementation = JetsonNano()
@@ -4,8 +4,20 @@ import StationTable from './components/StationTable'
 import WeatherCharts from './components/WeatherCharts'
 import { supabase } from './utils/supabase'
 
+// Runs per page of the station table (see station_details_page in database_schema.sql)
+const RUNS_PER_PAGE = 20
+
+// One row per station check, shaped like a run_metrics.station_details entry plus its run's fields
+const toStationDetails = (rows) => rows
+  .filter(row => row.detail)
+  .map(row => ({ ...row.detail, run_id: row.run_id, start_time: row.start_time, winter_mode: row.winter_mode }))
+
 function App() {
-  const [runData, setRunData] = useState([])
+  const [totals, setTotals] = useState(null)
+  const [series, setSeries] = useState([])
+  const [stationDetails, setStationDetails] = useState([])
+  const [nextBefore, setNextBefore] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
   const [dateRange, setDateRange] = useState({
@@ -13,18 +25,38 @@ function App() {
     end: new Date().toISOString().split('T')[0] // today
   })
 
+  const rangeParams = () => ({
+    range_start: `${dateRange.start}T00:00:00Z`,
+    range_end: `${dateRange.end}T23:59:59Z`
+  })
+
+  // Fetch a page of station checks; the next page starts before the oldest run in this one
+  const fetchStationPage = async (beforeTime) => {
+    const { data, error } = await supabase.rpc('station_details_page', {
+      ...rangeParams(),
+      before_time: beforeTime,
+      max_runs: RUNS_PER_PAGE
+    })
+    if (error) throw error
+    const rows = data || []
+    const runCount = new Set(rows.map(row => row.run_id)).size
+    setNextBefore(runCount === RUNS_PER_PAGE ? rows[rows.length - 1].start_time : null)
+    return toStationDetails(rows)
+  }
+
   const fetchRunData = async () => {
     try {
       setLoading(true)
-      const { data, error } = await supabase
-        .from('run_metrics')
-        .select('*')
-        .gte('start_time', `${dateRange.start}T00:00:00Z`)
-        .lte('start_time', `${dateRange.end}T23:59:59Z`)
-        .order('start_time', { ascending: false })
-
-      if (error) throw error
-      setRunData(data || [])
+      const [totalsResult, seriesResult, details] = await Promise.all([
+        supabase.rpc('run_totals', rangeParams()),
+        supabase.rpc('station_time_series', rangeParams()),
+        fetchStationPage(null)
+      ])
+      if (totalsResult.error) throw totalsResult.error
+      if (seriesResult.error) throw seriesResult.error
+      setTotals(totalsResult.data?.[0] || null)
+      setSeries(seriesResult.data || [])
+      setStationDetails(details)
     } catch (err) {
       setError(err.message)
     } finally {
@@ -36,6 +68,18 @@ function App() {
     fetchRunData()
   }, [dateRange])
 
+  const loadMoreStations = async () => {
+    try {
+      setLoadingMore(true)
+      const details = await fetchStationPage(nextBefore)
+      setStationDetails(current => [...current, ...details])
+    } catch (err) {
+      setError(err.message)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleDateRangeChange = (newRange) => {
     setDateRange(newRange)
   }
@@ -95,13 +139,18 @@ function App() {
         </div>
 
         {/* Run Summary Cards */}
-        <RunSummary runData={runData} />
+        <RunSummary totals={totals} />
 
         {/* Station Analysis Table */}
-        <StationTable runData={runData} />
+        <StationTable
+          stationDetails={stationDetails}
+          hasMore={nextBefore !== null}
+          loadingMore={loadingMore}
+          onLoadMore={loadMoreStations}
+        />
 
         {/* Weather Charts */}
-        <WeatherCharts runData={runData} />
+        <WeatherCharts series={series} />
       </div>
     </div>
   )
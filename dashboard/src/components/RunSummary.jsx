@@ -1,10 +1,17 @@
-function RunSummary({ runData }) {
-  const totalRuns = runData.length
-  const successfulRuns = runData.filter(run => run.success).length
+function RunSummary({ totals }) {
+  // Range totals from the run_totals RPC (database_schema.sql)
+  const totalRuns = Number(totals?.runs || 0)
+  const successfulRuns = Number(totals?.successful_runs || 0)
   const successRate = totalRuns > 0 ? ((successfulRuns / totalRuns) * 100).toFixed(1) : 0
-  const totalNotifications = runData.reduce((sum, run) => sum + (run.notifications_sent || 0), 0)
-  const avgRuntime = totalRuns > 0 ? 
-    (runData.reduce((sum, run) => sum + (run.runtime_seconds || 0), 0) / totalRuns).toFixed(2) : 0
+  const totalNotifications = Number(totals?.notifications_sent || 0)
+  const avgRuntime = totalRuns > 0 ? (Number(totals.total_runtime_seconds || 0) / totalRuns).toFixed(2) : 0
+
+  // Average time per run spent in each lambda_handler stage (runs that recorded stage_timings)
+  const timedRuns = Number(totals?.timed_runs || 0)
+  const stages = Object.entries(totals?.stage_timings || {})
+    .map(([stage, timing]) => ({ stage, avgMs: Number(timing.total_ms || 0) / timedRuns }))
+    .sort((a, b) => b.avgMs - a.avgMs)
+  const slowestStageMs = stages.length > 0 ? stages[0].avgMs : 0
 
   const cards = [
     {
@@ -34,6 +41,7 @@ function RunSummary({ runData }) {
   ]
 
   return (
+    <>
     <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-6 mb-8">
       {cards.map((card, index) => (
         <div key={index} className="bg-white rounded-lg shadow p-6">
@@ -49,6 +57,28 @@ function RunSummary({ runData }) {
         </div>
       ))}
     </div>
+    {stages.length > 0 && (
+      <div className="bg-white rounded-lg shadow p-6 mb-8">
+        <h3 className="text-lg font-semibold text-gray-900 mb-4">Where Time Goes (avg per run)</h3>
+        <div className="space-y-2">
+          {stages.map(({ stage, avgMs }) => (
+            <div key={stage} className="flex items-center">
+              <span className="w-36 text-sm text-gray-600">{stage}</span>
+              <div className="flex-1 bg-gray-100 rounded h-4 mr-4">
+                <div
+                  className="bg-indigo-500 h-4 rounded"
+                  style={{ width: `${(avgMs / slowestStageMs) * 100}%` }}
+                />
+              </div>
+              <span className="w-24 text-right text-sm font-medium text-gray-900">
+                {avgMs >= 1000 ? `${(avgMs / 1000).toFixed(2)}s` : `${avgMs.toFixed(0)}ms`}
+              </span>
+            </div>
+          ))}
+        </div>
+      </div>
+    )}
+    </>
   )
 }
 
@@ -1,18 +1,8 @@
 import { useState } from 'react'
 
-function StationTable({ runData }) {
+function StationTable({ stationDetails, hasMore, loadingMore, onLoadMore }) {
   const [expandedRow, setExpandedRow] = useState(null)
 
-  // Extract all station details from run data
-  const stationDetails = runData.flatMap(run => 
-    (run.station_details || []).map(station => ({
-      ...station,
-      run_id: run.id,
-      start_time: run.start_time,
-      winter_mode: run.winter_mode
-    }))
-  )
-
   const getStatusColor = (station) => {
     if (!station.enabled) return 'bg-gray-100 text-gray-600'
     if (station.api_error) return 'bg-red-100 text-red-700'
@@ -197,6 +187,18 @@ function StationTable({ runData }) {
           </tbody>
         </table>
       </div>
+
+      {hasMore && (
+        <div className="px-6 py-4 border-t border-gray-200 text-center">
+          <button
+            onClick={onLoadMore}
+            disabled={loadingMore}
+            className="bg-blue-500 text-white px-4 py-1 rounded text-sm hover:bg-blue-600 disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Load older runs'}
+          </button>
+        </div>
+      )}
     </div>
   )
 }
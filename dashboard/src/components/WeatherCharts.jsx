@@ -20,56 +20,47 @@ ChartJS.register(
   Legend
 )
 
-function WeatherCharts({ runData }) {
-  // Extract weather data from recent failed stations
-  const getFailedStationsWeatherData = () => {
-    const failedStations = runData.flatMap(run => 
-      (run.station_details || []).filter(station => 
-        station.latest_weather_data && 
-        !station.notification_sent && 
-        station.conditions_result && 
-        !station.conditions_result.overall_met
-      )
-    )
-
-    // Group by station and get latest data
-    const stationGroups = {}
-    failedStations.forEach(station => {
-      if (!stationGroups[station.station_id]) {
-        stationGroups[station.station_id] = []
-      }
-      stationGroups[station.station_id].push(station)
+function WeatherCharts({ series }) {
+  // Series rows come from the station_time_series RPC: one per station per run (short ranges)
+  // or per hour/day; the three stations with the most failed checks are charted
+  const getFailedStations = () => {
+    const failures = {}
+    series.forEach(point => {
+      const failed = Number(point.checks || 0) - Number(point.conditions_met || 0)
+      failures[point.station_id] = (failures[point.station_id] || 0) + failed
     })
-
-    return Object.entries(stationGroups).slice(0, 3) // Show top 3 stations
+    return Object.entries(failures)
+      .filter(([_, failed]) => failed > 0)
+      .sort((a, b) => b[1] - a[1])
+      .slice(0, 3)
+      .map(([stationId]) => stationId)
   }
 
-  const createChartData = (stations, dataKey, label, color) => {
-    const datasets = stations.map(([stationId, stationData], index) => {
-      const latestStation = stationData[0] // Most recent
-      const weatherData = latestStation.latest_weather_data
-      
-      if (!weatherData || !weatherData[dataKey]) return null
+  const failedStations = getFailedStations()
+  const buckets = [...new Set(
+    series.filter(point => failedStations.includes(point.station_id)).map(point => point.bucket)
+  )].sort()
+
+  const createChartData = (dataKey, label, color) => {
+    const datasets = failedStations.map((stationId, index) => {
+      const points = series.filter(point => point.station_id === stationId)
+      const byBucket = Object.fromEntries(points.map(point => [point.bucket, point[dataKey]]))
 
       return {
-        label: `${latestStation.station_name} - ${label}`,
-        data: weatherData[dataKey],
+        label: `${points[0]?.station_name || stationId} - ${label}`,
+        data: buckets.map(bucket => byBucket[bucket] ?? null),
         borderColor: color[index % color.length],
         backgroundColor: color[index % color.length] + '20',
+        spanGaps: true,
         tension: 0.1
       }
-    }).filter(Boolean)
+    })
 
-    // Create labels from timestamps
-    const labels = stations[0]?.[1]?.[0]?.latest_weather_data?.timestamps?.map(ts => 
-      new Date(ts).toLocaleTimeString()
-    ) || []
+    const labels = buckets.map(bucket => new Date(bucket).toLocaleString())
 
     return { labels, datasets }
   }
 
-  const failedStations = getFailedStationsWeatherData()
-
   if (failedStations.length === 0) {
     return (
       <div className="bg-white rounded-lg shadow p-6">
@@ -81,9 +72,11 @@ function WeatherCharts({ runData }) {
 
   const colors = ['#3B82F6', '#EF4444', '#10B981', '#F59E0B', '#8B5CF6']
 
-  const windSpeedData = createChartData(failedStations, 'wind_speeds', 'Wind Speed', colors)
-  const windDirectionData = createChartData(failedStations, 'wind_directions', 'Wind Direction', colors)
-  const windGustData = createChartData(failedStations, 'wind_gusts', 'Wind Gusts', colors)
+  const windSpeedData = createChartData('avg_wind_speed', 'Wind Speed', colors)
+  const windDirectionData = createChartData('avg_wind_direction', 'Wind Direction', colors)
+  const windGustData = createChartData('max_wind_gust', 'Wind Gusts', colors)
+  // Direction is only reported per run, not in the hourly/daily rollups
+  const hasDirection = series.some(point => point.avg_wind_direction !== null)
 
   const chartOptions = {
     responsive: true,
@@ -113,10 +106,12 @@ function WeatherCharts({ runData }) {
             <Line data={windSpeedData} options={chartOptions} />
           </div>
           
-          <div>
-            <h3 className="text-lg font-medium text-gray-900 mb-3">Wind Direction (°)</h3>
-            <Line data={windDirectionData} options={chartOptions} />
-          </div>
+          {hasDirection && (
+            <div>
+              <h3 className="text-lg font-medium text-gray-900 mb-3">Wind Direction (°)</h3>
+              <Line data={windDirectionData} options={chartOptions} />
+            </div>
+          )}
         </div>
         
         <div className="mt-6">
@@ -71,6 +71,10 @@ CREATE TABLE user_station_configs (
     -- Gust settings
     max_gust_differential DECIMAL(4,1) DEFAULT 5.0,
     
+    -- Rolling condition window
+    window_readings INTEGER DEFAULT 3, -- consecutive readings that must all pass
+    release_readings INTEGER DEFAULT 1, -- consecutive failing readings before conditions turn off
+    
     -- Station priority and customization
     priority INTEGER DEFAULT 1, -- 1=highest priority for this user
     custom_name VARCHAR(100), -- user's custom name for this station
@@ -98,6 +102,31 @@ CREATE TABLE notification_history (
     notification_type VARCHAR(50) DEFAULT 'conditions_met' -- 'conditions_met', 'weather_alert', 'test'
 );
 
+-- One row per lambda_handler run (see log_run_metrics). Existing deployments created it by hand,
+-- so only create it when missing; it is partitioned by month further down.
+CREATE TABLE IF NOT EXISTS run_metrics (
+    id BIGSERIAL PRIMARY KEY,
+    start_time TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    end_time TIMESTAMPTZ,
+    users_found INTEGER DEFAULT 0,
+    users_checked INTEGER DEFAULT 0,
+    stations_total INTEGER DEFAULT 0,
+    stations_checked INTEGER DEFAULT 0,
+    stations_with_data INTEGER DEFAULT 0,
+    stations_disabled INTEGER DEFAULT 0,
+    conditions_met_count INTEGER DEFAULT 0,
+    cooldown_blocks INTEGER DEFAULT 0,
+    notifications_sent INTEGER DEFAULT 0,
+    notification_failures INTEGER DEFAULT 0,
+    api_errors INTEGER DEFAULT 0,
+    database_errors INTEGER DEFAULT 0,
+    winter_mode BOOLEAN DEFAULT false,
+    runtime_seconds NUMERIC,
+    success BOOLEAN,
+    error_message TEXT,
+    station_details JSONB
+);
+
 -- Insert default wind stations
 INSERT INTO wind_stations (station_id, name, description, latitude, longitude, elevation_ft, timezone, api_provider, api_config) VALUES
 ('FPS', 'South Side Flight Park', 'Primary soaring site in Utah', 40.5247, -111.8638, 4500, 'America/Denver', 'synoptic', '{"lookback_minutes": 120}'),
@@ -157,10 +186,14 @@ CREATE TRIGGER update_user_preferences_updated_at BEFORE UPDATE ON user_preferen
 CREATE TRIGGER update_user_station_configs_updated_at BEFORE UPDATE ON user_station_configs FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_wind_stations_updated_at BEFORE UPDATE ON wind_stations FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Rolling condition window, for databases created before these columns were added to the table above
+ALTER TABLE user_station_configs ADD COLUMN IF NOT EXISTS window_readings INTEGER DEFAULT 3;
+ALTER TABLE user_station_configs ADD COLUMN IF NOT EXISTS release_readings INTEGER DEFAULT 1;
+
 -- Views for convenience
 
 -- View to get all user configurations with station details
-CREATE VIEW user_configurations_with_stations AS
+CREATE OR REPLACE VIEW user_configurations_with_stations AS
 SELECT 
     u.id as user_id,
     u.telegram_chat_id,
@@ -192,7 +225,9 @@ SELECT
     usc.custom_name,
     usc.is_enabled as station_enabled,
     usc.min_visibility_miles,
-    usc.max_precipitation_rate
+    usc.max_precipitation_rate,
+    usc.window_readings,
+    usc.release_readings
 FROM users u
 JOIN user_preferences up ON u.id = up.user_id
 JOIN user_station_configs usc ON u.id = usc.user_id
@@ -223,4 +258,646 @@ $$ language 'plpgsql';
 CREATE TRIGGER create_user_defaults_trigger
     AFTER INSERT ON users
     FOR EACH ROW
-    EXECUTE FUNCTION create_default_user_preferences();
\ No newline at end of file
+    EXECUTE FUNCTION create_default_user_preferences();
+
+-- Per-stage timing breakdown written by lambda_handler (see utils/profiling.py):
+-- {"fetch": {"count": 1, "total_ms": 812.4, "p50_ms": 812.4, "p95_ms": 812.4}, ...}
+ALTER TABLE run_metrics ADD COLUMN IF NOT EXISTS stage_timings JSONB;
+
+-- Cooldown lookups: newest notification per user x station
+CREATE INDEX IF NOT EXISTS idx_notification_history_user_station_sent
+    ON notification_history(user_id, station_id, sent_at DESC);
+
+-- Latest notification per user x station, kept current by trigger so cooldown checks are a
+-- primary-key lookup however long notification_history grows
+CREATE TABLE IF NOT EXISTS user_station_last_notified (
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    station_id UUID REFERENCES wind_stations(id) ON DELETE CASCADE,
+    last_sent_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (user_id, station_id)
+);
+
+ALTER TABLE user_station_last_notified ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own last notifications" ON user_station_last_notified FOR SELECT USING (
+    user_id IN (SELECT id FROM users WHERE auth.uid()::text = id::text)
+);
+
+CREATE OR REPLACE FUNCTION update_user_station_last_notified()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.user_id IS NOT NULL AND NEW.station_id IS NOT NULL THEN
+        INSERT INTO user_station_last_notified (user_id, station_id, last_sent_at)
+        VALUES (NEW.user_id, NEW.station_id, NEW.sent_at)
+        ON CONFLICT (user_id, station_id)
+        DO UPDATE SET last_sent_at = GREATEST(user_station_last_notified.last_sent_at, EXCLUDED.last_sent_at);
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_user_station_last_notified_trigger ON notification_history;
+CREATE TRIGGER update_user_station_last_notified_trigger
+    AFTER INSERT ON notification_history
+    FOR EACH ROW
+    EXECUTE FUNCTION update_user_station_last_notified();
+
+-- Backfill from existing history
+INSERT INTO user_station_last_notified (user_id, station_id, last_sent_at)
+SELECT user_id, station_id, MAX(sent_at)
+FROM notification_history
+WHERE user_id IS NOT NULL AND station_id IS NOT NULL
+GROUP BY user_id, station_id
+ON CONFLICT (user_id, station_id)
+DO UPDATE SET last_sent_at = GREATEST(user_station_last_notified.last_sent_at, EXCLUDED.last_sent_at);
+
+-- Subscriptions worth evaluating this run (used when SOARBOT_SQL_PREFILTER is set, see utils/prefilter.py).
+-- `summaries` holds one entry per station with the ranges of its recent readings:
+-- [{"station_id": "FPS", "min_speed": 9.1, "max_speed": 12.4, "min_direction": 150, "max_direction": 170,
+--   "min_gust_differential": 1.2, "min_precipitation": 0}, ...]
+-- Returns the subscriptions whose thresholds overlap those ranges and whose cooldown has expired;
+-- time-of-day checks and the rolling window still run in lambda_handler.
+CREATE OR REPLACE FUNCTION candidate_subscriptions(summaries JSONB)
+RETURNS TABLE (user_id UUID, station_id VARCHAR) AS $$
+    SELECT c.user_id, c.station_id
+    FROM jsonb_to_recordset(summaries) AS s(
+        station_id TEXT,
+        min_speed NUMERIC,
+        max_speed NUMERIC,
+        min_direction NUMERIC,
+        max_direction NUMERIC,
+        min_gust_differential NUMERIC,
+        min_precipitation NUMERIC
+    )
+    JOIN user_configurations_with_stations c ON c.station_id = s.station_id
+    JOIN wind_stations ws ON ws.station_id = c.station_id
+    WHERE s.max_speed >= c.wind_speed_min
+      AND s.min_speed <= c.wind_speed_max
+      AND s.max_direction >= c.wind_direction_min
+      AND s.min_direction <= c.wind_direction_max
+      AND s.min_gust_differential <= c.max_gust_differential
+      AND s.min_precipitation <= 0
+      AND NOT EXISTS (
+          SELECT 1
+          FROM user_station_last_notified ln
+          WHERE ln.user_id = c.user_id
+            AND ln.station_id = ws.id
+            AND ln.last_sent_at > NOW() - make_interval(hours => COALESCE(c.notification_cooldown_hours, 4))
+      );
+$$ LANGUAGE sql STABLE;
+
+-- ---------------------------------------------------------------------------
+-- Monthly partitioning, rollups and retention for notification_history and run_metrics
+-- ---------------------------------------------------------------------------
+
+-- Create the monthly partitions of `parent` (named <parent>_YYYY_MM) from `start_month` up to
+-- `months_ahead` months past the current one
+CREATE OR REPLACE FUNCTION create_monthly_partitions(
+    parent TEXT, start_month DATE DEFAULT NULL, months_ahead INTEGER DEFAULT 2
+)
+RETURNS void AS $$
+DECLARE
+    month_start DATE := date_trunc('month', COALESCE(start_month, CURRENT_DATE))::DATE;
+    last_month DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead))::DATE;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            parent || '_' || to_char(month_start, 'YYYY_MM'),
+            parent,
+            month_start,
+            (month_start + INTERVAL '1 month')::DATE
+        );
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+END;
+$$ language 'plpgsql';
+
+-- Drop monthly partitions of `parent` whose whole month is older than `keep`
+CREATE OR REPLACE FUNCTION drop_monthly_partitions(parent TEXT, keep INTERVAL)
+RETURNS INTEGER AS $$
+DECLARE
+    child TEXT;
+    dropped INTEGER := 0;
+BEGIN
+    FOR child IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = parent::regclass
+          AND c.relname ~ ('^' || parent || '_[0-9]{4}_[0-9]{2}$')
+    LOOP
+        IF to_date(right(child, 7), 'YYYY_MM') + INTERVAL '1 month' <= NOW() - keep THEN
+            EXECUTE format('DROP TABLE %I', child);
+            dropped := dropped + 1;
+        END IF;
+    END LOOP;
+    RETURN dropped;
+END;
+$$ language 'plpgsql';
+
+-- Convert a plain table with an `id` column into one range-partitioned by month on `partition_column`,
+-- keeping its rows, column defaults and id sequence. Indexes, foreign keys, triggers and RLS
+-- policies are re-created by the caller. Does nothing if the table is already partitioned.
+-- `partition_column` becomes part of the primary key and so NOT NULL; existing rows without a
+-- timestamp are kept with it set to '-infinity', which only the DEFAULT partition accepts.
+CREATE OR REPLACE FUNCTION partition_by_month(table_name TEXT, partition_column TEXT)
+RETURNS void AS $$
+DECLARE
+    old_table TEXT := table_name || '_unpartitioned';
+    id_sequence TEXT;
+    first_month DATE;
+    next_id BIGINT;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = table_name::regclass) THEN
+        RETURN;
+    END IF;
+
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', table_name, old_table);
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (%I)',
+        table_name, old_table, partition_column
+    );
+    -- The renamed table still holds <table>_pkey, so the new key gets its own name
+    EXECUTE format(
+        'ALTER TABLE %I ADD CONSTRAINT %I PRIMARY KEY (id, %I)',
+        table_name, table_name || '_partitioned_pkey', partition_column
+    );
+
+    -- Keep generating ids after the old table is dropped: move serial sequences over, and turn
+    -- identity columns (not allowed on partitioned tables before Postgres 17) into sequence defaults
+    id_sequence := pg_get_serial_sequence(old_table, 'id');
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns c
+        WHERE c.table_schema = current_schema() AND c.table_name = old_table
+          AND c.column_name = 'id' AND c.is_identity = 'YES'
+    ) THEN
+        -- The identity's sequence (usually already named <table>_id_seq) is dropped with the identity,
+        -- so carry its position over to a plain sequence
+        EXECUTE format('SELECT nextval(%L)', id_sequence) INTO next_id;
+        EXECUTE format('ALTER TABLE %I ALTER COLUMN id DROP IDENTITY', old_table);
+        id_sequence := quote_ident(table_name || '_id_seq');
+        EXECUTE format('CREATE SEQUENCE %s', id_sequence);
+        EXECUTE format('SELECT setval(%L, %s, false)', id_sequence, next_id);
+        EXECUTE format('ALTER TABLE %I ALTER COLUMN id SET DEFAULT nextval(%L)', table_name, id_sequence);
+    END IF;
+    IF id_sequence IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY %I.id', id_sequence, table_name);
+    END IF;
+
+    -- Rows outside the created months land here instead of failing
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', table_name || '_default', table_name);
+    EXECUTE format('SELECT MIN(%I)::DATE FROM %I', partition_column, old_table) INTO first_month;
+    PERFORM create_monthly_partitions(table_name, first_month);
+    EXECUTE format(
+        'UPDATE %I SET %I = ''-infinity'' WHERE %I IS NULL', old_table, partition_column, partition_column
+    );
+
+    EXECUTE format('INSERT INTO %I SELECT * FROM %I', table_name, old_table);
+    EXECUTE format('DROP TABLE %I', old_table);
+END;
+$$ language 'plpgsql';
+
+SELECT partition_by_month('notification_history', 'sent_at');
+
+ALTER TABLE notification_history
+    DROP CONSTRAINT IF EXISTS notification_history_user_id_fkey,
+    ADD CONSTRAINT notification_history_user_id_fkey
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    DROP CONSTRAINT IF EXISTS notification_history_station_id_fkey,
+    ADD CONSTRAINT notification_history_station_id_fkey
+        FOREIGN KEY (station_id) REFERENCES wind_stations(id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS idx_notification_history_user_id ON notification_history(user_id);
+CREATE INDEX IF NOT EXISTS idx_notification_history_sent_at ON notification_history(sent_at);
+CREATE INDEX IF NOT EXISTS idx_notification_history_station_id ON notification_history(station_id);
+CREATE INDEX IF NOT EXISTS idx_notification_history_user_station_sent
+    ON notification_history(user_id, station_id, sent_at DESC);
+ALTER TABLE notification_history ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Users can view own notifications" ON notification_history;
+CREATE POLICY "Users can view own notifications" ON notification_history FOR SELECT USING (
+    user_id IN (SELECT id FROM users WHERE auth.uid()::text = id::text)
+);
+DROP TRIGGER IF EXISTS update_user_station_last_notified_trigger ON notification_history;
+CREATE TRIGGER update_user_station_last_notified_trigger
+    AFTER INSERT ON notification_history
+    FOR EACH ROW
+    EXECUTE FUNCTION update_user_station_last_notified();
+
+-- Any RLS policies added to run_metrics by hand need re-applying after conversion
+SELECT partition_by_month('run_metrics', 'start_time');
+CREATE INDEX IF NOT EXISTS idx_run_metrics_start_time ON run_metrics(start_time DESC);
+
+-- Run totals per hour (UTC) and per day; the dashboard reads these for ranges beyond a day.
+-- stage_timings holds {"fetch": {"total_ms": ...}, ...} summed over the `timed_runs` runs that recorded them.
+CREATE TABLE IF NOT EXISTS run_metrics_hourly (
+    bucket TIMESTAMPTZ PRIMARY KEY,
+    runs INTEGER NOT NULL,
+    successful_runs INTEGER NOT NULL,
+    winter_runs INTEGER NOT NULL,
+    users_checked BIGINT NOT NULL,
+    stations_checked BIGINT NOT NULL,
+    conditions_met_count BIGINT NOT NULL,
+    cooldown_blocks BIGINT NOT NULL,
+    notifications_sent BIGINT NOT NULL,
+    notification_failures BIGINT NOT NULL,
+    api_errors BIGINT NOT NULL,
+    database_errors BIGINT NOT NULL,
+    total_runtime_seconds NUMERIC NOT NULL,
+    max_runtime_seconds NUMERIC NOT NULL,
+    timed_runs INTEGER NOT NULL,
+    stage_timings JSONB NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS run_metrics_daily (LIKE run_metrics_hourly INCLUDING ALL);
+
+-- Per-station outcomes per hour (UTC) and per day, from run_metrics.station_details
+CREATE TABLE IF NOT EXISTS station_metrics_hourly (
+    bucket TIMESTAMPTZ NOT NULL,
+    station_id VARCHAR(20) NOT NULL,
+    station_name VARCHAR(100),
+    checks BIGINT NOT NULL,
+    with_data BIGINT NOT NULL,
+    api_errors BIGINT NOT NULL,
+    conditions_met BIGINT NOT NULL,
+    cooldown_blocks BIGINT NOT NULL,
+    notifications_sent BIGINT NOT NULL,
+    avg_wind_speed NUMERIC,
+    max_wind_speed NUMERIC,
+    max_wind_gust NUMERIC,
+    PRIMARY KEY (bucket, station_id)
+);
+CREATE TABLE IF NOT EXISTS station_metrics_daily (LIKE station_metrics_hourly INCLUDING ALL);
+
+-- Notifications per user x station per day, kept after the raw rows are dropped
+CREATE TABLE IF NOT EXISTS notification_history_daily (
+    day DATE NOT NULL,
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    station_id UUID REFERENCES wind_stations(id) ON DELETE CASCADE,
+    notifications INTEGER NOT NULL,
+    PRIMARY KEY (day, user_id, station_id)
+);
+
+ALTER TABLE run_metrics_hourly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE run_metrics_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE station_metrics_hourly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE station_metrics_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE notification_history_daily ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Run rollups are readable" ON run_metrics_hourly FOR SELECT USING (true);
+CREATE POLICY "Daily run rollups are readable" ON run_metrics_daily FOR SELECT USING (true);
+CREATE POLICY "Station rollups are readable" ON station_metrics_hourly FOR SELECT USING (true);
+CREATE POLICY "Daily station rollups are readable" ON station_metrics_daily FOR SELECT USING (true);
+CREATE POLICY "Users can view own notification rollups" ON notification_history_daily FOR SELECT USING (
+    user_id IN (SELECT id FROM users WHERE auth.uid()::text = id::text)
+);
+
+-- Recompute every rollup bucket from `since` onwards. Hourly rollups come from the raw rows
+-- and daily ones from the hourly rollups, so re-running is idempotent and daily totals survive
+-- the raw partitions being dropped.
+CREATE OR REPLACE FUNCTION refresh_rollups(since TIMESTAMPTZ DEFAULT NOW() - INTERVAL '3 hours')
+RETURNS void AS $$
+DECLARE
+    hour_start TIMESTAMPTZ := date_trunc('hour', since, 'UTC');
+    day_start TIMESTAMPTZ := date_trunc('day', since, 'UTC');
+BEGIN
+    WITH runs AS (
+        SELECT date_trunc('hour', start_time, 'UTC') AS bucket, *
+        FROM run_metrics
+        WHERE start_time >= hour_start
+    ), stages AS (
+        SELECT bucket, jsonb_object_agg(stage, jsonb_build_object('total_ms', total_ms)) AS stage_timings
+        FROM (
+            SELECT runs.bucket, t.key AS stage, ROUND(SUM((t.value->>'total_ms')::NUMERIC), 2) AS total_ms
+            FROM runs, jsonb_each(runs.stage_timings) t
+            WHERE jsonb_typeof(runs.stage_timings) = 'object'
+            GROUP BY 1, 2
+        ) per_stage
+        GROUP BY bucket
+    )
+    INSERT INTO run_metrics_hourly
+    SELECT
+        runs.bucket,
+        COUNT(*),
+        COUNT(*) FILTER (WHERE runs.success),
+        COUNT(*) FILTER (WHERE runs.winter_mode),
+        COALESCE(SUM(runs.users_checked), 0),
+        COALESCE(SUM(runs.stations_checked), 0),
+        COALESCE(SUM(runs.conditions_met_count), 0),
+        COALESCE(SUM(runs.cooldown_blocks), 0),
+        COALESCE(SUM(runs.notifications_sent), 0),
+        COALESCE(SUM(runs.notification_failures), 0),
+        COALESCE(SUM(runs.api_errors), 0),
+        COALESCE(SUM(runs.database_errors), 0),
+        COALESCE(SUM(runs.runtime_seconds), 0),
+        COALESCE(MAX(runs.runtime_seconds), 0),
+        COUNT(*) FILTER (WHERE jsonb_typeof(runs.stage_timings) = 'object'),
+        COALESCE(stages.stage_timings, '{}')
+    FROM runs
+    LEFT JOIN stages ON stages.bucket = runs.bucket
+    GROUP BY runs.bucket, stages.stage_timings
+    ON CONFLICT (bucket) DO UPDATE SET
+        runs = EXCLUDED.runs,
+        successful_runs = EXCLUDED.successful_runs,
+        winter_runs = EXCLUDED.winter_runs,
+        users_checked = EXCLUDED.users_checked,
+        stations_checked = EXCLUDED.stations_checked,
+        conditions_met_count = EXCLUDED.conditions_met_count,
+        cooldown_blocks = EXCLUDED.cooldown_blocks,
+        notifications_sent = EXCLUDED.notifications_sent,
+        notification_failures = EXCLUDED.notification_failures,
+        api_errors = EXCLUDED.api_errors,
+        database_errors = EXCLUDED.database_errors,
+        total_runtime_seconds = EXCLUDED.total_runtime_seconds,
+        max_runtime_seconds = EXCLUDED.max_runtime_seconds,
+        timed_runs = EXCLUDED.timed_runs,
+        stage_timings = EXCLUDED.stage_timings;
+
+    INSERT INTO station_metrics_hourly
+    SELECT
+        date_trunc('hour', r.start_time, 'UTC') AS bucket,
+        d->>'station_id',
+        MAX(d->>'station_name'),
+        COUNT(*) FILTER (WHERE (d->>'enabled')::BOOLEAN),
+        COUNT(*) FILTER (WHERE (d->>'has_data')::BOOLEAN),
+        COUNT(*) FILTER (WHERE d->>'api_error' IS NOT NULL),
+        COUNT(*) FILTER (WHERE (d->'conditions_result'->>'overall_met')::BOOLEAN),
+        COUNT(*) FILTER (WHERE (d->>'cooldown_active')::BOOLEAN),
+        COUNT(*) FILTER (WHERE (d->>'notification_sent')::BOOLEAN),
+        ROUND(AVG((d->'latest_weather_data'->'wind_speeds'->> -1)::NUMERIC), 1),
+        MAX((d->'latest_weather_data'->'wind_speeds'->> -1)::NUMERIC),
+        MAX((d->'latest_weather_data'->'wind_gusts'->> -1)::NUMERIC)
+    FROM run_metrics r, jsonb_array_elements(r.station_details) d
+    WHERE r.start_time >= hour_start AND jsonb_typeof(r.station_details) = 'array'
+    GROUP BY 1, 2
+    ON CONFLICT (bucket, station_id) DO UPDATE SET
+        station_name = EXCLUDED.station_name,
+        checks = EXCLUDED.checks,
+        with_data = EXCLUDED.with_data,
+        api_errors = EXCLUDED.api_errors,
+        conditions_met = EXCLUDED.conditions_met,
+        cooldown_blocks = EXCLUDED.cooldown_blocks,
+        notifications_sent = EXCLUDED.notifications_sent,
+        avg_wind_speed = EXCLUDED.avg_wind_speed,
+        max_wind_speed = EXCLUDED.max_wind_speed,
+        max_wind_gust = EXCLUDED.max_wind_gust;
+
+    WITH hours AS (
+        SELECT date_trunc('day', bucket, 'UTC') AS day_bucket, *
+        FROM run_metrics_hourly
+        WHERE bucket >= day_start
+    ), stages AS (
+        SELECT day_bucket, jsonb_object_agg(stage, jsonb_build_object('total_ms', total_ms)) AS stage_timings
+        FROM (
+            SELECT hours.day_bucket, t.key AS stage, ROUND(SUM((t.value->>'total_ms')::NUMERIC), 2) AS total_ms
+            FROM hours, jsonb_each(hours.stage_timings) t
+            GROUP BY 1, 2
+        ) per_stage
+        GROUP BY day_bucket
+    )
+    INSERT INTO run_metrics_daily
+    SELECT
+        hours.day_bucket,
+        SUM(hours.runs),
+        SUM(hours.successful_runs),
+        SUM(hours.winter_runs),
+        SUM(hours.users_checked),
+        SUM(hours.stations_checked),
+        SUM(hours.conditions_met_count),
+        SUM(hours.cooldown_blocks),
+        SUM(hours.notifications_sent),
+        SUM(hours.notification_failures),
+        SUM(hours.api_errors),
+        SUM(hours.database_errors),
+        SUM(hours.total_runtime_seconds),
+        MAX(hours.max_runtime_seconds),
+        SUM(hours.timed_runs),
+        COALESCE(stages.stage_timings, '{}')
+    FROM hours
+    LEFT JOIN stages ON stages.day_bucket = hours.day_bucket
+    GROUP BY hours.day_bucket, stages.stage_timings
+    ON CONFLICT (bucket) DO UPDATE SET
+        runs = EXCLUDED.runs,
+        successful_runs = EXCLUDED.successful_runs,
+        winter_runs = EXCLUDED.winter_runs,
+        users_checked = EXCLUDED.users_checked,
+        stations_checked = EXCLUDED.stations_checked,
+        conditions_met_count = EXCLUDED.conditions_met_count,
+        cooldown_blocks = EXCLUDED.cooldown_blocks,
+        notifications_sent = EXCLUDED.notifications_sent,
+        notification_failures = EXCLUDED.notification_failures,
+        api_errors = EXCLUDED.api_errors,
+        database_errors = EXCLUDED.database_errors,
+        total_runtime_seconds = EXCLUDED.total_runtime_seconds,
+        max_runtime_seconds = EXCLUDED.max_runtime_seconds,
+        timed_runs = EXCLUDED.timed_runs,
+        stage_timings = EXCLUDED.stage_timings;
+
+    INSERT INTO station_metrics_daily
+    SELECT
+        date_trunc('day', h.bucket, 'UTC') AS bucket,
+        h.station_id,
+        MAX(h.station_name),
+        SUM(h.checks),
+        SUM(h.with_data),
+        SUM(h.api_errors),
+        SUM(h.conditions_met),
+        SUM(h.cooldown_blocks),
+        SUM(h.notifications_sent),
+        ROUND(AVG(h.avg_wind_speed), 1),
+        MAX(h.max_wind_speed),
+        MAX(h.max_wind_gust)
+    FROM station_metrics_hourly h
+    WHERE h.bucket >= day_start
+    GROUP BY 1, 2
+    ON CONFLICT (bucket, station_id) DO UPDATE SET
+        station_name = EXCLUDED.station_name,
+        checks = EXCLUDED.checks,
+        with_data = EXCLUDED.with_data,
+        api_errors = EXCLUDED.api_errors,
+        conditions_met = EXCLUDED.conditions_met,
+        cooldown_blocks = EXCLUDED.cooldown_blocks,
+        notifications_sent = EXCLUDED.notifications_sent,
+        avg_wind_speed = EXCLUDED.avg_wind_speed,
+        max_wind_speed = EXCLUDED.max_wind_speed,
+        max_wind_gust = EXCLUDED.max_wind_gust;
+
+    INSERT INTO notification_history_daily
+    SELECT (n.sent_at AT TIME ZONE 'UTC')::DATE, n.user_id, n.station_id, COUNT(*)
+    FROM notification_history n
+    WHERE n.sent_at >= day_start AND n.user_id IS NOT NULL AND n.station_id IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, user_id, station_id) DO UPDATE SET notifications = EXCLUDED.notifications;
+END;
+$$ language 'plpgsql';
+
+-- Hourly upkeep: partitions for the coming months, rollups for recent hours, then retention.
+-- Raw run_metrics rows are dropped with their monthly partition once older than `run_metrics_keep`;
+-- notification_history keeps rows for `notification_keep` but loses the station_data snapshot
+-- (the bulk of each row) after `snapshot_keep`.
+CREATE OR REPLACE FUNCTION soarbot_maintenance(
+    run_metrics_keep INTERVAL DEFAULT INTERVAL '2 months',
+    notification_keep INTERVAL DEFAULT INTERVAL '13 months',
+    snapshot_keep INTERVAL DEFAULT INTERVAL '30 days'
+)
+RETURNS void AS $$
+BEGIN
+    PERFORM create_monthly_partitions('run_metrics');
+    PERFORM create_monthly_partitions('notification_history');
+    PERFORM refresh_rollups();
+
+    UPDATE notification_history
+    SET station_data = NULL
+    WHERE sent_at < NOW() - snapshot_keep
+      AND sent_at >= NOW() - snapshot_keep - INTERVAL '2 days'
+      AND station_data IS NOT NULL;
+
+    PERFORM drop_monthly_partitions('run_metrics', run_metrics_keep);
+    PERFORM drop_monthly_partitions('notification_history', notification_keep);
+END;
+$$ language 'plpgsql';
+
+-- Build rollups for the history that is already there
+SELECT refresh_rollups(COALESCE(
+    LEAST((SELECT MIN(start_time) FROM run_metrics), (SELECT MIN(sent_at) FROM notification_history)), NOW()
+));
+UPDATE notification_history SET station_data = NULL WHERE sent_at < NOW() - INTERVAL '30 days';
+
+-- Schedule the upkeep with pg_cron where the extension is enabled (Supabase: Database > Extensions);
+-- otherwise run `SELECT soarbot_maintenance();` hourly from any scheduler
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule('soarbot-maintenance', '7 * * * *', 'SELECT soarbot_maintenance()');
+    END IF;
+END $$;
+
+-- ---------------------------------------------------------------------------
+-- Dashboard queries: aggregated server-side so the browser never downloads whole station_details blobs
+-- ---------------------------------------------------------------------------
+
+-- Summary totals for a range in one row. Short ranges and the most recent hours come from raw
+-- run_metrics; everything older comes from run_metrics_hourly, so a month costs a few hundred rows.
+CREATE OR REPLACE FUNCTION run_totals(range_start TIMESTAMPTZ, range_end TIMESTAMPTZ)
+RETURNS TABLE (
+    runs BIGINT,
+    successful_runs BIGINT,
+    notifications_sent BIGINT,
+    total_runtime_seconds NUMERIC,
+    timed_runs BIGINT,
+    stage_timings JSONB
+) AS $$
+    WITH bounds AS (
+        -- Rollups are refreshed hourly for the last few hours; anything newer than this is read raw
+        SELECT CASE
+            WHEN range_end - range_start <= INTERVAL '1 day' THEN range_start
+            ELSE GREATEST(range_start, date_trunc('hour', NOW(), 'UTC') - INTERVAL '1 hour')
+        END AS raw_from
+    ), raw AS (
+        SELECT r.success, r.notifications_sent, r.runtime_seconds, r.stage_timings
+        FROM run_metrics r, bounds b
+        WHERE r.start_time >= b.raw_from AND r.start_time <= range_end
+    ), rolled AS (
+        SELECT h.*
+        FROM run_metrics_hourly h, bounds b
+        WHERE h.bucket >= date_trunc('hour', range_start, 'UTC') AND h.bucket < LEAST(range_end, b.raw_from)
+    ), stages AS (
+        SELECT t.key AS stage, SUM((t.value->>'total_ms')::NUMERIC) AS total_ms
+        FROM (
+            SELECT stage_timings FROM raw
+            UNION ALL
+            SELECT stage_timings FROM rolled
+        ) s,
+        jsonb_each(CASE WHEN jsonb_typeof(s.stage_timings) = 'object' THEN s.stage_timings END) t
+        GROUP BY t.key
+    )
+    SELECT
+        ((SELECT COUNT(*) FROM raw) + (SELECT COALESCE(SUM(runs), 0) FROM rolled))::BIGINT,
+        ((SELECT COUNT(*) FILTER (WHERE success) FROM raw)
+            + (SELECT COALESCE(SUM(successful_runs), 0) FROM rolled))::BIGINT,
+        ((SELECT COALESCE(SUM(notifications_sent), 0) FROM raw)
+            + (SELECT COALESCE(SUM(notifications_sent), 0) FROM rolled))::BIGINT,
+        ((SELECT COALESCE(SUM(runtime_seconds), 0) FROM raw)
+            + (SELECT COALESCE(SUM(total_runtime_seconds), 0) FROM rolled))::NUMERIC,
+        ((SELECT COUNT(*) FILTER (WHERE jsonb_typeof(stage_timings) = 'object') FROM raw)
+            + (SELECT COALESCE(SUM(timed_runs), 0) FROM rolled))::BIGINT,
+        COALESCE(
+            (SELECT jsonb_object_agg(stage, jsonb_build_object('total_ms', ROUND(total_ms, 2))) FROM stages),
+            '{}'
+        );
+$$ LANGUAGE sql STABLE;
+
+-- Per-station series for a range: one point per run for up to two days (read from the latest
+-- reading in each run's station_details), hourly rollups up to two weeks, daily rollups beyond.
+-- Wind direction is only available per run.
+CREATE OR REPLACE FUNCTION station_time_series(range_start TIMESTAMPTZ, range_end TIMESTAMPTZ)
+RETURNS TABLE (
+    bucket TIMESTAMPTZ,
+    station_id TEXT,
+    station_name TEXT,
+    checks BIGINT,
+    conditions_met BIGINT,
+    notifications_sent BIGINT,
+    avg_wind_speed NUMERIC,
+    max_wind_gust NUMERIC,
+    avg_wind_direction NUMERIC
+) AS $$
+    SELECT * FROM (
+        SELECT
+            r.start_time,
+            d->>'station_id',
+            MAX(d->>'station_name'),
+            COUNT(*) FILTER (WHERE (d->>'enabled')::BOOLEAN),
+            COUNT(*) FILTER (WHERE (d->'conditions_result'->>'overall_met')::BOOLEAN),
+            COUNT(*) FILTER (WHERE (d->>'notification_sent')::BOOLEAN),
+            ROUND(AVG((d->'latest_weather_data'->'wind_speeds'->> -1)::NUMERIC), 1),
+            MAX((d->'latest_weather_data'->'wind_gusts'->> -1)::NUMERIC),
+            ROUND(AVG((d->'latest_weather_data'->'wind_directions'->> -1)::NUMERIC), 0)
+        FROM run_metrics r,
+        jsonb_array_elements(CASE WHEN jsonb_typeof(r.station_details) = 'array' THEN r.station_details END) d
+        WHERE range_end - range_start <= INTERVAL '2 days'
+          AND r.start_time >= range_start AND r.start_time <= range_end
+        GROUP BY 1, 2
+
+        UNION ALL
+
+        SELECT h.bucket, h.station_id, h.station_name, h.checks, h.conditions_met, h.notifications_sent,
+               h.avg_wind_speed, h.max_wind_gust, NULL::NUMERIC
+        FROM station_metrics_hourly h
+        WHERE range_end - range_start > INTERVAL '2 days'
+          AND range_end - range_start <= INTERVAL '14 days'
+          AND h.bucket >= date_trunc('hour', range_start, 'UTC') AND h.bucket <= range_end
+
+        UNION ALL
+
+        SELECT dly.bucket, dly.station_id, dly.station_name, dly.checks, dly.conditions_met,
+               dly.notifications_sent, dly.avg_wind_speed, dly.max_wind_gust, NULL::NUMERIC
+        FROM station_metrics_daily dly
+        WHERE range_end - range_start > INTERVAL '14 days'
+          AND dly.bucket >= date_trunc('day', range_start, 'UTC') AND dly.bucket <= range_end
+    ) series
+    ORDER BY 1, 2;
+$$ LANGUAGE sql STABLE;
+
+-- One page of station checks, newest runs first: every station_details entry of up to `max_runs`
+-- runs that started before `before_time` (null for the first page). Pass the oldest start_time of a
+-- page as the next `before_time`; whole runs are returned, so no run is split across pages.
+-- Runs without details appear once with a null detail, keeping the cursor moving.
+CREATE OR REPLACE FUNCTION station_details_page(
+    range_start TIMESTAMPTZ,
+    range_end TIMESTAMPTZ,
+    before_time TIMESTAMPTZ DEFAULT NULL,
+    max_runs INTEGER DEFAULT 20
+)
+RETURNS TABLE (run_id TEXT, start_time TIMESTAMPTZ, winter_mode BOOLEAN, detail JSONB) AS $$
+    SELECT page.id::TEXT, page.start_time, page.winter_mode, d.detail
+    FROM (
+        SELECT r.id, r.start_time, r.winter_mode, r.station_details
+        FROM run_metrics r
+        WHERE r.start_time >= range_start AND r.start_time <= range_end
+          AND (before_time IS NULL OR r.start_time < before_time)
+        ORDER BY r.start_time DESC
+        LIMIT max_runs
+    ) page
+    LEFT JOIN LATERAL jsonb_array_elements(
+        CASE WHEN jsonb_typeof(page.station_details) = 'array' THEN page.station_details END
+    ) WITH ORDINALITY AS d(detail, position) ON true
+    ORDER BY page.start_time DESC, d.position;
+$$ LANGUAGE sql STABLE;
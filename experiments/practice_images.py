@@ -7,27 +7,12 @@ import requests
 from PIL import Image, ImageDraw, ImageFont
 
 from configs import config
+from utils.weather_utils import format_message
 
 screen_h = 800
 screen_w = 480
 
 
-def format_message(station_data, rows=6, html=True):
-    if html:
-        message = "<pre>"  # ""TIME  |  WIND SPEEDgGUST | WIND DIRECTION \n"
-    else:
-        message = "       Speed   Dir \n"
-    for index, row in station_data.tail(rows).iloc[::-1].iterrows():
-        #wind_combo = f'{row["wind_speed_set_1"]:1.0f}g{row["wind_gust_set_1"]:1.0f}'
-        message += '{:%H:%M} {:>3.0f}g{:<2.0f}   {:<5} \n'.format(
-            row['date_time'], 
-            row["wind_speed_set_1"],row["wind_gust_set_1"],
-            row['wind_cardinal_direction_set_1d'])
-    if html:
-        message += '</pre>'
-    return message
-
-
 def get_station_data(lookback_minutes=30):
     request_string = 'https://api.synopticdata.com/v2/stations/timeseries?' \
                      'token={token}&' \
@@ -49,7 +34,7 @@ def get_station_data(lookback_minutes=30):
 
 
 def draw_station_data(draw, station_data, left, top, right, bottom):
-    text = format_message(station_data, rows=10, html=False)
+    text = format_message(station_data, rows=10, message_format='eink')
     font18 = ImageFont.truetype('./fonts/mononoki-Regular.ttf', 20)
     draw.text((left, top), text, font=font18)
 
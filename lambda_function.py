@@ -1,16 +1,39 @@
+import argparse
 import json
 import os
 import requests
 import datetime
+import pandas as pd
 import pytz
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
 from supabase import create_client, Client
 import logging
 from logging.handlers import RotatingFileHandler
 from utils.serialization import make_serializable
+from utils.charts import ChartCache
+from utils.conditions import RollingConditionEngine, WindowState
+from utils.config_snapshot import CACHE_DIR, ConfigSnapshotCache
+from utils.fetch_schedule import FetchScheduler
+from utils.process_pool import eval_workers, map_over_stations, snapshot_frame
+from utils.prefilter import fetch_candidates, prefilter_enabled, station_summaries, summary_readings
+from utils.profiling import StageTimer, maybe_profile
+from utils.providers import station_requests
+from utils.records import StationDetail, StationSubscription, UserConfig, build_user_configs
+from utils.sharding import (
+    merge_run_metrics,
+    parse_shard_spec,
+    read_shard_metrics,
+    shard_metrics_paths,
+    shard_of,
+    shard_path,
+    write_shard_metrics,
+)
 # Import existing weather utilities
-from utils.weather_utils import get_station_data, check_winter, format_message
+from utils.weather_utils import check_winter, format_message
+from utils.sun_times import is_daytime as is_sun_daytime
+from utils.telegram_cache import TelegramCache, content_hash
+from utils.time_context import DAYTIME_HOURS, MIDDAY_HOURS, TimeContext, in_quiet_hours
 
 # Load environment variables
 from dotenv import load_dotenv
@@ -37,9 +60,46 @@ supabase: Client = create_client(
     os.getenv("SUPABASE_SERVICE_ROLE_KEY") or "",
 )
 
+# Overridable so load tests can point at a local stand-in
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+# Outcomes of send_telegram_message
+MESSAGE_SENT = "sent"
+MESSAGE_SKIPPED = "skipped"
+MESSAGE_FAILED = "failed"
+
 # Cache for station code -> UUID resolution
 STATION_CODE_UUID_CACHE: Dict[str, str] = {}
 
+# Cleared on the first failed read, e.g. before the user_station_last_notified migration is applied
+LAST_NOTIFIED_TABLE_AVAILABLE = True
+
+# Local copy of user_configurations_with_stations, refreshed incrementally each run
+CONFIG_SNAPSHOT_PATH = os.path.join(CACHE_DIR, "config_snapshot.json")
+CONFIG_SNAPSHOT = ConfigSnapshotCache(supabase, CONFIG_SNAPSHOT_PATH)
+
+# Learned observation cadence and last fetched observations per station
+FETCH_SCHEDULE_PATH = os.path.join(CACHE_DIR, "fetch_schedule.json")
+FETCH_SCHEDULE = FetchScheduler(FETCH_SCHEDULE_PATH)
+
+# Rolling-window condition state per user x station, carried between runs
+CONDITION_STATE_PATH = os.path.join(CACHE_DIR, "condition_state.json")
+CONDITION_ENGINE = RollingConditionEngine(CONDITION_STATE_PATH)
+
+# Sharded runs write their run_metrics here for the merge step instead of to Supabase
+SHARD_METRICS_DIR = os.getenv("SOARBOT_SHARD_METRICS_DIR", "shard_metrics")
+
+# Wind chart PNGs per (station, latest observation), rendered once per run
+CHART_CACHE = ChartCache()
+
+# Telegram file_ids by content hash and recent message hashes per chat, for upload reuse and retry dedup
+TELEGRAM_CACHE_PATH = os.path.join(CACHE_DIR, "telegram_cache.sqlite3")
+TELEGRAM_CACHE = TelegramCache(TELEGRAM_CACHE_PATH)
+
+# Rendered weather tables keyed by (station, latest observation, rows, format); shared by all recipients.
+# Cleared at the start of every run, so a long-lived process doesn't keep every observation's table
+WEATHER_TABLE_CACHE: Dict[Tuple[str, str, int, str], str] = {}
+
 
 def resolve_station_uuid(station_identifier: Optional[str]) -> Optional[str]:
     """Return a UUID string for a station identifier.
@@ -86,206 +146,203 @@ def resolve_station_uuid(station_identifier: Optional[str]) -> Optional[str]:
 
 def send_telegram_message(
     chat_id: str, text: str, telegram_token: str, parse_mode: str = "HTML"
-) -> bool:
-    """Send a message to a Telegram chat"""
-    api_url = f"https://api.telegram.org/bot{telegram_token}/sendMessage"
+) -> str:
+    """Send a message to a Telegram chat, skipping it if the same text already went there recently
+
+    Returns MESSAGE_SENT, MESSAGE_SKIPPED (duplicate, nothing sent) or MESSAGE_FAILED.
+    """
+    api_url = f"{TELEGRAM_API_URL}/bot{telegram_token}/sendMessage"
+    key = content_hash(text)
+    if TELEGRAM_CACHE.was_sent(chat_id, key):
+        logger.info(f"Skipping duplicate message to chat {chat_id}")
+        return MESSAGE_SKIPPED
 
     try:
         response = requests.post(
             api_url, json={"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
         )
-        return response.status_code == 200
+        if response.status_code != 200:
+            return MESSAGE_FAILED
+        TELEGRAM_CACHE.record_sent(chat_id, key)
+        return MESSAGE_SENT
     except Exception as e:
         logger.error(f"Failed to send Telegram message: {e}")
-        return False
+        return MESSAGE_FAILED
 
 
-def get_active_users_with_configs() -> List[Dict[str, Any]]:
-    """Fetch all active users and their multi-station configurations from Supabase"""
+def send_telegram_photo(
+    chat_id: str, photo, telegram_token: str, caption: str = ""
+) -> Optional[str]:
+    """Send a photo (PNG bytes, or the file_id of an earlier upload); returns Telegram's file_id"""
+    api_url = f"{TELEGRAM_API_URL}/bot{telegram_token}/sendPhoto"
+    data = {"chat_id": chat_id, "caption": caption}
+
     try:
-        result = (
-            supabase.table("user_configurations_with_stations").select("*").execute()
-        )
+        if isinstance(photo, bytes):
+            response = requests.post(
+                api_url, data=data, files={"photo": ("chart.png", photo, "image/png")}
+            )
+        else:
+            response = requests.post(api_url, data=dict(data, photo=photo))
+        if response.status_code != 200:
+            return None
+        # Telegram returns every size it stored; they share one upload, any id can be re-sent
+        return response.json()["result"]["photo"][-1]["file_id"]
+    except Exception as e:
+        logger.error(f"Failed to send Telegram photo: {e}")
+        return None
 
-        # Group by user_id to organize multiple stations per user
-        users_dict = {}
-        for row in result.data:
-            user_id = row["user_id"]
-            if user_id not in users_dict:
-                users_dict[user_id] = {
-                    "user_id": user_id,
-                    "telegram_chat_id": row["telegram_chat_id"],
-                    "username": row["username"],
-                    "first_name": row["first_name"],
-                    "last_name": row["last_name"],
-                    "preferences": {
-                        "notification_cooldown_hours": row[
-                            "notification_cooldown_hours"
-                        ],
-                        "timezone": row["timezone"],
-                        "notifications_enabled": row["notifications_enabled"],
-                        "include_weather_chart": row["include_weather_chart"],
-                        "message_rows": row["message_rows"],
-                        "enable_winter_midday": row["enable_winter_midday"],
-                        "quiet_hours_start": row.get("quiet_hours_start"),
-                        "quiet_hours_end": row.get("quiet_hours_end"),
-                    },
-                    "stations": [],
-                }
 
-            # Add station configuration
-            station_config = {
-                "station_id": row["station_id"],
-                "station_name": row["station_name"],
-                "station_description": row["station_description"],
-                "api_provider": row["api_provider"],
-                "api_config": row["api_config"],
-                "wind_speed_min": row["wind_speed_min"],
-                "wind_speed_max": row["wind_speed_max"],
-                "wind_direction_min": row["wind_direction_min"],
-                "wind_direction_max": row["wind_direction_max"],
-                "max_gust_differential": row["max_gust_differential"],
-                "priority": row["priority"],
-                "custom_name": row["custom_name"],
-                "station_enabled": row["station_enabled"],
-                "min_visibility_miles": row.get("min_visibility_miles"),
-                "max_precipitation_rate": row.get("max_precipitation_rate"),
-            }
-            users_dict[user_id]["stations"].append(station_config)
+def send_weather_chart(
+    chat_id: str,
+    subscription: StationSubscription,
+    station_data,
+    telegram_token: str,
+) -> bool:
+    """Send the station's wind chart, uploading each distinct image once and re-sending it by file_id"""
+    chart_key = CHART_CACHE.key(subscription.station_id, station_data)
+    png = CHART_CACHE.png(chart_key, station_data, subscription.station_name)
+    key = content_hash(png)
+    if TELEGRAM_CACHE.was_sent(chat_id, key):
+        logger.info(f"Skipping duplicate chart to chat {chat_id}")
+        return True
+    caption = f"Wind at {subscription.display_name}"
+
+    file_id = TELEGRAM_CACHE.file_id(key)
+    if file_id:
+        if send_telegram_photo(chat_id, file_id, telegram_token, caption):
+            TELEGRAM_CACHE.record_sent(chat_id, key)
+            return True
+        # Stale or unknown id; fall back to uploading the image again
+        TELEGRAM_CACHE.forget_file_id(key)
+
+    file_id = send_telegram_photo(chat_id, png, telegram_token, caption)
+    if file_id:
+        TELEGRAM_CACHE.remember_file_id(key, file_id)
+        TELEGRAM_CACHE.record_sent(chat_id, key)
+        return True
+    return False
 
-        # Sort stations by priority for each user
-        for user_data in users_dict.values():
-            user_data["stations"].sort(key=lambda x: x["priority"])
 
-        return list(users_dict.values())
+def get_active_users_with_configs() -> List[UserConfig]:
+    """Fetch all active users and their multi-station configurations from Supabase"""
+    try:
+        rows = CONFIG_SNAPSHOT.load()
+        logger.info(f"User configurations loaded ({CONFIG_SNAPSHOT.last_sync_mode})")
+
+        # Group rows per user into typed records, stations sorted by priority
+        return build_user_configs(rows)
 
     except Exception as e:
         logger.error(f"Failed to fetch users: {e}")
         return []
 
 
-def get_station_weather_data(station_config: Dict[str, Any]) -> Optional[Any]:
-    """Get weather data for a specific station based on its configuration"""
-    try:
-        station_id = station_config["station_id"]
-        api_provider = station_config["api_provider"]
-        api_config = station_config.get("api_config", {})
-
-        if api_provider == "synoptic":
-            # Use existing function for Synoptic stations
-            if station_id == "FPS":
-                lookback_minutes = api_config.get("lookback_minutes", 120)
-                return get_station_data(lookback_minutes)
-            else:
-                # For other Synoptic stations, we'd need to modify get_station_data
-                # to accept station_id parameter
-                logger.warning(
-                    f"Synoptic station {station_id} not yet supported, using FPS data"
-                )
-                return get_station_data(api_config.get("lookback_minutes", 120))
-        else:
-            logger.warning(f"API provider {api_provider} not yet implemented")
-            return None
-
-    except Exception as e:
-        logger.error(
-            f"Failed to get weather data for station {station_config['station_id']}: {e}"
-        )
-        return None
+def get_station_weather_data(
+    subscription: StationSubscription, fetched: Dict[Tuple[str, str], Any]
+) -> Optional[Any]:
+    """Return this run's observations for a subscription's station, re-raising its fetch error"""
+    station_data = fetched.get((subscription.api_provider, subscription.station_id))
+    if isinstance(station_data, Exception):
+        raise station_data
+    return station_data
 
 
 def check_station_conditions(
     station_data,
-    station_config: Dict[str, Any],
-    user_preferences: Dict[str, Any],
+    subscription: StationSubscription,
+    user: UserConfig,
     winter: bool,
+    time_context: Optional[TimeContext] = None,
+    engine: Optional[RollingConditionEngine] = None,
 ) -> Dict[str, Any]:
-    """Check if weather conditions meet user's criteria for a specific station"""
-    if len(station_data) < 3:
+    """Check if weather conditions meet user's criteria for a specific station
+
+    `time_context` pins "now" for the whole run; a fresh one is created if omitted.
+    Weather checks come from the rolling window kept by `engine`; without one
+    the window is rebuilt from `station_data`.
+    """
+    window = subscription.window_readings
+    if len(station_data) < window:
         return {"conditions_met": False, "reason": "insufficient_data"}
 
+    if engine is None:
+        engine = RollingConditionEngine()
+    state = engine.evaluate(user.user_id, subscription, station_data)
+    passed = state.check_passed(window)
+
     conditions_result = {
         "conditions_met": False,
-        "station_id": station_config["station_id"],
-        "station_name": station_config["station_name"],
+        "station_id": subscription.station_id,
+        "station_name": subscription.station_name,
         "checks": {},
     }
+    latest = station_data.tail(window)
 
     # Check wind speed
-    last_3_wind_speeds = station_data.tail(3)["wind_speed_set_1"]
-    wind_speed_ok = (
-        (last_3_wind_speeds >= station_config["wind_speed_min"])
-        & (last_3_wind_speeds <= station_config["wind_speed_max"])
-    ).all()
     conditions_result["checks"]["wind_speed"] = {
-        "passed": wind_speed_ok,
-        "values": list(last_3_wind_speeds.round(1)),
-        "criteria": f"{station_config['wind_speed_min']}-{station_config['wind_speed_max']} mph",
+        "passed": passed["wind_speed"],
+        "values": list(latest["wind_speed_set_1"].round(1)),
+        "criteria": f"{subscription.wind_speed_min:g}-{subscription.wind_speed_max:g} mph",
     }
 
     # Check wind direction
-    last_3_wind_directions = station_data.tail(3)["wind_direction_set_1"]
-    wind_dir_ok = (
-        (last_3_wind_directions >= station_config["wind_direction_min"])
-        & (last_3_wind_directions <= station_config["wind_direction_max"])
-    ).all()
     conditions_result["checks"]["wind_direction"] = {
-        "passed": wind_dir_ok,
-        "values": list(last_3_wind_directions.round(0)),
-        "criteria": f"{station_config['wind_direction_min']}-{station_config['wind_direction_max']}°",
+        "passed": passed["wind_direction"],
+        "values": list(latest["wind_direction_set_1"].round(0)),
+        "criteria": f"{subscription.wind_direction_min:g}-{subscription.wind_direction_max:g}°",
     }
 
     # Check gusts
-    last_3_gust_diff = (
-        station_data.tail(3)["wind_gust_set_1"]
-        - station_data.tail(3)["wind_speed_set_1"]
-    )
-    gusts_ok = (last_3_gust_diff <= station_config["max_gust_differential"]).all()
+    gust_diff = latest["wind_gust_set_1"] - latest["wind_speed_set_1"]
     conditions_result["checks"]["gusts"] = {
-        "passed": gusts_ok,
-        "values": list(last_3_gust_diff.round(1)),
-        "criteria": f"≤{station_config['max_gust_differential']} mph",
+        "passed": passed["gusts"],
+        "values": list(gust_diff.round(1)),
+        "criteria": f"≤{subscription.max_gust_differential:g} mph",
     }
 
     # Check rain
-    last_3_rain = station_data.tail(3)["precip_accum_five_minute_set_1"]
-    no_rain = (last_3_rain <= 0).all()
     conditions_result["checks"]["precipitation"] = {
-        "passed": no_rain,
-        "values": list(last_3_rain),
+        "passed": passed["precipitation"],
+        "values": list(latest["precip_accum_five_minute_set_1"]),
         "criteria": "no rain",
     }
 
-    # Check time constraints using user's timezone
-    user_tz = pytz.timezone(user_preferences.get("timezone", "America/Denver"))
-    current_time = datetime.datetime.now(user_tz)
+    # Weather is "on" once every check held for the whole window, and stays on
+    # until `release_readings` consecutive readings fail
+    weather_ok = state.active
+    conditions_result["checks"]["window"] = {
+        "passed": weather_ok,
+        "failing_readings": state.fail_streak,
+        "criteria": f"all checks for {window} readings, off after {subscription.release_readings} failing",
+    }
 
-    # Check if it's daytime (6 AM to 8 PM)
-    is_daytime = 6 <= current_time.hour <= 20
+    # Check time constraints using user's timezone
+    if time_context is None:
+        time_context = TimeContext()
+    current_time = time_context.local_now(user.timezone)
+
+    # Check if it's daytime at the station (sunrise/sunset), falling back to 6 AM to 8 PM
+    if subscription.latitude is not None and subscription.longitude is not None:
+        is_daytime = is_sun_daytime(
+            subscription.latitude, subscription.longitude, current_time, user.timezone
+        )
+        daytime_criteria = "sunrise-10m to sunset-30m"
+    else:
+        is_daytime = DAYTIME_HOURS[0] <= current_time.hour <= DAYTIME_HOURS[1]
+        daytime_criteria = "6:00-20:00"
     conditions_result["checks"]["daytime"] = {
         "passed": is_daytime,
         "current_hour": current_time.hour,
-        "criteria": "6:00-20:00",
+        "criteria": daytime_criteria,
     }
 
     # Check quiet hours
-    quiet_hours_ok = True
-    if user_preferences.get("quiet_hours_start") and user_preferences.get(
-        "quiet_hours_end"
-    ):
-        quiet_start = user_preferences["quiet_hours_start"]
-        quiet_end = user_preferences["quiet_hours_end"]
-        current_time_only = current_time.time()
-
-        if quiet_start < quiet_end:
-            # Same day quiet hours (e.g., 22:00 to 06:00 next day)
-            quiet_hours_ok = not (quiet_start <= current_time_only <= quiet_end)
-        else:
-            # Quiet hours cross midnight
-            quiet_hours_ok = not (
-                current_time_only >= quiet_start or current_time_only <= quiet_end
-            )
-
+    quiet_hours_ok = not in_quiet_hours(
+        time_context.minute_of_day(user.timezone),
+        user.quiet_start_minute,
+        user.quiet_end_minute,
+    )
     conditions_result["checks"]["quiet_hours"] = {
         "passed": quiet_hours_ok,
         "current_time": current_time.strftime("%H:%M"),
@@ -293,8 +350,8 @@ def check_station_conditions(
     }
 
     # Check midday restrictions
-    if not winter and not user_preferences.get("enable_winter_midday", True):
-        is_midday = 11 <= current_time.hour <= 15
+    if not winter and not user.enable_winter_midday:
+        is_midday = MIDDAY_HOURS[0] <= current_time.hour <= MIDDAY_HOURS[1]
         midday_ok = not is_midday
     else:
         midday_ok = True
@@ -307,10 +364,7 @@ def check_station_conditions(
 
     # Overall result
     all_conditions_met = (
-        wind_speed_ok
-        and wind_dir_ok
-        and gusts_ok
-        and no_rain
+        weather_ok
         and is_daytime
         and quiet_hours_ok
         and midday_ok
@@ -320,29 +374,70 @@ def check_station_conditions(
     return conditions_result
 
 
+def get_candidate_subscriptions(
+    users: List[UserConfig], fetched_station_data: Dict[Tuple[str, str], Any]
+) -> Set[Tuple[str, str]]:
+    """(user_id, station_id) pairs the candidate_subscriptions RPC says are worth evaluating"""
+    readings = summary_readings(
+        subscription for user in users for subscription in user.stations if subscription.enabled
+    )
+    summaries = station_summaries(fetched_station_data, readings)
+    candidates = fetch_candidates(supabase, summaries)
+    logger.info(
+        f"Prefilter: {len(candidates)} candidate subscriptions from {len(summaries)} station summaries"
+    )
+    return candidates
+
+
 def get_last_notification_time(
     user_id: str, station_uuid_or_code: str
 ) -> datetime.datetime:
-    """Get the timestamp of the last notification sent to a user for a specific station"""
+    """Get the timestamp of the last notification sent to a user for a specific station
+
+    Reads the trigger-maintained user_station_last_notified table, falling back
+    to the newest notification_history row where that table does not exist yet.
+    """
+    global LAST_NOTIFIED_TABLE_AVAILABLE
     try:
         station_uuid = resolve_station_uuid(station_uuid_or_code)
         if not station_uuid:
             # No resolvable UUID → behave as if never notified
             return datetime.datetime.now(pytz.UTC) - datetime.timedelta(days=365)
-        result = (
-            supabase.table("notification_history")
-            .select("sent_at")
-            .eq("user_id", user_id)
-            .eq("station_id", station_uuid)
-            .order("sent_at", desc=True)
-            .limit(1)
-            .execute()
-        )
 
-        if result.data:
-            return datetime.datetime.fromisoformat(
-                result.data[0]["sent_at"].replace("Z", "+00:00")
+        sent_at = None
+        if LAST_NOTIFIED_TABLE_AVAILABLE:
+            try:
+                result = (
+                    supabase.table("user_station_last_notified")
+                    .select("last_sent_at")
+                    .eq("user_id", user_id)
+                    .eq("station_id", station_uuid)
+                    .limit(1)
+                    .execute()
+                )
+                if result.data:
+                    sent_at = result.data[0]["last_sent_at"]
+            except Exception as e:
+                LAST_NOTIFIED_TABLE_AVAILABLE = False
+                logger.warning(
+                    f"user_station_last_notified unavailable, reading notification_history instead: {e}"
+                )
+
+        if not LAST_NOTIFIED_TABLE_AVAILABLE:
+            result = (
+                supabase.table("notification_history")
+                .select("sent_at")
+                .eq("user_id", user_id)
+                .eq("station_id", station_uuid)
+                .order("sent_at", desc=True)
+                .limit(1)
+                .execute()
             )
+            if result.data:
+                sent_at = result.data[0]["sent_at"]
+
+        if sent_at:
+            return datetime.datetime.fromisoformat(sent_at.replace("Z", "+00:00"))
         else:
             # If no previous notifications, return a time far in the past
             return datetime.datetime.now(pytz.UTC) - datetime.timedelta(days=365)
@@ -353,49 +448,140 @@ def get_last_notification_time(
         return datetime.datetime.now(pytz.UTC) - datetime.timedelta(days=365)
 
 
+def get_weather_table(
+    station_id: str, station_data, rows: int, message_format: str = "html"
+) -> str:
+    """Return the formatted observations table, rendering it once per station observation"""
+    key = (station_id, str(station_data["date_time"].iloc[-1]), rows, message_format)
+    table = WEATHER_TABLE_CACHE.get(key)
+    if table is None:
+        table = format_message(station_data, rows=rows, message_format=message_format)
+        WEATHER_TABLE_CACHE[key] = table
+    return table
+
+
 def generate_personalized_message(
-    user_data: Dict[str, Any],
-    station_config: Dict[str, Any],
+    user: UserConfig,
+    subscription: StationSubscription,
     station_data,
     conditions_result: Dict[str, Any],
 ) -> str:
     """Generate a personalized notification message"""
-    preferences = user_data["preferences"]
-
     # Generate greeting
-    if user_data.get("first_name"):
-        greeting = f"Hi {user_data['first_name']}! "
-    elif user_data.get("username"):
-        greeting = f"Hi @{user_data['username']}! "
+    if user.first_name:
+        greeting = f"Hi {user.first_name}! "
+    elif user.username:
+        greeting = f"Hi @{user.username}! "
     else:
         greeting = "Hi! "
 
     # Station name (use custom name if available)
-    station_name = station_config.get("custom_name") or station_config["station_name"]
-
-    # Format message based on user preferences
-    message_rows = preferences.get("message_rows", 6)
-    weather_message = format_message(station_data, rows=message_rows, html=True)
+    station_name = subscription.display_name
 
-    # Build the full message
-    full_message = f"{greeting}🌬️ <b>Great soaring conditions at {station_name}!</b>\n\n"
+    # The weather table is identical for every recipient of this station; only render it once
+    weather_message = get_weather_table(
+        subscription.station_id, station_data, user.message_rows
+    )
 
-    # Add conditions summary
-    full_message += "<b>Your criteria met:</b>\n"
     checks = conditions_result["checks"]
-    full_message += f"• Wind: {checks['wind_speed']['criteria']} ✅\n"
-    full_message += f"• Direction: {checks['wind_direction']['criteria']} ✅\n"
-    full_message += f"• Gusts: {checks['gusts']['criteria']} ✅\n"
-    full_message += f"• Weather: {checks['precipitation']['criteria']} ✅\n\n"
-
-    # Add weather data
-    full_message += weather_message
+    parts = [
+        f"{greeting}🌬️ <b>Great soaring conditions at {station_name}!</b>\n\n",
+        # Add conditions summary
+        "<b>Your criteria met:</b>\n",
+        f"• Wind: {checks['wind_speed']['criteria']} ✅\n",
+        f"• Direction: {checks['wind_direction']['criteria']} ✅\n",
+        f"• Gusts: {checks['gusts']['criteria']} ✅\n",
+        f"• Weather: {checks['precipitation']['criteria']} ✅\n\n",
+        # Add weather data
+        weather_message,
+    ]
 
     # Add station info if it's not the default
-    if station_config["station_id"] != "FPS":
-        full_message += f"\n📍 <i>Data from {station_name}</i>"
+    if subscription.station_id != "FPS":
+        parts.append(f"\n📍 <i>Data from {station_name}</i>")
+
+    return "".join(parts)
+
+
+def evaluate_subscription(
+    station_data,
+    user: UserConfig,
+    subscription: StationSubscription,
+    winter: bool,
+    time_context: TimeContext,
+    window_state: Optional[Dict[str, Any]],
+) -> Tuple[Dict[str, Any], Optional[str], Optional[Dict[str, Any]]]:
+    """Process-pool task: check one subscription and render its message if conditions are met.
+
+    The subscription's rolling-window state travels in and out as a dict so the
+    parent's engine stays the single source of truth.
+    """
+    engine = RollingConditionEngine()
+    key = engine.key(user.user_id, subscription.station_id)
+    if window_state is not None:
+        engine.states[key] = WindowState.from_dict(window_state)
+    try:
+        conditions_result = check_station_conditions(
+            station_data, subscription, user, winter, time_context, engine
+        )
+    except Exception as e:
+        logger.error(f"Condition check failed for user {user.user_id}, station {subscription.station_id}: {e}")
+        return {"conditions_met": False, "reason": f"error: {e}"}, None, window_state
+    message = None
+    if conditions_result["conditions_met"]:
+        message = generate_personalized_message(
+            user, subscription, station_data, conditions_result
+        )
+    state = engine.states.get(key)
+    return conditions_result, message, state.to_dict() if state is not None else None
+
+
+def evaluate_in_pool(
+    users: List[UserConfig],
+    fetched_station_data: Dict[Tuple[str, str], Any],
+    winter: bool,
+    time_context: TimeContext,
+    workers: int,
+    candidates: Optional[Set[Tuple[str, str]]] = None,
+) -> Dict[Tuple[str, str], Tuple[Dict[str, Any], Optional[str]]]:
+    """Evaluate every enabled subscription with data (and in `candidates`, if given) across `workers` processes.
+
+    Returns (conditions_result, message or None) per (user_id, station_id);
+    cooldowns, sending and logging stay in the parent.
+    """
+    snapshots = {
+        station_key: snapshot_frame(station_data)
+        for station_key, station_data in fetched_station_data.items()
+        if isinstance(station_data, pd.DataFrame) and len(station_data)
+    }
+    keys = []
+    tasks = []
+    for user in users:
+        for subscription in user.stations:
+            station_key = (subscription.api_provider, subscription.station_id)
+            if not subscription.enabled or station_key not in snapshots:
+                continue
+            if candidates is not None and (user.user_id, subscription.station_id) not in candidates:
+                continue
+            state = CONDITION_ENGINE.states.get(
+                CONDITION_ENGINE.key(user.user_id, subscription.station_id)
+            )
+            keys.append((user.user_id, subscription.station_id))
+            tasks.append(
+                (
+                    station_key,
+                    (user, subscription, winter, time_context, state.to_dict() if state else None),
+                )
+            )
 
-    return full_message
+    evaluations = {}
+    results = map_over_stations(evaluate_subscription, snapshots, tasks, workers)
+    for (user_id, station_id), (conditions_result, message, state) in zip(keys, results):
+        if state is not None:
+            CONDITION_ENGINE.states[CONDITION_ENGINE.key(user_id, station_id)] = WindowState.from_dict(state)
+        evaluations[(user_id, station_id)] = (conditions_result, message)
+    logger.info(f"Evaluated {len(tasks)} subscriptions across {workers} worker processes")
+    return evaluations
 
 
 def log_notification(
@@ -448,8 +634,50 @@ def log_run_metrics(metrics: Dict[str, Any]) -> bool:
         return False
 
 
+def record_run_metrics(
+    metrics: Dict[str, Any], shard: int, shards: int, run_id: Optional[str] = None
+) -> bool:
+    """Log run metrics, or hand them to the merge step when this run is one shard of several"""
+    if shards == 1:
+        return log_run_metrics(metrics)
+    try:
+        metrics = dict(make_serializable(metrics), shard=shard, shards=shards)
+        path = write_shard_metrics(metrics, SHARD_METRICS_DIR, run_id, shard, shards)
+        logger.info(f"Shard {shard}/{shards} metrics written to {path}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to write shard metrics: {e}")
+        return False
+
+
+def merge_shard_run_metrics(run_id: str, directory: str = SHARD_METRICS_DIR) -> Dict[str, Any]:
+    """Combine the run_metrics of every shard of run `run_id` into one run record and log it
+
+    The shard files are only removed once the merged record is stored, so a
+    failed insert can be retried.
+    """
+    paths = shard_metrics_paths(directory, run_id)
+    shard_metrics = read_shard_metrics(directory, run_id)
+    merged = merge_run_metrics(shard_metrics)
+    if not log_run_metrics(merged):
+        raise RuntimeError(f"Could not log merged run metrics; shard files kept in {directory}")
+    for path in paths:
+        os.remove(path)
+    logger.info(
+        f"Merged {len(shard_metrics)} shards: {merged['notifications_sent']} notifications, "
+        f"success={merged['success']}"
+    )
+    return merged
+
+
 def lambda_handler(event, context):
-    """Main Lambda function handler for multi-station notifications"""
+    """Main Lambda function handler for multi-station notifications
+
+    `event` may carry a shard spec, e.g. {"shard": 0, "shards": 4, "run_id": "123"}:
+    only users whose stable hash falls in that shard are processed and the run's
+    metrics are written under `run_id` for `merge_shard_run_metrics` instead of
+    to Supabase.
+    """
     start_time = time.time()
     run_metrics = {
         "start_time": datetime.datetime.now(pytz.UTC).isoformat(),
@@ -471,97 +699,141 @@ def lambda_handler(event, context):
         "error_message": None,
         "station_details": [],
     }
+    station_details: List[StationDetail] = []
+    timer = StageTimer()
+    shard, shards = 0, 1
+    run_id = (event or {}).get("run_id") or os.getenv("SOARBOT_RUN_ID")
+
+    WEATHER_TABLE_CACHE.clear()
 
     try:
-        logger.info("Starting SoarBot multi-station check...")
+        shard, shards = parse_shard_spec(event)
+        logger.info(f"Starting SoarBot multi-station check (shard {shard + 1} of {shards})...")
+        if shards > 1:
+            if not run_id:
+                raise ValueError("Sharded runs need a run_id (or SOARBOT_RUN_ID) for the merge step")
+            # Shards may run side by side on one machine; keep their local state apart
+            CONFIG_SNAPSHOT.path = shard_path(CONFIG_SNAPSHOT_PATH, shard, shards)
+            FETCH_SCHEDULE.path = shard_path(FETCH_SCHEDULE_PATH, shard, shards)
+            CONDITION_ENGINE.path = shard_path(CONDITION_STATE_PATH, shard, shards)
+            TELEGRAM_CACHE.close()
+            TELEGRAM_CACHE.path = shard_path(TELEGRAM_CACHE_PATH, shard, shards)
 
         # Check if it's winter
         winter = check_winter()
+        # One "now" for every check in this run
+        time_context = TimeContext()
+        CONDITION_ENGINE.load()
         run_metrics["winter_mode"] = winter
         logger.info(f"Winter mode: {winter}")
 
         # Get all active users with their configurations
-        users = get_active_users_with_configs()
+        with timer.span("config_load"):
+            users = get_active_users_with_configs()
+            if shards > 1:
+                users = [user for user in users if shard_of(user.user_id, shards) == shard]
         run_metrics["users_found"] = len(users)
 
         if not users:
             logger.info("No active users found")
             run_metrics["runtime_seconds"] = round(time.time() - start_time, 2)
-            log_run_metrics(run_metrics)
+            run_metrics["stage_timings"] = timer.summary()
+            record_run_metrics(run_metrics, shard, shards, run_id)
             return {
                 "statusCode": 200,
                 "body": json.dumps({"message": "No active users found"}),
             }
 
         logger.info(f"Found {len(users)} active users")
-        run_metrics["stations_total"] = sum(len(user["stations"]) for user in users)
+        run_metrics["stations_total"] = sum(len(user.stations) for user in users)
 
         telegram_token = os.getenv("TELEGRAM_BOT_TOKEN")
         if not telegram_token:
             raise Exception("TELEGRAM_BOT_TOKEN environment variable not set")
 
-        for user_data in users:
-            user_id = user_data["user_id"]
-            chat_id = user_data["telegram_chat_id"]
-            preferences = user_data["preferences"]
+        # Fetch every subscribed station once, batched and concurrently per provider.
+        # Stations not yet due for a new observation are served from the last fetch
+        with timer.span("fetch"):
+            FETCH_SCHEDULE.load()
+            fetched_station_data = FETCH_SCHEDULE.fetch(
+                station_requests(
+                    subscription
+                    for user in users
+                    for subscription in user.stations
+                    if subscription.enabled
+                ),
+                FETCH_SCHEDULE.cadences(),
+            )
+            FETCH_SCHEDULE.save()
+
+        # Optionally let the database narrow the subscriptions down to those that could be met
+        # and are out of cooldown; on failure every subscription is evaluated as usual
+        candidates = None
+        if prefilter_enabled((event or {}).get("prefilter")):
+            try:
+                with timer.span("prefilter"):
+                    candidates = get_candidate_subscriptions(users, fetched_station_data)
+            except Exception as e:
+                run_metrics["database_errors"] += 1
+                logger.warning(f"Prefilter failed, evaluating every subscription: {e}")
+
+        # Optionally evaluate conditions and render messages for all subscriptions in a process pool
+        workers = eval_workers((event or {}).get("workers"))
+        evaluations = None
+        if workers > 1:
+            with timer.span("pool_evaluation"):
+                evaluations = evaluate_in_pool(
+                    users, fetched_station_data, winter, time_context, workers, candidates
+                )
+
+        for user in users:
+            user_id = user.user_id
+            chat_id = user.telegram_chat_id
             run_metrics["users_checked"] += 1
 
             logger.info(
-                f"Checking conditions for user {user_id} ({len(user_data['stations'])} stations)"
+                f"Checking conditions for user {user_id} ({len(user.stations)} stations)"
             )
 
             # Check each station for this user (in priority order)
-            for station_config in user_data["stations"]:
-                station_id = station_config["station_id"]
-                station_detail = {
-                    "user_id": user_id,
-                    "station_id": station_id,
-                    "station_name": station_config.get("station_name", station_id),
-                    "enabled": station_config["station_enabled"],
-                    "priority": station_config.get("priority", 0),
-                    "has_data": False,
-                    "api_error": None,
-                    "conditions_result": None,
-                    "cooldown_active": False,
-                    "notification_sent": False,
-                    "notification_error": None,
-                    "latest_weather_data": None,
-                }
+            for subscription in user.stations:
+                station_id = subscription.station_id
+                station_detail = StationDetail(user_id, subscription)
 
-                if not station_config["station_enabled"]:
+                if not subscription.enabled:
                     run_metrics["stations_disabled"] += 1
                     logger.info(
                         f"Skipping disabled station {station_id} for user {user_id}"
                     )
-                    run_metrics["station_details"].append(station_detail)
+                    station_details.append(station_detail)
                     continue
 
                 run_metrics["stations_checked"] += 1
 
                 # Get weather data for this station
                 try:
-                    station_data = get_station_weather_data(station_config)
+                    station_data = get_station_weather_data(subscription, fetched_station_data)
                 except Exception as e:
                     run_metrics["api_errors"] += 1
-                    station_detail["api_error"] = str(e)
+                    station_detail.api_error = str(e)
                     logger.warning(f"API error for station {station_id}: {e}")
-                    run_metrics["station_details"].append(station_detail)
+                    station_details.append(station_detail)
                     continue
 
                 if station_data is None or len(station_data) == 0:
                     logger.warning(
                         f"No weather data available for station {station_id}"
                     )
-                    run_metrics["station_details"].append(station_detail)
+                    station_details.append(station_detail)
                     continue
 
-                station_detail["has_data"] = True
+                station_detail.has_data = True
                 run_metrics["stations_with_data"] += 1
 
                 # Store latest weather data (last 3 readings)
                 if len(station_data) > 0:
                     latest_data = station_data.tail(3)
-                    station_detail["latest_weather_data"] = {
+                    station_detail.latest_weather_data = {
                         "wind_speeds": latest_data["wind_speed_set_1"].tolist(),
                         "wind_directions": latest_data["wind_direction_set_1"].tolist(),
                         "wind_gusts": latest_data["wind_gust_set_1"].tolist(),
@@ -573,49 +845,65 @@ def lambda_handler(event, context):
                         ],
                     }
 
+                if candidates is not None and (user_id, station_id) not in candidates:
+                    logger.info(
+                        f"Skipping user {user_id}, station {station_id} - ruled out by prefilter"
+                    )
+                    station_details.append(station_detail)
+                    continue
+
                 # Check conditions for this station
-                conditions_result = check_station_conditions(
-                    station_data, station_config, preferences, winter
-                )
-                station_detail["conditions_result"] = {
+                with timer.span("conditions"):
+                    if evaluations is not None:
+                        conditions_result, message = evaluations[(user_id, station_id)]
+                    else:
+                        try:
+                            conditions_result = check_station_conditions(
+                                station_data, subscription, user, winter, time_context, CONDITION_ENGINE
+                            )
+                        except Exception as e:
+                            # Bad data from one station must not fail the run for everyone else
+                            logger.error(f"Condition check failed for user {user_id}, station {station_id}: {e}")
+                            conditions_result = {"conditions_met": False, "reason": f"error: {e}"}
+                        message = None
+                station_detail.conditions_result = {
                     "overall_met": conditions_result["conditions_met"],
-                    "checks": conditions_result["checks"],
+                    "checks": conditions_result.get("checks", {}),
                 }
 
                 if not conditions_result["conditions_met"]:
+                    reason = conditions_result.get("reason")
                     logger.info(
                         f"Conditions not met for user {user_id}, station {station_id}"
+                        + (f" ({reason})" if reason else "")
                     )
-                    run_metrics["station_details"].append(station_detail)
+                    station_details.append(station_detail)
                     continue
 
                 run_metrics["conditions_met_count"] += 1
 
                 # Check cooldown period for this specific station
-                station_uuid = (
-                    station_config.get("station_uuid")
-                    or station_config.get("id")
-                    or station_id
-                )
+                station_uuid = station_id
                 try:
-                    last_notification_time = get_last_notification_time(
-                        user_id, station_uuid
-                    )
+                    with timer.span("cooldown_lookup"):
+                        last_notification_time = get_last_notification_time(
+                            user_id, station_uuid
+                        )
                 except Exception as e:
                     run_metrics["database_errors"] += 1
                     logger.warning(f"Database error getting last notification: {e}")
-                    run_metrics["station_details"].append(station_detail)
+                    station_details.append(station_detail)
                     continue
 
                 time_since_last = (
                     datetime.datetime.now(pytz.UTC) - last_notification_time
                 )
-                cooldown_hours = preferences.get("notification_cooldown_hours", 4)
+                cooldown_hours = user.notification_cooldown_hours
 
                 if time_since_last < datetime.timedelta(hours=cooldown_hours):
                     run_metrics["cooldown_blocks"] += 1
-                    station_detail["cooldown_active"] = True
-                    station_detail["cooldown_remaining_hours"] = round(
+                    station_detail.cooldown_active = True
+                    station_detail.cooldown_remaining_hours = round(
                         (
                             datetime.timedelta(hours=cooldown_hours) - time_since_last
                         ).total_seconds()
@@ -625,35 +913,56 @@ def lambda_handler(event, context):
                     logger.info(
                         f"Skipping user {user_id}, station {station_id} - cooldown period not met"
                     )
-                    run_metrics["station_details"].append(station_detail)
+                    station_details.append(station_detail)
                     continue
 
                 # Generate and send personalized message
-                message = generate_personalized_message(
-                    user_data, station_config, station_data, conditions_result
-                )
+                if message is None:
+                    with timer.span("message"):
+                        message = generate_personalized_message(
+                            user, subscription, station_data, conditions_result
+                        )
 
-                success = send_telegram_message(chat_id, message, telegram_token)
+                with timer.span("send"):
+                    status = send_telegram_message(chat_id, message, telegram_token)
 
-                if success:
-                    station_detail["notification_sent"] = True
+                if status == MESSAGE_SKIPPED:
+                    # The same text already reached this chat recently (e.g. a retried run);
+                    # nothing was delivered now, so it is neither counted nor logged
+                    station_detail.notification_error = "Duplicate of a recently sent message"
+                    logger.info(
+                        f"Not notifying user {user_id} for station {station_id} - duplicate message"
+                    )
+                    station_details.append(station_detail)
+                    break
+
+                if status == MESSAGE_SENT:
+                    station_detail.notification_sent = True
+
+                    if user.include_weather_chart:
+                        with timer.span("chart"):
+                            if not send_weather_chart(
+                                chat_id, subscription, station_data, telegram_token
+                            ):
+                                logger.warning(
+                                    f"Failed to send weather chart to user {user_id} for station {station_id}"
+                                )
 
                     # Log the notification
                     try:
-                        latest_data = station_data.tail(
-                            preferences.get("message_rows", 6)
-                        )
-                        station_data_json = latest_data.to_json(
-                            orient="records", date_format="iso"
-                        )
-                        station_data_dict = json.loads(station_data_json)
-                        log_notification(
-                            user_id,
-                            station_uuid,
-                            message,
-                            conditions_result,
-                            station_data_dict,
-                        )
+                        with timer.span("log_notification"):
+                            latest_data = station_data.tail(user.message_rows)
+                            station_data_json = latest_data.to_json(
+                                orient="records", date_format="iso"
+                            )
+                            station_data_dict = json.loads(station_data_json)
+                            log_notification(
+                                user_id,
+                                station_uuid,
+                                message,
+                                conditions_result,
+                                station_data_dict,
+                            )
                     except Exception as e:
                         run_metrics["database_errors"] += 1
                         logger.warning(f"Failed to log notification: {e}")
@@ -663,30 +972,36 @@ def lambda_handler(event, context):
                         f"Notification sent to user {user_id} for station {station_id}"
                     )
 
-                    run_metrics["station_details"].append(station_detail)
+                    station_details.append(station_detail)
 
                     # Only send one notification per user per run (highest priority station wins)
                     break
                 else:
                     run_metrics["notification_failures"] += 1
-                    station_detail["notification_error"] = (
+                    station_detail.notification_error = (
                         "Failed to send Telegram message"
                     )
                     logger.error(
                         f"Failed to send notification to user {user_id} for station {station_id}"
                     )
 
-                run_metrics["station_details"].append(station_detail)
+                station_details.append(station_detail)
+
+        CONDITION_ENGINE.save()
+        TELEGRAM_CACHE.evict()
 
         # Calculate final metrics
+        with timer.span("serialize"):
+            run_metrics["station_details"] = [detail.to_dict() for detail in station_details]
         run_metrics["runtime_seconds"] = round(time.time() - start_time, 2)
         run_metrics["end_time"] = datetime.datetime.now(pytz.UTC).isoformat()
+        run_metrics["stage_timings"] = timer.summary()
 
         result_message = f"Multi-station Lambda executed successfully. {run_metrics['notifications_sent']} notifications sent from {run_metrics['stations_checked']} station checks across {run_metrics['users_checked']} users in {run_metrics['runtime_seconds']}s."
         logger.info(result_message)
 
-        # Log metrics to Supabase
-        log_run_metrics(run_metrics)
+        # Log metrics to Supabase (or for the merge step when sharded)
+        record_run_metrics(run_metrics, shard, shards, run_id)
 
         return {
             "statusCode": 200,
@@ -703,16 +1018,18 @@ def lambda_handler(event, context):
         }
 
     except Exception as e:
+        run_metrics["station_details"] = [detail.to_dict() for detail in station_details]
         run_metrics["runtime_seconds"] = round(time.time() - start_time, 2)
         run_metrics["end_time"] = datetime.datetime.now(pytz.UTC).isoformat()
         run_metrics["success"] = False
         run_metrics["error_message"] = str(e)
+        run_metrics["stage_timings"] = timer.summary()
 
         error_message = f"Lambda execution failed: {e}"
         logger.error(error_message)
 
         # Log failed run metrics
-        log_run_metrics(run_metrics)
+        record_run_metrics(run_metrics, shard, shards, run_id)
 
         # Try to send error notification to admin
         admin_chat_id = os.getenv("ADMIN_TELEGRAM_CHAT_ID")
@@ -732,5 +1049,27 @@ if __name__ == "__main__":
 
     load_dotenv()
 
-    result = lambda_handler({}, {})
-    logging.info(result)
+    parser = argparse.ArgumentParser(description="Run one SoarBot notification check")
+    parser.add_argument("--shard", type=int, default=0, help="index of this shard (0-based)")
+    parser.add_argument("--shards", type=int, default=1, help="total number of shards")
+    parser.add_argument(
+        "--run-id",
+        default=os.getenv("SOARBOT_RUN_ID"),
+        help="id shared by every shard of one run and its merge step (default: $SOARBOT_RUN_ID)",
+    )
+    parser.add_argument(
+        "--merge-shards",
+        action="store_true",
+        help=f"merge shard run_metrics from {SHARD_METRICS_DIR} into one run record and exit",
+    )
+    args = parser.parse_args()
+
+    if args.merge_shards:
+        merge_shard_run_metrics(args.run_id)
+    else:
+        # Set SOARBOT_PROFILE=cprofile (or pyinstrument) to dump a profile of this run
+        with maybe_profile("lambda_handler"):
+            result = lambda_handler(
+                {"shard": args.shard, "shards": args.shards, "run_id": args.run_id}, {}
+            )
+        logging.info(result)
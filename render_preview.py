@@ -0,0 +1,28 @@
+"""Render the e-ink layout headlessly from a recorded Synoptic timeseries response.
+
+    python render_preview.py tests/fixtures/synoptic_fps.json --out frame.png
+"""
+import argparse
+
+from utils.eink_utils import update_image
+from utils.virtual_epd import VirtualEPD
+from utils.weather_utils import load_station_data_fixture
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixture", help="Synoptic timeseries JSON file")
+    parser.add_argument("--out", default="frame.png", help="PNG file to write")
+    parser.add_argument("--landscape", action="store_true",
+                        help="write the frame in panel orientation (800x480) instead of as drawn")
+    args = parser.parse_args()
+
+    station_data = load_station_data_fixture(args.fixture)
+    epd = VirtualEPD()
+    update_image(epd, station_data)
+    epd.save_png(args.out, portrait=not args.landscape)
+    print(f"Wrote {args.out} ({len(station_data)} observations, latest {station_data['date_time'].iloc[-1]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,53 +6,100 @@ from queue import Empty
 
 from configs import epd7in5_V2
 from utils.eink_utils import *
+from utils.render_pipeline import ScreenPipeline
 from utils.weather_utils import *
 
 absolute_path = os.path.dirname(__file__)
 
 
-def repeated_job(epd, last_image_update, output):
-    lookback_minutes = 120
-    station_data = get_station_data(lookback_minutes)
-    if len(station_data) == 0:
-        app_log.error('station data empty... waiting a minute to retry')
-        time.sleep(60)
-        return
-    if station_data['date_time'].iloc[-1] > last_image_update:
-        update_image(epd, station_data)
-        last_image_update = station_data['date_time'].iloc[-1]
-    # app_log.info('Job ran, going to sleep')
-    time.sleep(config.sleep_time)
-    # app_log.info('Woke up.')
-    output.put(last_image_update)
+# The fetch stage beats once per cycle; allow one full fetch on top of the sleep.
+HEARTBEAT_TIMEOUT_SECONDS = 120
+# A full refresh of the 7.5" panel takes seconds; anything past this is a wedged panel.
+PANEL_TIMEOUT_SECONDS = 90
+WATCHDOG_INTERVAL_SECONDS = 10
+LOOKBACK_MINUTES = 120
+
+
+def show_on_panel(epd, buffer):
+    try:
+        show_frame(epd, buffer)
+    except epd7in5_V2.epdconfig.BusyTimeoutError as busy_timeout:
+        # Release the GPIO/SPI; the next attempt's epd.init() hard-resets the panel.
+        # Re-raise so the pipeline retries this frame instead of reporting it shown.
+        app_log.error(f'{busy_timeout}. Resetting panel before retrying.')
+        epd7in5_V2.epdconfig.module_exit()
+        raise
+
+
+def screen_worker(heartbeat, panel_busy_since, last_image_update, output, clear_screen):
+    """Long-lived worker that owns the EPD and runs the fetch -> render -> panel pipeline.
+
+    Staying alive between cycles keeps fonts, the HTTP session and the last update
+    time warm. The pipeline stamps `heartbeat` every fetch cycle and `panel_busy_since`
+    while the panel refreshes so the parent can detect a hang in either stage.
+    """
+    epd = epd7in5_V2.EPD()
+    if clear_screen:
+        initiate_screen(epd)
+    pipeline = ScreenPipeline(
+        fetch=lambda: get_station_data(LOOKBACK_MINUTES),
+        render=lambda station_data: render_frame(epd, station_data),
+        show=lambda buffer: show_on_panel(epd, buffer),
+        interval=config.sleep_time,
+        last_image_update=last_image_update,
+        heartbeat=heartbeat,
+        panel_busy_since=panel_busy_since,
+        on_shown=output.put,
+    )
+    pipeline.start()
+    dropped = 0
+    while True:
+        time.sleep(WATCHDOG_INTERVAL_SECONDS)
+        if pipeline.frame_slot.dropped != dropped:
+            dropped = pipeline.frame_slot.dropped
+            app_log.info(f'Dropped {dropped} stale frame(s) so far.')
+
+
+def start_worker(last_image_update, clear_screen=False):
+    heartbeat = mp.Value('d', time.time())
+    panel_busy_since = mp.Value('d', 0)
+    output = mp.Queue()
+    process = mp.Process(target=screen_worker,
+                         args=(heartbeat, panel_busy_since, last_image_update, output, clear_screen),
+                         daemon=True)
+    process.start()
+    return process, heartbeat, panel_busy_since, output
 
 
 def main():
+    process = None
     try:
         last_image_update = datetime.datetime.now() - datetime.timedelta(hours=5)
-        epd = epd7in5_V2.EPD()
-        initiate_screen(epd)
+        heartbeat_timeout = config.sleep_time + HEARTBEAT_TIMEOUT_SECONDS
+        process, heartbeat, panel_busy_since, output = start_worker(last_image_update, clear_screen=True)
         while True:
             try:
-                timeout_length = 120
-                output = mp.Queue()
-                process = mp.Process(target=repeated_job, args=(epd, last_image_update, output))
-                process.start()
-                process.join(timeout=timeout_length)
-                if process.is_alive():
-                    process.terminate()
-                    process.join()
-                    error_info = f"Timeout error. repeated_job didn't complete in {timeout_length}s"
-                    app_log.info(f'{error_info}.')
                 try:
-                    last_image_update = output.get()
+                    last_image_update = output.get(timeout=WATCHDOG_INTERVAL_SECONDS)
                 except Empty:
-                    print("Nothing in Queue")
+                    pass
+                now = time.time()
+                silent_for = now - heartbeat.value
+                panel_busy_for = now - panel_busy_since.value if panel_busy_since.value else 0
+                if not process.is_alive() or silent_for > heartbeat_timeout or panel_busy_for > PANEL_TIMEOUT_SECONDS:
+                    error_info = (f"Watchdog: no fetch heartbeat for {silent_for:.0f}s, "
+                                  f"panel busy for {panel_busy_for:.0f}s")
+                    app_log.info(f'{error_info}. Restarting worker.')
+                    process.terminate()
+                    process.join()
+                    process, heartbeat, panel_busy_since, output = start_worker(last_image_update)
             except Exception as main_loop_exception:
                 app_log.info(f'Exception {main_loop_exception} occurred.')
 
     except KeyboardInterrupt:
         app_log.info("ctrl + c:")
+        if process is not None:
+            process.terminate()
         # epd7in5_V2.epdconfig.module_exit()
         exit()
 
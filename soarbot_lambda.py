@@ -15,22 +15,6 @@ def send_to_telegram(text, chat_id):
         print(e)
 
 
-def format_message(station_data, rows=6, html=True):
-    station_data['wind_cardinal_direction_set_1d'].fillna('-', inplace=True)
-    if html:
-        message = "<pre>"  # ""TIME  |  WIND SPEEDgGUST | WIND DIRECTION \n"
-    else:
-        message = "       Speed   Dir \n"
-    for index, row in station_data.tail(rows).iloc[::-1].iterrows():
-        message += '{:%H:%M} {:>3.0f}g{:<2.0f}   {:<5} \n'.format(
-            row['date_time'],
-            row["wind_speed_set_1"], row["wind_gust_set_1"],
-            row['wind_cardinal_direction_set_1d'])
-    if html:
-        message += '</pre>'
-    return message
-
-
 def update_last_message_time():
     now_str = datetime.datetime.now(pytz.timezone('America/Denver')).strftime("%m/%d/%Y, %H:%M:%S")
     update_item('soarbot_variables', 'last_message_time', 'value', now_str)
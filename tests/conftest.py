@@ -0,0 +1,62 @@
+"""Builders shared by the test modules: `from conftest import row, subscription, frame`."""
+from decimal import Decimal
+
+import pandas as pd
+
+from utils.records import build_user_configs
+
+
+def row(user_id, station_id, priority, **overrides):
+    values = {
+        "user_id": user_id,
+        "telegram_chat_id": f"chat-{user_id}",
+        "username": None,
+        "first_name": "Pilot",
+        "last_name": None,
+        "notification_cooldown_hours": 4,
+        "timezone": "America/Denver",
+        "include_weather_chart": False,
+        "message_rows": 6,
+        "enable_winter_midday": True,
+        "quiet_hours_start": None,
+        "quiet_hours_end": None,
+        "station_id": "".join(station_id),  # a fresh str object each time, as from JSON
+        "station_name": f"{station_id} name",
+        "station_description": None,
+        "latitude": "40.5247",
+        "longitude": "-111.8638",
+        "api_provider": "synoptic",
+        "api_config": {"lookback_minutes": 120},
+        "wind_speed_min": Decimal("8.5"),
+        "wind_speed_max": "16.0",
+        "wind_direction_min": 130,
+        "wind_direction_max": 180,
+        "max_gust_differential": None,
+        "priority": priority,
+        "custom_name": None,
+        "station_enabled": True,
+        "min_visibility_miles": None,
+        "max_precipitation_rate": None,
+    }
+    values.update(overrides)
+    return values
+
+
+def subscription(**overrides):
+    """The StationSubscription built from one `row` for user u1 at FPS."""
+    (user,) = build_user_configs([row("u1", "FPS", 1, **overrides)])
+    return user.stations[0]
+
+
+def frame(speeds, directions=None, gusts=None, rain=None, start="2024-05-14 11:00"):
+    """5-minute observations; by default gusting 2 mph over `speeds`, from 150 degrees and dry."""
+    n = len(speeds)
+    return pd.DataFrame(
+        {
+            "date_time": pd.date_range(start, periods=n, freq="5min"),
+            "wind_speed_set_1": speeds,
+            "wind_gust_set_1": gusts if gusts is not None else [s + 2 for s in speeds],
+            "wind_direction_set_1": directions if directions is not None else [150] * n,
+            "precip_accum_five_minute_set_1": rain if rain is not None else [0.0] * n,
+        }
+    )
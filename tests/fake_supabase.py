@@ -0,0 +1,78 @@
+"""In-memory stand-in for the subset of the supabase-py query builder SoarBot uses."""
+from types import SimpleNamespace
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.columns = "*"
+        self.filters = []
+        self.order_by = None
+        self.limit_n = None
+        self.payload = None
+
+    def select(self, columns="*"):
+        self.columns = columns
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(("eq", column, value))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(("gt", column, value))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(("in", column, list(values)))
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def insert(self, payload):
+        self.payload = payload
+        return self
+
+    def _matches(self, row):
+        for op, column, value in self.filters:
+            if op == "eq" and row.get(column) != value:
+                return False
+            if op == "gt" and not (row.get(column) is not None and row[column] > value):
+                return False
+            if op == "in" and row.get(column) not in value:
+                return False
+        return True
+
+    def execute(self):
+        self.client.calls.append(self)
+        rows = self.client.tables.setdefault(self.table, [])
+        if self.payload is not None:
+            new_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+            rows.extend(new_rows)
+            return SimpleNamespace(data=new_rows)
+        data = [row for row in rows if self._matches(row)]
+        if self.order_by:
+            column, desc = self.order_by
+            data.sort(key=lambda row: row[column], reverse=desc)
+        if self.limit_n is not None:
+            data = data[: self.limit_n]
+        if self.columns != "*":
+            wanted = self.columns.split(",")
+            data = [{column: row.get(column) for column in wanted} for row in data]
+        return SimpleNamespace(data=data)
+
+
+class FakeSupabase:
+    def __init__(self, tables=None):
+        self.tables = tables or {}
+        self.calls = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
@@ -0,0 +1,70 @@
+"""Local stand-in for the weather APIs, serving recorded fixtures over real HTTP."""
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _load(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+
+class FixtureServer:
+    """Serves Synoptic `/synoptic/stations/timeseries` and Weather Underground `/wu/observations/all/1day`.
+
+    `requests` records (path, query) for every call; stations without a fixture
+    are simply absent from the response, like unknown stations upstream.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.synoptic_stations = {"FPS": _load("synoptic_fps.json")["STATION"][0]}
+        self.wu_stations = {"KUTDRAPE12": _load("wunderground_kutdrape12.json")}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                server.requests.append((url.path, query))
+                if url.path == "/synoptic/stations/timeseries":
+                    stations = [
+                        server.synoptic_stations[stid]
+                        for stid in query["stid"].split(",")
+                        if stid in server.synoptic_stations
+                    ]
+                    self._send(200, {"STATION": stations})
+                elif url.path == "/wu/observations/all/1day":
+                    if query["stationId"] in server.wu_stations:
+                        self._send(200, server.wu_stations[query["stationId"]])
+                    else:
+                        self._send(204, None)
+                else:
+                    self._send(500, {"error": "boom"})
+
+            def _send(self, status, payload):
+                body = b"" if payload is None else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
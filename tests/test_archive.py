@@ -0,0 +1,77 @@
+import datetime
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from fixture_server import FIXTURES, FixtureServer
+from utils import providers
+from utils.archive import ObservationArchive, backfill, months
+from utils.providers import OBSERVATION_COLUMNS, SynopticProvider
+from utils.weather_utils import load_station_data_fixture
+
+pytest.importorskip("pyarrow")
+
+NOW = datetime.datetime(2024, 7, 1)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with FixtureServer() as server:
+        monkeypatch.setitem(providers.PROVIDERS, "synoptic", SynopticProvider(f"{server.url}/synoptic"))
+        monkeypatch.setattr(providers, "config", SimpleNamespace(token="test-token"))
+        yield server
+
+
+def test_months_are_inclusive():
+    assert [str(month) for month in months("2023-11", "2024-02")] == ["2023-11", "2023-12", "2024-01", "2024-02"]
+
+
+def test_backfill_writes_partitions_and_resumes(server, tmp_path):
+    archive = ObservationArchive(str(tmp_path))
+    stats = backfill(archive, ["FPS", "NOPE"], months("2024-04", "2024-05"), now=NOW)
+    assert stats == {"requests": 2, "failed": 0, "rows": 24}
+
+    path, query = server.requests[0]
+    assert query["stid"] == "FPS,NOPE" and "recent" not in query
+    assert query["token"] == "test-token"
+    assert {(q["start"], q["end"]) for _, q in server.requests} == {
+        ("202403310000", "202405020000"),
+        ("202404300000", "202406020000"),
+    }
+    assert (tmp_path / "station=FPS" / "month=2024-05" / "observations.parquet").exists()
+    assert not (tmp_path / "station=FPS" / "month=2024-04").exists()
+
+    # Every station-month is recorded, so running again makes no requests
+    resumed = ObservationArchive(str(tmp_path))
+    assert backfill(resumed, ["FPS", "NOPE"], months("2024-04", "2024-05"), now=NOW)["requests"] == 0
+    assert len(server.requests) == 2
+
+
+def test_explicit_token_overrides_the_configured_one(server, tmp_path):
+    backfill(ObservationArchive(str(tmp_path)), ["FPS"], months("2024-05", "2024-05"), token="cli-token", now=NOW)
+    assert [query["token"] for _, query in server.requests] == ["cli-token"]
+
+
+def test_archived_observations_match_live_normalization(server, tmp_path):
+    archive = ObservationArchive(str(tmp_path))
+    backfill(archive, ["FPS"], months("2024-05", "2024-05"), now=NOW)
+
+    expected = load_station_data_fixture(f"{FIXTURES}/synoptic_fps.json")
+    df = archive.load("FPS")
+    assert list(df.columns) == OBSERVATION_COLUMNS
+    pd.testing.assert_series_equal(df["date_time"], expected["date_time"])
+    pd.testing.assert_series_equal(df["wind_speed_set_1"], expected["wind_speed_set_1"])
+
+    window = archive.load("FPS", datetime.datetime(2024, 5, 14, 12), datetime.datetime(2024, 5, 14, 12, 30))
+    assert len(window) == 6 and window["date_time"].iloc[0] == pd.Timestamp("2024-05-14 12:00")
+
+
+def test_current_month_and_failures_are_fetched_again(server, tmp_path, monkeypatch):
+    archive = ObservationArchive(str(tmp_path))
+    backfill(archive, ["FPS"], months("2024-05", "2024-05"), now=datetime.datetime(2024, 5, 20))
+    assert not archive.is_complete("FPS", pd.Period("2024-05", "M"))
+
+    monkeypatch.setitem(providers.PROVIDERS, "synoptic", SynopticProvider(f"{server.url}/broken"))
+    stats = backfill(archive, ["FPS"], months("2024-06", "2024-06"), now=NOW)
+    assert stats["failed"] == 1 and not archive.is_complete("FPS", pd.Period("2024-06", "M"))
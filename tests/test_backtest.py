@@ -0,0 +1,193 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from conftest import row
+from utils.backtest import WINTER_AFTER_DAY, WINTER_BEFORE_DAY, localize_observations, replay, run_times
+from utils.conditions import RollingConditionEngine
+from utils.fetch_schedule import learn_cadence
+from utils.providers import subscription_lookback
+from utils.records import build_user_configs
+from utils.sun_times import is_daytime
+from utils.time_context import DAYTIME_HOURS, MIDDAY_HOURS, in_quiet_hours
+
+START = "2024-03-13 06:00"
+END = "2024-03-16 06:00"
+
+
+def observations(seed, start="2024-03-12 23:00", days=3.5):
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=int(days * 288), freq="5min")
+    speed = np.clip(11 + 4 * np.sin(np.arange(len(times)) / 12) + rng.normal(0, 1.5, len(times)), 0, None)
+    df = pd.DataFrame(
+        {
+            "date_time": times,
+            "air_temp_set_1": 50.0,
+            "wind_speed_set_1": speed,
+            "wind_gust_set_1": speed + rng.exponential(1.5, len(times)),
+            "wind_direction_set_1": rng.normal(155, 12, len(times)) % 360,
+            "precip_accum_five_minute_set_1": np.where(rng.random(len(times)) < 0.03, 0.01, 0.0),
+            "wind_cardinal_direction_set_1d": "S",
+        }
+    )
+    df.loc[rng.random(len(times)) < 0.02, "wind_speed_set_1"] = np.nan
+    # Stations that stop reporting gusts or precipitation
+    df.loc[rng.random(len(times)) < 0.05, "wind_gust_set_1"] = np.nan
+    df.loc[rng.random(len(times)) < 0.05, "precip_accum_five_minute_set_1"] = np.nan
+    # Short dropouts and one outage longer than the lookback
+    keep = rng.random(len(times)) > 0.05
+    keep[400:430] = False
+    return df[keep].reset_index(drop=True)
+
+
+def users():
+    return build_user_configs(
+        [
+            row("u1", "FPS", 1, window_readings=3, release_readings=2),
+            row("u1", "KSLC", 2, wind_speed_min=5, latitude=None, longitude=None, api_config={"lookback_minutes": 30}),
+            row("u2", "FPS", 1, notification_cooldown_hours=1, wind_direction_min=120, max_gust_differential=6),
+            row("u3", "KSLC", 1, quiet_hours_start="12:00", quiet_hours_end="14:30", enable_winter_midday=False,
+                latitude=None, longitude=None, api_config={"lookback_minutes": 30}),
+            row("u3", "FPS", 2, window_readings=1, notification_cooldown_hours=2.5, enable_winter_midday=False),
+            row("u4", "FPS", 1, wind_speed_min=0, wind_speed_max=40, wind_direction_min=0, wind_direction_max=360,
+                max_gust_differential=20, station_enabled=False),
+        ]
+    )
+
+
+def reference(users, data, start, end):
+    """The per-run logic of lambda_handler, one run and one subscription at a time."""
+    frames, cadences = {}, {}
+    for station_id, df in data.items():
+        frames[station_id] = localize_observations(df)
+        cadences[station_id] = learn_cadence(frames[station_id][1].to_series()) / 60
+    engine = RollingConditionEngine()
+    last_sent = {}
+    sent = []
+    for run in run_times(start, end):
+        now = run.to_pydatetime()
+        day = now.timetuple().tm_yday
+        winter = day < WINTER_BEFORE_DAY or day > WINTER_AFTER_DAY
+        for user in users:
+            local = now.astimezone(pytz.timezone(user.timezone))
+            for sub in user.stations:
+                if not sub.enabled:
+                    continue
+                df, utc = frames[sub.station_id]
+                lookback = max(
+                    subscription_lookback(s, cadences[sub.station_id])
+                    for u in users for s in u.stations if s.station_id == sub.station_id and s.enabled
+                )
+                in_window = (utc >= run - pd.Timedelta(minutes=lookback)) & (utc <= run)
+                station_data = df[in_window].reset_index(drop=True)
+                if len(station_data) < sub.window_readings:
+                    continue
+                weather_ok = engine.evaluate(user.user_id, sub, station_data).active
+                if sub.latitude is not None:
+                    daytime = is_daytime(sub.latitude, sub.longitude, local, user.timezone)
+                else:
+                    daytime = DAYTIME_HOURS[0] <= local.hour <= DAYTIME_HOURS[1]
+                quiet = in_quiet_hours(local.hour * 60 + local.minute, user.quiet_start_minute, user.quiet_end_minute)
+                midday_ok = winter or user.enable_winter_midday or not (
+                    MIDDAY_HOURS[0] <= local.hour <= MIDDAY_HOURS[1]
+                )
+                if not (weather_ok and daytime and not quiet and midday_ok):
+                    continue
+                last = last_sent.get((user.user_id, sub.station_id))
+                if last is not None and now - last < datetime.timedelta(hours=user.notification_cooldown_hours):
+                    continue
+                last_sent[(user.user_id, sub.station_id)] = now
+                sent.append((run, user.user_id, sub.station_id))
+                break
+    return sent
+
+
+def test_replay_matches_per_run_evaluation():
+    data = {"FPS": observations(1), "KSLC": observations(2)}
+    result = replay(users(), data, START, END)
+    expected = reference(users(), data, START, END)
+
+    notifications = list(result.notifications.itertuples(index=False, name=None))
+    assert len(expected) > 20
+    assert sorted(notifications) == sorted(expected)
+
+    summary = result.summary.set_index(["user_id", "station_id"])
+    assert summary.loc[("u3", "FPS"), "notifications"] == sum(1 for n in expected if n[1:] == ("u3", "FPS"))
+    assert ("u4", "FPS") not in summary.index
+    assert (summary["conditions_met"] <= summary["weather_met"]).all()
+
+
+def test_cooldown_and_priority():
+    times = pd.date_range("2024-06-15 09:00", periods=48, freq="5min")
+    calm = pd.DataFrame(
+        {
+            "date_time": times,
+            "wind_speed_set_1": 12.0,
+            "wind_gust_set_1": 14.0,
+            "wind_direction_set_1": 150.0,
+            "precip_accum_five_minute_set_1": 0.0,
+        }
+    )
+    (user,) = build_user_configs(
+        [row("u1", "FPS", 1, notification_cooldown_hours=1), row("u1", "KSLC", 2, notification_cooldown_hours=1)]
+    )
+    result = replay([user], {"FPS": calm, "KSLC": calm}, "2024-06-15 15:00", "2024-06-15 19:00")
+
+    local = result.notifications["time"].dt.tz_convert("America/Denver").dt.strftime("%H:%M").tolist()
+    # Window fills at 09:10; FPS then KSLC (FPS cooling down), alternating until the data ends at 12:55 + lookback
+    assert local[:4] == ["09:10", "09:15", "10:10", "10:15"]
+    assert result.notifications["station_id"].tolist()[:4] == ["FPS", "KSLC", "FPS", "KSLC"]
+    summary = result.summary.set_index("station_id")
+    assert summary.loc["FPS", "cooldown_blocks"] > 0
+
+
+def test_state_is_rebuilt_after_an_outage():
+    times = pd.date_range("2024-06-15 09:00", periods=12, freq="5min").append(
+        pd.date_range("2024-06-15 12:00", periods=2, freq="5min")
+    )
+    speeds = [12.0] * 12 + [30.0, 30.0]
+    df = pd.DataFrame(
+        {
+            "date_time": times,
+            "wind_speed_set_1": speeds,
+            "wind_gust_set_1": [s + 1 for s in speeds],
+            "wind_direction_set_1": 150.0,
+            "precip_accum_five_minute_set_1": 0.0,
+        }
+    )
+    # Still "on" after two failing readings if the window carried over the outage
+    users = build_user_configs(
+        [row("u1", "FPS", 1, window_readings=1, release_readings=3, notification_cooldown_hours=0.5)]
+    )
+    result = replay(users, {"FPS": df}, "2024-06-15 15:00", "2024-06-15 19:00")
+    assert result.notifications["time"].max() < pd.Timestamp("2024-06-15 18:00", tz="UTC")
+    assert list(result.notifications.itertuples(index=False, name=None)) == reference(
+        users, {"FPS": df}, "2024-06-15 15:00", "2024-06-15 19:00"
+    )
+
+
+def test_hourly_station_fills_its_window():
+    # An ASOS station reporting hourly never has three readings in the configured hour
+    times = pd.date_range("2024-06-15 06:54", periods=8, freq="60min")
+    hourly = pd.DataFrame(
+        {
+            "date_time": times,
+            "wind_speed_set_1": 12.0,
+            "wind_gust_set_1": np.nan,
+            "wind_direction_set_1": 150.0,
+            "precip_accum_five_minute_set_1": np.nan,
+        }
+    )
+    users = build_user_configs(
+        [row("u1", "KSLC", 1, window_readings=3, latitude=None, longitude=None, api_config={"lookback_minutes": 60})]
+    )
+    start, end = "2024-06-15 15:00", "2024-06-15 22:00"
+    result = replay(users, {"KSLC": hourly}, start, end)
+
+    notifications = list(result.notifications.itertuples(index=False, name=None))
+    assert notifications and sorted(notifications) == sorted(reference(users, {"KSLC": hourly}, start, end))
+    local = result.notifications["time"].dt.tz_convert("America/Denver").dt.strftime("%H:%M").tolist()
+    # The third reading arrives at 08:54
+    assert local[0] == "09:00"
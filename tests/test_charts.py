@@ -0,0 +1,32 @@
+import os
+
+from utils import charts
+from utils.charts import ChartCache, render_wind_chart
+from utils.weather_utils import load_station_data_fixture
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "synoptic_fps.json")
+
+
+def test_render_wind_chart_is_png():
+    png = render_wind_chart(load_station_data_fixture(FIXTURE), "FPS")
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+
+
+def test_chart_cache_renders_once_per_observation(monkeypatch):
+    renders = []
+    monkeypatch.setattr(charts, "render_wind_chart", lambda df, title="": renders.append(title) or b"png")
+    df = load_station_data_fixture(FIXTURE)
+    cache = ChartCache()
+
+    key = ChartCache.key("FPS", df)
+    assert cache.png(key, df, "FPS") == b"png"
+    assert cache.png(ChartCache.key("FPS", df), df, "FPS") == b"png"
+    assert renders == ["FPS"]
+
+    newer = ChartCache.key("FPS", df.iloc[:-1])
+    assert newer != key
+    cache.png(newer, df.iloc[:-1], "FPS")
+    assert len(renders) == 2
+    # Only the chart for the station's latest request is kept
+    assert list(cache.pngs) == ["FPS"] and cache.pngs["FPS"][0] == newer
+
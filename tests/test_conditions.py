@@ -0,0 +1,54 @@
+import pandas as pd
+
+from conftest import frame, subscription
+from utils.conditions import RollingConditionEngine
+
+
+def test_window_must_fill_before_conditions_turn_on():
+    sub = subscription(window_readings=3)
+    engine = RollingConditionEngine()
+    assert not engine.evaluate("u1", sub, frame([5, 10, 10])).active
+    state = engine.evaluate("u1", sub, frame([5, 10, 10, 10]))
+    assert state.active and state.check_passed(3)["wind_speed"]
+
+
+def test_only_new_rows_are_processed():
+    sub = subscription()
+    engine = RollingConditionEngine()
+    data = frame([10] * 6)
+    engine.evaluate("u1", sub, data.iloc[:4])
+    state = engine.states["u1:FPS"]
+    assert state.streaks[0] == 4
+    engine.evaluate("u1", sub, data)
+    assert state.streaks[0] == 6 and state.last_time == data["date_time"].iloc[-1]
+
+
+def test_hysteresis_holds_through_brief_dips():
+    sub = subscription(release_readings=2)
+    engine = RollingConditionEngine()
+    data = frame([10, 10, 10, 5, 10, 5, 5])
+    assert engine.evaluate("u1", sub, data.iloc[:4]).active  # one failing reading is not enough
+    assert engine.evaluate("u1", sub, data.iloc[:5]).active
+    assert not engine.evaluate("u1", sub, data).active
+
+
+def test_threshold_change_resets_state():
+    engine = RollingConditionEngine()
+    data = frame([10] * 4)
+    assert engine.evaluate("u1", subscription(), data).active
+    assert not engine.evaluate("u1", subscription(wind_speed_min=12), data).active
+
+
+def test_state_persists_between_runs(tmp_path):
+    path = str(tmp_path / "state.json")
+    sub = subscription(release_readings=3)
+    data = frame([10, 10, 10, 5], start=pd.Timestamp.now().floor("min") - pd.Timedelta(minutes=20))
+    engine = RollingConditionEngine(path)
+    engine.evaluate("u1", sub, data)
+    engine.save()
+
+    reloaded = RollingConditionEngine(path)
+    reloaded.load()
+    state = reloaded.states["u1:FPS"]
+    assert state.active and state.fail_streak == 1
+    assert state.last_time == data["date_time"].iloc[-1]
@@ -0,0 +1,101 @@
+import datetime
+
+from fake_supabase import FakeSupabase
+
+from utils.config_snapshot import CONFIG_COLUMNS, ConfigSnapshotCache
+
+VIEW = "user_configurations_with_stations"
+
+
+def iso(minutes_ago):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return (now - datetime.timedelta(minutes=minutes_ago)).isoformat()
+
+
+def view_row(user_id, station_id="FPS", **overrides):
+    row = {column: None for column in CONFIG_COLUMNS}
+    row.update(user_id=user_id, station_id=station_id, wind_speed_min=8.5, extra_column="unused")
+    row.update(overrides)
+    return row
+
+
+def make_client():
+    return FakeSupabase(
+        {
+            VIEW: [view_row("u1"), view_row("u2"), view_row("u2", "KSLC")],
+            "users": [{"id": "u1", "updated_at": iso(600)}, {"id": "u2", "updated_at": iso(600)}],
+            "user_preferences": [{"user_id": "u1", "updated_at": iso(600)}],
+            "user_station_configs": [{"user_id": "u2", "updated_at": iso(600)}],
+            "wind_stations": [{"id": "s1", "updated_at": iso(600)}],
+        }
+    )
+
+
+def view_queries(client):
+    return [call for call in client.calls if call.table == VIEW]
+
+
+def test_first_load_fetches_projected_view(tmp_path):
+    client = make_client()
+    rows = ConfigSnapshotCache(client, str(tmp_path / "snapshot.json")).load()
+    assert len(rows) == 3
+    assert "extra_column" not in rows[0]
+    assert view_queries(client)[0].columns == ",".join(CONFIG_COLUMNS)
+
+
+def test_unchanged_configs_are_served_from_snapshot(tmp_path):
+    client = make_client()
+    path = str(tmp_path / "snapshot.json")
+    ConfigSnapshotCache(client, path).load()
+    client.calls.clear()
+
+    cache = ConfigSnapshotCache(client, path)
+    rows = cache.load()
+    assert len(rows) == 3
+    assert view_queries(client) == []
+    assert cache.last_sync_mode.startswith("incremental (0")
+
+
+def test_only_changed_users_are_refetched(tmp_path):
+    client = make_client()
+    path = str(tmp_path / "snapshot.json")
+    ConfigSnapshotCache(client, path).load()
+    client.calls.clear()
+
+    client.tables["user_preferences"][0]["updated_at"] = iso(0)
+    client.tables[VIEW][0]["wind_speed_min"] = 10.0
+    rows = ConfigSnapshotCache(client, path).load()
+
+    (query,) = view_queries(client)
+    assert query.filters == [("in", "user_id", ["u1"])]
+    assert {row["user_id"]: row["wind_speed_min"] for row in rows}["u1"] == 10.0
+    assert len(rows) == 3
+
+
+def test_station_change_or_old_snapshot_forces_full_refresh(tmp_path):
+    client = make_client()
+    path = str(tmp_path / "snapshot.json")
+    ConfigSnapshotCache(client, path).load()
+
+    client.tables["wind_stations"][0]["updated_at"] = iso(0)
+    cache = ConfigSnapshotCache(client, path)
+    cache.load()
+    assert cache.last_sync_mode == "full"
+
+    cache = ConfigSnapshotCache(client, path, full_refresh_seconds=0)
+    cache.load()
+    assert cache.last_sync_mode == "full"
+
+
+def test_failed_sync_falls_back_to_snapshot(tmp_path):
+    client = make_client()
+    path = str(tmp_path / "snapshot.json")
+    ConfigSnapshotCache(client, path).load()
+
+    class BrokenClient:
+        def table(self, name):
+            raise ConnectionError("supabase unreachable")
+
+    cache = ConfigSnapshotCache(BrokenClient(), path)
+    assert len(cache.load()) == 3
+    assert cache.last_sync_mode == "stale"
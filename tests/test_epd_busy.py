@@ -0,0 +1,61 @@
+import os
+import time
+
+os.environ.setdefault("EPD_BACKEND", "fake")
+
+import pytest
+
+from configs import epd7in5_V2, epdconfig
+
+fake = epdconfig.implementation
+
+
+@pytest.fixture(autouse=True)
+def reset_fake():
+    fake.busy_until = 0.0
+    fake.edge_detection = True
+    fake.busy_reads = 0
+    fake.spi_bytes = 0
+    yield
+
+
+def test_backend_is_fake():
+    assert isinstance(fake, epdconfig.FakeGPIO)
+
+
+def test_wait_until_idle_returns_immediately_when_idle():
+    epdconfig.wait_until_idle(fake.BUSY_PIN, timeout_s=1)
+    assert fake.busy_reads == 1
+
+
+def test_wait_until_idle_uses_edge_wait():
+    fake.set_busy(0.15)
+    start = time.monotonic()
+    epdconfig.wait_until_idle(fake.BUSY_PIN, timeout_s=1)
+    assert 0.14 <= time.monotonic() - start < 0.5
+    assert fake.busy_reads < 10
+
+
+def test_wait_until_idle_polls_with_backoff_without_edge_detection():
+    fake.edge_detection = False
+    fake.set_busy(0.3)
+    epdconfig.wait_until_idle(fake.BUSY_PIN, timeout_s=1, poll_ms=10, max_poll_ms=100)
+    # 10 + 20 + 40 + 80 + 100... ms slices, not a tight spin
+    assert fake.busy_reads < 10
+
+
+def test_wait_until_idle_raises_on_wedged_panel():
+    fake.set_busy(60)
+    start = time.monotonic()
+    with pytest.raises(epdconfig.BusyTimeoutError):
+        epdconfig.wait_until_idle(fake.BUSY_PIN, timeout_s=0.2)
+    assert time.monotonic() - start < 0.5
+
+
+def test_read_busy_sends_status_command_and_times_out():
+    epd = epd7in5_V2.EPD()
+    epd.busy_timeout = 0.1
+    fake.set_busy(60)
+    with pytest.raises(epdconfig.BusyTimeoutError):
+        epd.ReadBusy()
+    assert fake.spi_bytes == fake.busy_reads  # one 0x71 per read
@@ -0,0 +1,99 @@
+import datetime
+import random
+
+import pandas as pd
+
+from utils.fetch_schedule import MAX_STALENESS_SECONDS, FetchScheduler, learn_cadence
+from utils.providers import StationRequest, normalize_observations
+
+NOW = datetime.datetime(2024, 5, 14, 17, 0, tzinfo=datetime.timezone.utc)
+FPS = StationRequest("synoptic", "FPS", 120, {})
+KSLC = StationRequest("synoptic", "KSLC", 120, {})
+
+
+def frame(times):
+    times = pd.to_datetime(times)
+    return pd.DataFrame({"date_time": times, "wind_speed_set_1": [10.0] * len(times)})
+
+
+FRAMES = {
+    "FPS": frame(pd.date_range("2024-05-14 10:00", "2024-05-14 11:00", freq="5min")),
+    # Hourly ASOS reports plus one special
+    "KSLC": frame(["2024-05-14 07:54", "2024-05-14 08:54", "2024-05-14 09:21", "2024-05-14 09:54", "2024-05-14 10:54"]),
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, stations):
+        self.calls.append([s.station_id for s in stations])
+        return {(s.provider, s.station_id): FRAMES[s.station_id] for s in stations}
+
+
+def test_learn_cadence():
+    assert learn_cadence(FRAMES["FPS"]["date_time"]) == 300
+    assert learn_cadence(FRAMES["KSLC"]["date_time"]) == 3600
+    assert learn_cadence(frame(["2024-05-14 10:00"])["date_time"]) is None
+
+
+def test_only_due_stations_are_fetched():
+    scheduler = FetchScheduler(rng=random.Random(0))
+    fetch = Recorder()
+    scheduler.fetch([FPS, KSLC], now=NOW, fetch=fetch)
+
+    results = scheduler.fetch([FPS, KSLC], now=NOW + datetime.timedelta(minutes=6), fetch=fetch)
+    assert fetch.calls == [["FPS", "KSLC"], ["FPS"]]
+    assert scheduler.cadences() == {("synoptic", "FPS"): 5.0, ("synoptic", "KSLC"): 60.0}
+    # Not-due stations are served from the last fetch
+    assert results[("synoptic", "KSLC")]["date_time"].tolist() == FRAMES["KSLC"]["date_time"].tolist()
+
+    scheduler.fetch([FPS, KSLC], now=NOW + datetime.timedelta(minutes=67), fetch=fetch)
+    assert fetch.calls[-1] == ["FPS", "KSLC"]
+
+
+def test_station_is_due_on_the_run_one_cadence_later():
+    for seed in range(20):
+        scheduler = FetchScheduler(rng=random.Random(seed))
+        fetch = Recorder()
+        scheduler.fetch([FPS], now=NOW, fetch=fetch)
+        scheduler.fetch([FPS], now=NOW + datetime.timedelta(minutes=5), fetch=fetch)
+        assert fetch.calls == [["FPS"], ["FPS"]]
+
+
+def test_max_staleness_forces_fetch():
+    scheduler = FetchScheduler(rng=random.Random(0))
+    fetch = Recorder()
+    scheduler.fetch([KSLC], now=NOW, fetch=fetch)
+    scheduler.stations["synoptic:KSLC"]["next_due"] = (NOW + datetime.timedelta(hours=5)).isoformat()
+    scheduler.fetch([KSLC], now=NOW + datetime.timedelta(seconds=MAX_STALENESS_SECONDS), fetch=fetch)
+    assert len(fetch.calls) == 2
+
+
+def test_schedule_persists(tmp_path):
+    path = str(tmp_path / "schedule.json")
+    scheduler = FetchScheduler(path)
+    scheduler.fetch([KSLC], now=NOW, fetch=Recorder())
+    scheduler.save(now=NOW)
+
+    reloaded = FetchScheduler(path)
+    reloaded.load()
+    fetch = Recorder()
+    results = reloaded.fetch([KSLC], now=NOW + datetime.timedelta(minutes=5), fetch=fetch)
+    assert fetch.calls == []
+    pd.testing.assert_frame_equal(results[("synoptic", "KSLC")], FRAMES["KSLC"])
+
+
+def test_cached_frame_round_trips_all_nan_columns(tmp_path):
+    data = normalize_observations(FRAMES["KSLC"].assign(wind_cardinal_direction_set_1d="S"))
+    assert data["wind_gust_set_1"].isna().all() and data["precip_accum_five_minute_set_1"].isna().all()
+    path = str(tmp_path / "schedule.json")
+    scheduler = FetchScheduler(path)
+    scheduler.fetch([KSLC], now=NOW, fetch=lambda stations: {("synoptic", "KSLC"): data})
+    scheduler.save(now=NOW)
+
+    reloaded = FetchScheduler(path)
+    reloaded.load()
+    results = reloaded.fetch([KSLC], now=NOW + datetime.timedelta(minutes=5), fetch=Recorder())
+    pd.testing.assert_frame_equal(results[("synoptic", "KSLC")], data)
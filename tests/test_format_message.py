@@ -0,0 +1,56 @@
+import os
+
+import pandas as pd
+import pytest
+
+from utils.weather_utils import MESSAGE_FORMATS, format_message, load_station_data_fixture
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "synoptic_fps.json")
+
+
+@pytest.fixture
+def station_data():
+    return load_station_data_fixture(FIXTURE)
+
+
+def test_html_table_layout(station_data):
+    message = format_message(station_data, rows=3)
+    assert message == (
+        "<pre>"
+        "12:55   9g13   SSE   \n"
+        "12:50   8g12   SSE   \n"
+        "12:45   8g10   SSE   \n"
+        "</pre>"
+    )
+
+
+def test_missing_gust_and_direction(station_data):
+    lines = format_message(station_data, rows=24, message_format="plain").splitlines()
+    # Observation at 12:25 has no gust; the one at 11:25 has no cardinal direction
+    assert lines[6] == "12:25   7gnan   SE    "
+    assert lines[18].endswith("   -     ")
+    assert station_data["wind_cardinal_direction_set_1d"].isna().sum() == 1  # caller's data untouched
+
+
+def test_eink_format_matches_legacy_html_false(station_data):
+    assert format_message(station_data, rows=10, html=False) == format_message(
+        station_data, rows=10, message_format="eink"
+    )
+    assert format_message(station_data, rows=10, html=False).startswith(MESSAGE_FORMATS["eink"][0])
+
+
+def test_tz_aware_times_use_local_clock(station_data):
+    aware = station_data.assign(date_time=station_data["date_time"].dt.tz_localize("America/Denver"))
+    assert format_message(aware, rows=2) == format_message(station_data, rows=2)
+
+
+def test_empty_frame():
+    empty = pd.DataFrame(
+        {
+            "date_time": pd.to_datetime([]),
+            "wind_speed_set_1": [],
+            "wind_gust_set_1": [],
+            "wind_cardinal_direction_set_1d": [],
+        }
+    )
+    assert format_message(empty, message_format="markdown") == "```\n```"
@@ -0,0 +1,145 @@
+import datetime
+import json
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-key")
+
+import lambda_function  # noqa: E402
+from conftest import row  # noqa: E402
+from fixture_server import FIXTURES  # noqa: E402
+from utils.providers import normalize_observations  # noqa: E402
+from utils.records import build_user_configs  # noqa: E402
+from utils.sharding import write_shard_metrics  # noqa: E402
+from utils.weather_utils import parse_synoptic_response  # noqa: E402
+
+EPOCH = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def hourly_frame(n):
+    return pd.DataFrame(
+        {
+            "date_time": pd.date_range("2024-05-14 09:54", periods=n, freq="60min"),
+            "wind_speed_set_1": [12.0] * n,
+            "wind_gust_set_1": [14.0] * n,
+            "wind_direction_set_1": [150.0] * n,
+            "precip_accum_five_minute_set_1": [0.0] * n,
+        }
+    )
+
+
+@pytest.fixture
+def handler(monkeypatch, tmp_path):
+    """Run lambda_handler against in-memory users and station data; returns (result, run_metrics)."""
+    recorded = []
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "test-token")
+    monkeypatch.setattr(lambda_function.CONDITION_ENGINE, "path", None)
+    monkeypatch.setattr(lambda_function.CONDITION_ENGINE, "states", {})
+    monkeypatch.setattr(lambda_function.FETCH_SCHEDULE, "path", None)
+    monkeypatch.setattr(lambda_function.TELEGRAM_CACHE, "path", str(tmp_path / "telegram.sqlite3"))
+    monkeypatch.setattr(lambda_function, "record_run_metrics", lambda metrics, *_: recorded.append(metrics))
+
+    def run(rows, frames):
+        monkeypatch.setattr(lambda_function, "get_active_users_with_configs", lambda: build_user_configs(rows))
+        monkeypatch.setattr(lambda_function.FETCH_SCHEDULE, "fetch", lambda stations, *_: frames)
+        result = lambda_function.lambda_handler({}, None)
+        lambda_function.TELEGRAM_CACHE.close()
+        return result, recorded[-1]
+
+    return run
+
+
+def test_station_with_fewer_readings_than_the_window_is_skipped(handler):
+    lambda_function.WEATHER_TABLE_CACHE[("KSLC", "2024-05-13 09:54:00", 6, "html")] = "yesterday"
+    rows = [row("u1", "KSLC", 1, window_readings=3, api_config={"lookback_minutes": 60})]
+    result, metrics = handler(rows, {("synoptic", "KSLC"): hourly_frame(1)})
+    # Per-run caches don't carry over between runs
+    assert not lambda_function.WEATHER_TABLE_CACHE
+    assert result["statusCode"] == 200, result
+    assert metrics["success"] and metrics["stations_with_data"] == 1
+    (detail,) = metrics["station_details"]
+    assert detail["conditions_result"] == {"overall_met": False, "checks": {}}
+    assert json.loads(result["body"])["notifications_sent"] == 0
+
+
+def calm_asos_frame():
+    """FPS observations as Synoptic returns them when gusts and precipitation are null throughout."""
+    with open(os.path.join(FIXTURES, "synoptic_fps.json")) as f:
+        payload = json.load(f)
+    observations = payload["STATION"][0]["OBSERVATIONS"]
+    for column in ("wind_gust_set_1", "precip_accum_five_minute_set_1"):
+        observations[column] = [None] * len(observations[column])
+    return normalize_observations(parse_synoptic_response(payload))
+
+
+def test_all_null_columns_are_evaluated_as_numeric(handler):
+    data = calm_asos_frame()
+    assert data["wind_gust_set_1"].dtype == float and data["precip_accum_five_minute_set_1"].dtype == float
+    result, metrics = handler([row("u1", "FPS", 1)], {("synoptic", "FPS"): data})
+    assert result["statusCode"] == 200, result
+    (detail,) = metrics["station_details"]
+    assert detail["conditions_result"]["checks"]["gusts"]["passed"]
+
+
+def test_failed_condition_check_only_skips_that_station(handler, monkeypatch):
+    evaluated = []
+
+    def check(station_data, subscription, *args):
+        evaluated.append(subscription.station_id)
+        if subscription.station_id == "FPS":
+            raise TypeError("Expected numeric dtype, got object instead")
+        return {"conditions_met": False, "checks": {}}
+
+    monkeypatch.setattr(lambda_function, "check_station_conditions", check)
+    rows = [row("u1", "FPS", 1), row("u2", "KSLC", 1)]
+    result, metrics = handler(rows, {("synoptic", "FPS"): hourly_frame(3), ("synoptic", "KSLC"): hourly_frame(3)})
+    assert result["statusCode"] == 200, result
+    assert evaluated == ["FPS", "KSLC"] and metrics["success"]
+
+
+def test_merge_keeps_shard_files_until_the_run_is_logged(monkeypatch, tmp_path):
+    directory = str(tmp_path)
+    for run_id, shard in [("r1", 0), ("r1", 1), ("r0", 0)]:
+        metrics = {"shard": shard, "shards": 2, "start_time": "2024-06-15T18:00:00+00:00", "success": True}
+        write_shard_metrics(dict(metrics, users_found=1), directory, run_id, shard, 2)
+
+    logged = []
+    monkeypatch.setattr(lambda_function, "log_run_metrics", lambda merged: False)
+    with pytest.raises(RuntimeError):
+        lambda_function.merge_shard_run_metrics("r1", directory)
+    assert len(os.listdir(directory)) == 3
+
+    monkeypatch.setattr(lambda_function, "log_run_metrics", lambda merged: logged.append(merged) or True)
+    merged = lambda_function.merge_shard_run_metrics("r1", directory)
+    # The stale shard from run r0 is neither merged nor removed
+    assert merged["users_found"] == 2 and merged["success"] and logged == [merged]
+    assert os.listdir(directory) == ["run_metrics.r0.shard-0-of-2.json"]
+
+
+def test_duplicate_message_is_not_counted_as_sent(handler, monkeypatch):
+    posts, logged = [], []
+    monkeypatch.setattr(
+        lambda_function.requests, "post", lambda url, json: posts.append(json) or SimpleNamespace(status_code=200)
+    )
+    assert lambda_function.send_telegram_message("chat-u1", "hi", "t") == lambda_function.MESSAGE_SENT
+    assert lambda_function.send_telegram_message("chat-u1", "hi", "t") == lambda_function.MESSAGE_SKIPPED
+    assert len(posts) == 1
+
+    met = {"conditions_met": True, "checks": {}}
+    monkeypatch.setattr(lambda_function, "check_station_conditions", lambda *args: met)
+    monkeypatch.setattr(lambda_function, "get_last_notification_time", lambda *args: EPOCH)
+    monkeypatch.setattr(lambda_function, "generate_personalized_message", lambda *args: "hi")
+    monkeypatch.setattr(lambda_function, "log_notification", lambda *args: logged.append(args))
+    rows = [row("u1", "FPS", 1), row("u1", "KSLC", 2)]
+    frames = {("synoptic", "FPS"): hourly_frame(6), ("synoptic", "KSLC"): hourly_frame(6)}
+    result, metrics = handler(rows, frames)
+    assert result["statusCode"] == 200, result
+    assert metrics["notifications_sent"] == 0 and metrics["notification_failures"] == 0
+    assert logged == [] and len(posts) == 1
+    # The user already has this notification; lower-priority stations don't send another
+    (detail,) = metrics["station_details"]
+    assert not detail["notification_sent"] and detail["notification_error"]
@@ -0,0 +1,69 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from conftest import frame, subscription
+from utils.conditions import RollingConditionEngine
+from utils.prefilter import could_match, fetch_candidates, station_summaries, summary_readings
+
+
+def test_summaries_cover_the_longest_window():
+    subs = [subscription(window_readings=3), subscription(window_readings=2, release_readings=5)]
+    readings = summary_readings(subs)
+    assert readings == {("synoptic", "FPS"): 5}
+
+    fetched = {("synoptic", "FPS"): frame([20, 2, 9, 10, 11, 12, np.nan], directions=[100] * 3 + [150] * 4)}
+    (summary,) = station_summaries(fetched, readings)
+    assert summary["station_id"] == "FPS"
+    assert (summary["min_speed"], summary["max_speed"]) == (9.0, 12.0)
+    assert (summary["min_direction"], summary["max_direction"]) == (100.0, 150.0)
+    assert summary["min_gust_differential"] == 2.0
+
+
+def test_calm_station_rules_out_subscription():
+    sub = subscription()
+    (summary,) = station_summaries({("synoptic", "FPS"): frame([2, 2, 3])}, summary_readings([sub]))
+    assert not could_match(summary, sub)
+    (summary,) = station_summaries({("synoptic", "FPS"): frame([np.nan] * 3)}, summary_readings([sub]))
+    assert summary["max_speed"] is None and not could_match(summary, sub)
+
+
+def test_prefilter_never_drops_a_subscription_whose_window_is_on():
+    rng = random.Random(7)
+    for _ in range(300):
+        sub = subscription(window_readings=rng.randint(1, 4), release_readings=rng.randint(1, 4))
+        n = rng.randint(4, 20)
+        data = frame(
+            [rng.choice([5.0, 9.0, 12.0, 18.0]) for _ in range(n)],
+            directions=[rng.choice([100, 150, 170, 200]) for _ in range(n)],
+            rain=[rng.choice([0.0, 0.0, 0.0, 0.1]) for _ in range(n)],
+        )
+        state = RollingConditionEngine().evaluate("u1", sub, data)
+        (summary,) = station_summaries({("synoptic", "FPS"): data}, summary_readings([sub]))
+        if state.active:
+            assert could_match(summary, sub)
+
+
+def test_fetch_candidates_calls_rpc():
+    calls = []
+
+    class Client:
+        def rpc(self, name, params):
+            calls.append((name, params))
+            return SimpleNamespace(execute=lambda: SimpleNamespace(data=[{"user_id": "u1", "station_id": "FPS"}]))
+
+    summaries = [{"station_id": "FPS", "min_speed": 9.0}]
+    assert fetch_candidates(Client(), summaries) == {("u1", "FPS")}
+    assert calls == [("candidate_subscriptions", {"summaries": summaries})]
+    assert fetch_candidates(Client(), []) == set() and len(calls) == 1
+
+
+def test_stations_without_gust_or_precipitation_can_match():
+    sub = subscription()
+    data = frame([10, 11, 12], gusts=[np.nan] * 3, rain=[np.nan] * 3)
+    assert RollingConditionEngine().evaluate("u1", sub, data).active
+    (summary,) = station_summaries({("synoptic", "FPS"): data}, summary_readings([sub]))
+    assert summary["min_gust_differential"] == 0 and summary["min_precipitation"] == 0
+    assert could_match(summary, sub)
@@ -0,0 +1,37 @@
+import os
+
+from utils.process_pool import eval_workers, frame_from_snapshot, map_over_stations, snapshot_frame
+from utils.weather_utils import load_station_data_fixture
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "synoptic_fps.json")
+
+
+def fastest_wind(frame, scale):
+    return round(float(frame["wind_speed_set_1"].max()) * scale, 3)
+
+
+def test_snapshot_round_trip_keeps_dtypes():
+    frame = load_station_data_fixture(FIXTURE)
+    rebuilt = frame_from_snapshot(snapshot_frame(frame))
+    assert rebuilt.equals(frame)
+    assert (rebuilt.dtypes == frame.dtypes).all()
+
+
+def test_map_over_stations_returns_results_in_task_order():
+    frame = load_station_data_fixture(FIXTURE)
+    snapshots = {"FPS": snapshot_frame(frame), "HALF": snapshot_frame(frame.iloc[:12])}
+    tasks = [("FPS", (1,)), ("HALF", (1,)), ("FPS", (2,))]
+    assert map_over_stations(fastest_wind, snapshots, tasks, workers=2) == [
+        fastest_wind(frame, 1),
+        fastest_wind(frame.iloc[:12], 1),
+        fastest_wind(frame, 2),
+    ]
+
+
+def test_eval_workers(monkeypatch):
+    monkeypatch.delenv("SOARBOT_EVAL_WORKERS", raising=False)
+    assert eval_workers() == 1
+    monkeypatch.setenv("SOARBOT_EVAL_WORKERS", "3")
+    assert eval_workers() == 3
+    assert eval_workers("auto") >= 1
+    assert eval_workers(0) == 1
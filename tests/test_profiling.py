@@ -0,0 +1,33 @@
+import glob
+import time
+
+from utils.profiling import StageTimer, maybe_profile
+
+
+def test_stage_timer_aggregates_spans():
+    timer = StageTimer()
+    for _ in range(3):
+        with timer.span("send"):
+            time.sleep(0.01)
+    try:
+        with timer.span("fetch"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    summary = timer.summary()
+    assert list(summary) == ["send", "fetch"]
+    assert summary["send"]["count"] == 3 and summary["fetch"]["count"] == 1
+    assert summary["send"]["total_ms"] >= 30
+    assert summary["send"]["p50_ms"] <= summary["send"]["p95_ms"] <= summary["send"]["total_ms"]
+
+
+def test_maybe_profile_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.delenv("SOARBOT_PROFILE", raising=False)
+    with maybe_profile("run", directory=str(tmp_path)):
+        sum(range(1000))
+    assert not glob.glob(str(tmp_path / "*"))
+
+    with maybe_profile("run", mode="cprofile", directory=str(tmp_path)):
+        sum(range(1000))
+    assert len(glob.glob(str(tmp_path / "run-*.prof"))) == 1
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from conftest import row
+from fixture_server import FixtureServer
+from utils import providers
+from utils.providers import (
+    OBSERVATION_COLUMNS,
+    StationRequest,
+    SynopticProvider,
+    WeatherUndergroundProvider,
+    fetch_stations,
+    station_requests,
+)
+from utils.records import build_user_configs
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with FixtureServer() as server:
+        monkeypatch.setitem(providers.PROVIDERS, "synoptic", SynopticProvider(f"{server.url}/synoptic"))
+        monkeypatch.setitem(
+            providers.PROVIDERS, "weather_underground", WeatherUndergroundProvider(f"{server.url}/wu")
+        )
+        monkeypatch.setattr(providers, "config", SimpleNamespace(token="test-token"))
+        monkeypatch.setenv("WEATHER_UNDERGROUND_API_KEY", "test-key")
+        yield server
+
+
+def request(provider, station_id, lookback=120):
+    return StationRequest(provider, station_id, lookback, {})
+
+
+def test_synoptic_stations_are_batched_into_one_request(server):
+    results = fetch_stations([request("synoptic", "FPS"), request("synoptic", "NOPE", 60)])
+    assert len(server.requests) == 1
+    path, query = server.requests[0]
+    assert query["stid"] == "FPS,NOPE" and query["recent"] == "120"
+
+    fps = results[("synoptic", "FPS")]
+    assert list(fps.columns) == OBSERVATION_COLUMNS and len(fps) == 24
+    assert fps["wind_speed_set_1"].notna().all()
+    assert results[("synoptic", "NOPE")].empty
+
+
+def test_weather_underground_normalized_to_common_schema(server):
+    results = fetch_stations([request("weather_underground", "KUTDRAPE12", lookback=15)])
+    df = results[("weather_underground", "KUTDRAPE12")]
+    assert list(df.columns) == OBSERVATION_COLUMNS
+    assert df["date_time"].tolist() == list(pd.date_range("2024-05-14 10:45", periods=4, freq="5min"))
+    assert df["wind_speed_set_1"].iloc[-1] == 11.8 and df["wind_gust_set_1"].iloc[-1] == 15.4
+    assert df["wind_cardinal_direction_set_1d"].iloc[-1] == "SSE"
+    assert (df["precip_accum_five_minute_set_1"] == 0).all()
+
+
+def test_failures_are_reported_per_station(server, monkeypatch):
+    monkeypatch.setitem(providers.PROVIDERS, "synoptic", SynopticProvider(f"{server.url}/broken"))
+    results = fetch_stations(
+        [request("synoptic", "FPS"), request("weather_underground", "KUTDRAPE12"), request("nws", "KSLC")]
+    )
+    assert isinstance(results[("synoptic", "FPS")], Exception)
+    assert isinstance(results[("nws", "KSLC")], ValueError)
+    assert len(results[("weather_underground", "KUTDRAPE12")]) == 6
+
+
+def test_station_requests_deduplicate_subscribers():
+    users = build_user_configs(
+        [
+            row("u1", "FPS", 1),
+            row("u2", "FPS", 1),
+            row("u2", "KUTDRAPE12", 2, api_provider="weather_underground"),
+        ]
+    )
+    stations = station_requests(s for user in users for s in user.stations)
+    assert [(s.provider, s.station_id) for s in stations] == [
+        ("synoptic", "FPS"),
+        ("weather_underground", "KUTDRAPE12"),
+    ]
+    assert stations[0].lookback_minutes == 120
+
+
+def test_lookback_covers_the_window_at_the_station_cadence():
+    users = build_user_configs(
+        [
+            row("u1", "KSLC", 1, window_readings=3, api_config={"lookback_minutes": 60}),
+            row("u1", "FPS", 2, window_readings=3, api_config={"lookback_minutes": 60}),
+        ]
+    )
+    subscriptions = list(users[0].stations)
+    kslc, fps = station_requests(subscriptions, {("synoptic", "KSLC"): 60.0})
+    assert kslc.lookback_minutes == 240
+    assert fps.lookback_minutes == 60
@@ -0,0 +1,38 @@
+from conftest import row
+from utils.records import StationDetail, build_user_configs
+
+
+def test_rows_grouped_per_user_in_priority_order():
+    users = build_user_configs(
+        [row("u1", "KSLC", 2), row("u1", "FPS", 1, custom_name="Point"), row("u2", "FPS", 1)]
+    )
+    assert [user.user_id for user in users] == ["u1", "u2"]
+    assert [station.station_id for station in users[0].stations] == ["FPS", "KSLC"]
+    assert users[0].stations[0].display_name == "Point"
+    assert users[1].stations[0].display_name == "FPS name"
+
+
+def test_thresholds_are_floats_and_station_fields_shared():
+    u1, u2 = build_user_configs([row("u1", "FPS", 1), row("u2", "FPS", 1)])
+    first, second = u1.stations[0], u2.stations[0]
+    assert first.wind_speed_min == 8.5 and type(first.wind_speed_min) is float
+    assert first.wind_speed_max == 16.0 and first.latitude == 40.5247
+    assert first.max_gust_differential == 5.0  # NULL falls back to the schema default
+    assert first.station_id is second.station_id
+    assert first.api_config is second.api_config
+
+
+def test_station_detail_serializes_all_slots():
+    (user,) = build_user_configs([row("u1", "FPS", 1)])
+    detail = StationDetail(user.user_id, user.stations[0])
+    detail.has_data = True
+    as_dict = detail.to_dict()
+    assert as_dict["station_id"] == "FPS" and as_dict["has_data"] is True
+    assert set(as_dict) == set(StationDetail.__slots__)
+
+
+def test_quiet_hours_parsed_to_minutes():
+    (user,) = build_user_configs(
+        [row("u1", "FPS", 1, quiet_hours_start="22:00:00", quiet_hours_end="06:30:00")]
+    )
+    assert (user.quiet_start_minute, user.quiet_end_minute) == (22 * 60, 6 * 60 + 30)
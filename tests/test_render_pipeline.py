@@ -0,0 +1,86 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from utils.render_pipeline import LatestSlot, ScreenPipeline
+from queue import Empty
+
+
+def test_latest_slot_keeps_only_newest_item():
+    slot = LatestSlot()
+    slot.put(1)
+    slot.put(2)
+    slot.put(3)
+    assert slot.get(timeout=0) == 3
+    assert slot.dropped == 2
+    with pytest.raises(Empty):
+        slot.get(timeout=0.01)
+
+
+def test_pipeline_drops_stale_frames_while_panel_is_busy():
+    fetch_count = {"n": 0}
+    panel_release = threading.Event()
+    shown = []
+
+    def fetch():
+        fetch_count["n"] += 1
+        now = pd.Timestamp("2024-05-01 12:00") + pd.Timedelta(minutes=fetch_count["n"])
+        return pd.DataFrame({"date_time": [now]})
+
+    def show(frame):
+        panel_release.wait(timeout=2)
+        shown.append(frame)
+
+    heartbeat = SimpleNamespace(value=0)
+    pipeline = ScreenPipeline(
+        fetch=fetch,
+        render=lambda station_data: station_data["date_time"].iloc[-1],
+        show=show,
+        interval=0.01,
+        last_image_update=pd.Timestamp("2024-05-01 11:00"),
+        heartbeat=heartbeat,
+        on_shown=lambda image_update: None,
+    )
+    pipeline.start()
+    time.sleep(0.3)
+    panel_release.set()
+    time.sleep(0.1)
+    pipeline.stop(timeout=2)
+
+    # Fetching kept going while the first frame was on the panel, and the frames
+    # that queued up behind it were replaced rather than shown one by one.
+    assert fetch_count["n"] > 3
+    assert pipeline.frame_slot.dropped + pipeline.data_slot.dropped > 0
+    assert shown == sorted(shown)
+    assert len(shown) < fetch_count["n"]
+    assert heartbeat.value > 0
+
+
+def test_frame_that_failed_to_show_is_retried_before_being_reported():
+    attempts, shown = [], []
+
+    def show(frame):
+        attempts.append(frame)
+        if len(attempts) == 1:
+            raise RuntimeError("e-Paper still busy")
+
+    pipeline = ScreenPipeline(
+        fetch=lambda: pd.DataFrame({"date_time": [pd.Timestamp("2024-05-01 12:00")]}),
+        render=lambda station_data: "frame",
+        show=show,
+        interval=10,
+        last_image_update=pd.Timestamp("2024-05-01 11:00"),
+        on_shown=shown.append,
+        retry_delay=0.01,
+    )
+    pipeline.start()
+    deadline = time.time() + 2
+    while not shown and time.time() < deadline:
+        time.sleep(0.01)
+    pipeline.stop(timeout=2)
+
+    assert attempts == ["frame", "frame"]
+    assert shown == [pd.Timestamp("2024-05-01 12:00")]
@@ -0,0 +1,79 @@
+import pytest
+
+from utils.sharding import (
+    merge_run_metrics,
+    parse_shard_spec,
+    read_shard_metrics,
+    shard_of,
+    shard_path,
+    write_shard_metrics,
+)
+
+
+def metrics(shard, shards, **overrides):
+    values = {
+        "shard": shard,
+        "shards": shards,
+        "start_time": f"2024-06-15T18:00:0{shard}+00:00",
+        "end_time": f"2024-06-15T18:00:1{shard}+00:00",
+        "users_found": 2,
+        "users_checked": 2,
+        "notifications_sent": 1,
+        "runtime_seconds": 1.5 + shard,
+        "winter_mode": False,
+        "success": True,
+        "error_message": None,
+        "station_details": [{"user_id": f"u{shard}"}],
+        "stage_timings": {"send": {"count": 2, "total_ms": 10.0, "p50_ms": 5.0, "p95_ms": 6.0 + shard}},
+    }
+    values.update(overrides)
+    return values
+
+
+def test_shard_of_is_stable_and_covers_every_shard():
+    user_ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(400)]
+    assignments = [shard_of(user_id, 4) for user_id in user_ids]
+    assert assignments == [shard_of(user_id, 4) for user_id in user_ids]
+    assert shard_of("00000000-0000-0000-0000-000000000000", 4) == assignments[0]
+    counts = [assignments.count(shard) for shard in range(4)]
+    assert min(counts) > 60
+
+
+def test_parse_shard_spec():
+    assert parse_shard_spec({}) == (0, 1)
+    assert parse_shard_spec({"shard": "2", "shards": "3"}) == (2, 3)
+    with pytest.raises(ValueError):
+        parse_shard_spec({"shard": 3, "shards": 3})
+
+
+def test_shard_path():
+    assert shard_path("/c/state.json", 0, 1) == "/c/state.json"
+    assert shard_path("/c/state.json", 1, 4) == "/c/state.shard-1-of-4.json"
+
+
+def test_merge_run_metrics():
+    merged = merge_run_metrics([metrics(1, 2), metrics(0, 2, notifications_sent=3)])
+    assert merged["users_found"] == 4 and merged["notifications_sent"] == 4
+    assert merged["start_time"] == "2024-06-15T18:00:00+00:00"
+    assert merged["end_time"] == "2024-06-15T18:00:11+00:00"
+    assert merged["runtime_seconds"] == 2.5
+    assert [d["user_id"] for d in merged["station_details"]] == ["u1", "u0"]
+    assert merged["stage_timings"]["send"] == {"count": 4, "total_ms": 20.0, "p50_ms": 5.0, "p95_ms": 7.0}
+    assert merged["success"] and merged["error_message"] is None
+    assert "shard" not in merged
+
+
+def test_merge_reports_failed_and_missing_shards():
+    merged = merge_run_metrics([metrics(0, 3, success=False, error_message="boom"), metrics(1, 3)])
+    assert not merged["success"]
+    assert merged["error_message"] == "shard 0: boom; missing shards: [2]"
+
+
+def test_shard_metrics_are_keyed_by_run(tmp_path):
+    write_shard_metrics(metrics(0, 2), str(tmp_path), "1234-1", 0, 2)
+    write_shard_metrics(metrics(1, 2), str(tmp_path), "1233-1", 1, 2)
+    assert [m["shard"] for m in read_shard_metrics(str(tmp_path), "1234-1")] == [0]
+    with pytest.raises(ValueError):
+        write_shard_metrics(metrics(0, 2), str(tmp_path), None, 0, 2)
+    with pytest.raises(ValueError):
+        read_shard_metrics(str(tmp_path), "../x")
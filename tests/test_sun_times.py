@@ -0,0 +1,47 @@
+import datetime
+
+import pytz
+
+from utils import sun_times
+from utils.sun_times import get_sun_times, is_daytime, is_midday, precompute_year
+
+DENVER = pytz.timezone("America/Denver")
+FPS = (40.5247, -111.8638)
+
+
+def test_sun_times_are_memoized_per_location_and_day():
+    sun_times._sun_times.cache_clear()
+    day = datetime.date(2024, 6, 21)
+    first = get_sun_times(*FPS, day)
+    # Same location given as strings (as Supabase DECIMAL columns may arrive) hits the cache
+    second = get_sun_times("40.5247", "-111.8638", day)
+    assert first == second
+    info = sun_times._sun_times.cache_info()
+    assert info.misses == 1 and info.hits == 1
+    sunrise, sunset = first
+    assert sunrise.tzinfo is not None and sunrise < sunset
+
+
+def test_precompute_year_fills_cache():
+    sun_times._sun_times.cache_clear()
+    assert precompute_year(*FPS, 2024) == 366
+    is_daytime(*FPS, DENVER.localize(datetime.datetime(2024, 3, 5, 12, 0)))
+    assert sun_times._sun_times.cache_info().misses == 366
+
+
+def test_daytime_and_midday_windows():
+    noon = DENVER.localize(datetime.datetime(2024, 6, 21, 13, 0))
+    dawn = DENVER.localize(datetime.datetime(2024, 6, 21, 4, 0))
+    evening = DENVER.localize(datetime.datetime(2024, 6, 21, 19, 0))
+    assert is_daytime(*FPS, noon) and is_midday(*FPS, noon)
+    assert not is_daytime(*FPS, dawn) and not is_midday(*FPS, dawn)
+    assert is_daytime(*FPS, evening) and not is_midday(*FPS, evening)
+    # Aware times in other zones are compared correctly
+    assert is_daytime(*FPS, noon.astimezone(pytz.UTC))
+
+
+def test_daytime_uses_station_coordinates():
+    # Mid-afternoon in Utah is already past the sunset cutoff 20 degrees further east
+    when = DENVER.localize(datetime.datetime(2024, 12, 21, 15, 30))
+    assert is_daytime(*FPS, when)
+    assert not is_daytime(40.5, -90.0, when, "America/Chicago")
@@ -0,0 +1,51 @@
+import datetime
+
+from utils import telegram_cache
+from utils.telegram_cache import TelegramCache, content_hash
+
+
+def test_file_ids_persist_by_content_hash(tmp_path):
+    path = str(tmp_path / "telegram_cache.sqlite3")
+    cache = TelegramCache(path)
+    key = content_hash(b"png bytes")
+    cache.remember_file_id(key, "FID-1")
+    cache.close()
+
+    reopened = TelegramCache(path)
+    assert reopened.file_id(key) == "FID-1"
+    assert reopened.file_id(content_hash(b"other png")) is None
+    reopened.forget_file_id(key)
+    assert reopened.file_id(key) is None
+
+
+def test_recent_messages_are_per_chat():
+    cache = TelegramCache()
+    key = content_hash("Conditions are good at FPS")
+    assert not cache.was_sent("1", key)
+    cache.record_sent("1", key)
+    assert cache.was_sent("1", key)
+    assert not cache.was_sent("2", key)
+    assert not cache.was_sent("1", content_hash("Conditions are good at FPS (updated)"))
+
+
+def test_entries_expire(monkeypatch):
+    cache = TelegramCache()
+    cache.remember_file_id("photo", "FID-1")
+    cache.record_sent("1", "message")
+
+    later = datetime.datetime.now(datetime.timezone.utc) + telegram_cache.FILE_ID_TTL + datetime.timedelta(minutes=1)
+    monkeypatch.setattr(telegram_cache, "_now", lambda: later.timestamp())
+    assert cache.file_id("photo") is None
+    assert not cache.was_sent("1", "message")
+
+    cache.evict()
+    rows = cache.connection.execute("SELECT (SELECT COUNT(*) FROM file_ids), COUNT(*) FROM sent_messages").fetchone()
+    assert rows == (0, 0)
+
+
+def test_unwritable_path_is_a_cache_miss(tmp_path):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    cache = TelegramCache(str(blocker / "telegram_cache.sqlite3"))
+    cache.record_sent("1", "message")
+    assert not cache.was_sent("1", "message")
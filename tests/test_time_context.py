@@ -0,0 +1,55 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from utils.sun_times import is_daytime
+from utils.time_context import (
+    TimeContext,
+    in_quiet_hours,
+    parse_minute_of_day,
+    quiet_hours_mask,
+    sun_daytime_mask,
+)
+
+FPS = (40.5247, -111.8638)
+
+
+def test_parse_minute_of_day():
+    assert parse_minute_of_day("22:00:00") == 1320
+    assert parse_minute_of_day("06:30") == 390
+    assert parse_minute_of_day(datetime.time(1, 5)) == 65
+    assert parse_minute_of_day(None) is None
+
+
+def test_time_context_pins_now_per_timezone():
+    now = datetime.datetime(2024, 7, 1, 18, 0, tzinfo=pytz.UTC)
+    context = TimeContext(now)
+    denver = context.local_now("America/Denver")
+    assert denver.hour == 12 and denver == now
+    assert context.local_now("America/Denver") is denver
+    assert context.minute_of_day("America/Los_Angeles") == 11 * 60
+
+
+def test_quiet_hours_same_day_and_across_midnight():
+    assert in_quiet_hours(13 * 60, 12 * 60, 14 * 60)
+    assert not in_quiet_hours(15 * 60, 12 * 60, 14 * 60)
+    assert in_quiet_hours(23 * 60, 22 * 60, 6 * 60)
+    assert in_quiet_hours(5 * 60, 22 * 60, 6 * 60)
+    assert not in_quiet_hours(12 * 60, 22 * 60, 6 * 60)
+    assert not in_quiet_hours(23 * 60, None, 6 * 60)
+
+
+def test_quiet_hours_mask_matches_scalar():
+    minutes = np.arange(0, 1440, 15)
+    for start, end in [(720, 840), (1320, 360), (-1, 360), (600, 600)]:
+        expected = [in_quiet_hours(m, None if start < 0 else start, end) for m in minutes]
+        assert quiet_hours_mask(minutes, start, end).tolist() == expected
+
+
+def test_sun_daytime_mask_matches_scalar():
+    times = pd.date_range("2024-03-09 00:00", "2024-03-11 23:00", freq="37min", tz="America/Denver")
+    mask = sun_daytime_mask(*FPS, times, "America/Denver")
+    expected = [is_daytime(*FPS, t.to_pydatetime(), "America/Denver") for t in times]
+    assert mask.tolist() == expected
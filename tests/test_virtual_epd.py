@@ -0,0 +1,36 @@
+import os
+import random
+
+os.environ.setdefault("EPD_BACKEND", "fake")
+
+from PIL import Image, ImageChops
+
+from configs import epd7in5_V2
+from utils.eink_utils import update_image
+from utils.virtual_epd import VirtualEPD
+from utils.weather_utils import load_station_data_fixture
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+# matplotlib's anti-aliasing differs slightly between versions; allow a sliver of pixels to move
+MAX_DIFF_FRACTION = 0.01
+
+
+def test_getbuffer_matches_driver_packing():
+    random.seed(0)
+    image = Image.new("L", (480, 800))
+    image.putdata([random.choice((0, 128, 255)) for _ in range(480 * 800)])
+    assert VirtualEPD().getbuffer(image) == epd7in5_V2.EPD().getbuffer(image)
+
+
+def test_rendered_frame_matches_golden_image():
+    station_data = load_station_data_fixture(os.path.join(FIXTURES, "synoptic_fps.json"))
+    epd = VirtualEPD()
+    update_image(epd, station_data)
+
+    assert epd.frames_displayed == 1 and epd.asleep
+    frame = epd.to_image()
+    golden = Image.open(os.path.join(FIXTURES, "golden_frame.png")).convert("1")
+    assert frame.size == golden.size
+    diff = ImageChops.difference(frame.convert("L"), golden.convert("L"))
+    changed = sum(1 for pixel in diff.getdata() if pixel)
+    assert changed / (frame.width * frame.height) < MAX_DIFF_FRACTION
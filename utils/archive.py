@@ -0,0 +1,183 @@
+import datetime
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import pandas as pd
+
+from utils.providers import FETCH_WORKERS, OBSERVATION_COLUMNS, SynopticProvider, get_provider
+from utils.serialization import atomic_write, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("SOARBOT_ARCHIVE_DIR", "archive")
+PROGRESS_FILE = "_progress.json"
+# A month of 5-minute observations is ~9k rows per station; keep each response well under Synoptic's limits
+ARCHIVE_BATCH_SIZE = 5
+# Requests are padded by this much on each side: `start`/`end` are UTC while partitions are local months
+REQUEST_PADDING = datetime.timedelta(days=1)
+
+
+class Chunk(NamedTuple):
+    """One backfill request: a batch of stations over one (local) month."""
+
+    station_ids: List[str]
+    month: pd.Period
+
+
+def months(start: str, end: str) -> List[pd.Period]:
+    """Every month from `start` to `end` inclusive, given as YYYY-MM."""
+    return list(pd.period_range(pd.Period(start, "M"), pd.Period(end, "M"), freq="M"))
+
+
+def partition_path(root: str, station_id: str, month: pd.Period) -> str:
+    return os.path.join(root, f"station={station_id}", f"month={month.strftime('%Y-%m')}", "observations.parquet")
+
+
+def _progress_key(station_id: str, month: pd.Period) -> str:
+    return f"{station_id}/{month.strftime('%Y-%m')}"
+
+
+class ObservationArchive:
+    """Synoptic observations on disk as Parquet, one file per station and local month.
+
+    `_progress.json` records every completed station-month, so an interrupted
+    backfill picks up where it stopped. The current month is never recorded as
+    complete and is fetched again on the next run.
+    """
+
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = root
+        self.progress_path = os.path.join(root, PROGRESS_FILE)
+        self.progress: Dict[str, Dict] = self._load_progress()
+
+    def _load_progress(self) -> Dict[str, Dict]:
+        try:
+            with open(self.progress_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_progress(self) -> None:
+        write_json_atomic(self.progress_path, self.progress, indent=1, sort_keys=True)
+
+    def is_complete(self, station_id: str, month: pd.Period) -> bool:
+        return _progress_key(station_id, month) in self.progress
+
+    def write(self, station_id: str, month: pd.Period, df: pd.DataFrame, complete: bool) -> None:
+        """Replace the station-month partition with `df`, then record it in the progress file."""
+        path = partition_path(self.root, station_id, month)
+        if len(df):
+            with atomic_write(path) as tmp_path:
+                df.to_parquet(tmp_path, index=False)
+        elif os.path.exists(path):
+            os.remove(path)
+        if complete:
+            self.progress[_progress_key(station_id, month)] = {
+                "rows": len(df),
+                "fetched_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            }
+            self._save_progress()
+
+    def stations(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name.split("=", 1)[1] for name in os.listdir(self.root) if name.startswith("station="))
+
+    def load(
+        self, station_id: str, start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None
+    ) -> pd.DataFrame:
+        """Archived observations for one station, optionally limited to [start, end) local time."""
+        station_dir = os.path.join(self.root, f"station={station_id}")
+        paths = []
+        if os.path.isdir(station_dir):
+            for name in sorted(os.listdir(station_dir)):
+                month = pd.Period(name.split("=", 1)[1], "M")
+                if (start is None or month.end_time >= pd.Timestamp(start)) and (
+                    end is None or month.start_time < pd.Timestamp(end)
+                ):
+                    path = partition_path(self.root, station_id, month)
+                    if os.path.exists(path):
+                        paths.append(path)
+        if not paths:
+            return pd.DataFrame(columns=OBSERVATION_COLUMNS)
+
+        df = pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+        if start is not None:
+            df = df[df["date_time"] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df["date_time"] < pd.Timestamp(end)]
+        return df.reset_index(drop=True)
+
+
+def plan_chunks(
+    archive: ObservationArchive,
+    station_ids: Iterable[str],
+    periods: Iterable[pd.Period],
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    force: bool = False,
+) -> List[Chunk]:
+    """Requests still needed: per month, the stations not yet archived, in batches of `batch_size`."""
+    station_ids = list(station_ids)
+    chunks = []
+    for month in periods:
+        pending = [sid for sid in station_ids if force or not archive.is_complete(sid, month)]
+        for start in range(0, len(pending), batch_size):
+            chunks.append(Chunk(pending[start:start + batch_size], month))
+    return chunks
+
+
+def _fetch_chunk(provider: SynopticProvider, chunk: Chunk, token: Optional[str]) -> Dict[str, pd.DataFrame]:
+    month_start = chunk.month.start_time.to_pydatetime()
+    month_end = (chunk.month + 1).start_time.to_pydatetime()
+    provider.limiter.wait()
+    data = provider.fetch_range(
+        chunk.station_ids, month_start - REQUEST_PADDING, month_end + REQUEST_PADDING, token
+    )
+    # Observation times are local wall-clock; keep exactly this local month
+    return {
+        sid: df[(df["date_time"] >= month_start) & (df["date_time"] < month_end)].reset_index(drop=True)
+        for sid, df in data.items()
+    }
+
+
+def backfill(
+    archive: ObservationArchive,
+    station_ids: List[str],
+    periods: List[pd.Period],
+    token: Optional[str] = None,
+    max_workers: int = FETCH_WORKERS,
+    force: bool = False,
+    now: Optional[datetime.datetime] = None,
+) -> Dict[str, int]:
+    """Fetch and archive every station-month not archived yet, concurrently and rate limited.
+
+    Each chunk is written (and recorded as done) as soon as it arrives; a
+    failed chunk is logged and left for the next run. Returns counts of
+    requests, failed requests and rows written.
+    """
+    provider = get_provider("synoptic")
+    current_month = pd.Period(now or datetime.datetime.now(), "M")
+    chunks = plan_chunks(archive, station_ids, periods, force=force)
+    stats = {"requests": len(chunks), "failed": 0, "rows": 0}
+    if not chunks:
+        return stats
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+        futures = {pool.submit(_fetch_chunk, provider, chunk, token): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                logger.error(f"Backfill of {chunk.station_ids} for {chunk.month} failed: {e}")
+                stats["failed"] += 1
+                continue
+            for sid in chunk.station_ids:
+                df = data.get(sid, pd.DataFrame(columns=OBSERVATION_COLUMNS))
+                archive.write(sid, chunk.month, df, complete=chunk.month < current_month)
+                stats["rows"] += len(df)
+            logger.info(f"Archived {chunk.month} for {', '.join(chunk.station_ids)}")
+    return stats
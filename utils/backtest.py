@@ -0,0 +1,317 @@
+import bisect
+import datetime
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.conditions import subscription_signature
+from utils.fetch_schedule import learn_cadence
+from utils.providers import subscription_lookback
+from utils.records import StationSubscription, UserConfig
+from utils.sun_times import DEFAULT_TIMEZONE
+from utils.time_context import (
+    DAYTIME_HOURS,
+    MIDDAY_HOURS,
+    as_utc,
+    hour_window_mask,
+    quiet_hours_mask,
+    sun_daytime_mask,
+)
+
+logger = logging.getLogger(__name__)
+
+# lambda_handler runs every 5 minutes
+RUN_INTERVAL = pd.Timedelta(minutes=5)
+# check_winter: before mid-March or after November 1st (day of year)
+WINTER_BEFORE_DAY = datetime.date(2023, 3, 15).timetuple().tm_yday
+WINTER_AFTER_DAY = datetime.date(2023, 11, 1).timetuple().tm_yday
+
+SUMMARY_COLUMNS = [
+    "user_id",
+    "station_id",
+    "priority",
+    "weather_met",
+    "conditions_met",
+    "cooldown_blocks",
+    "notifications",
+    "first_notification",
+    "last_notification",
+]
+
+
+class BacktestResult(NamedTuple):
+    """Per-subscription counts (in runs) and every notification that would have been sent."""
+
+    summary: pd.DataFrame
+    notifications: pd.DataFrame
+
+
+def run_times(start, end) -> pd.DatetimeIndex:
+    """Every scheduled run in [start, end), as UTC; naive bounds are taken as UTC."""
+    return pd.date_range(as_utc(start).ceil(RUN_INTERVAL), as_utc(end), freq=RUN_INTERVAL, inclusive="left")
+
+
+def _last_break(breaks: np.ndarray) -> np.ndarray:
+    """Index of the latest True at or before each position along the last axis (-1 if none)."""
+    positions = np.arange(breaks.shape[-1], dtype=np.int32)
+    return np.maximum.accumulate(np.where(breaks, positions, np.int32(-1)), axis=-1)
+
+
+class StationReplay:
+    """Window state after every observation of one station, for each distinct subscription signature.
+
+    Mirrors RollingConditionEngine: conditions switch on once every check has
+    passed for `window_readings` readings and off after `release_readings`
+    failing readings. The state is rebuilt from scratch where the lambda
+    would have rebuilt it, i.e. when the previous observation had already left
+    the fetched lookback window by the first run that saw the next one.
+    """
+
+    def __init__(self, observations: pd.DataFrame, utc_times: pd.DatetimeIndex, lookback: pd.Timedelta):
+        self.times = utc_times.asi8
+        self.lookback = lookback
+        first_run = utc_times.ceil(RUN_INTERVAL).asi8
+        resets = np.zeros(len(self.times), dtype=bool)
+        resets[1:] = self.times[:-1] < first_run[1:] - lookback.value
+        self.segment_start = np.maximum.accumulate(
+            np.where(resets, np.arange(len(self.times), dtype=np.int32), np.int32(0))
+        )
+        self.speed = observations["wind_speed_set_1"].to_numpy(dtype=float)
+        self.direction = observations["wind_direction_set_1"].to_numpy(dtype=float)
+        self.gust_differential = observations["wind_gust_set_1"].to_numpy(dtype=float) - self.speed
+        self.rain = observations["precip_accum_five_minute_set_1"].to_numpy(dtype=float)
+        self.rows: Dict[Tuple[float, ...], int] = {}
+        self.active: Optional[np.ndarray] = None
+        self.latest: Optional[np.ndarray] = None
+        self.readings: Optional[np.ndarray] = None
+        self.weather: Dict[int, np.ndarray] = {}
+
+    def prepare(self, subscriptions: Iterable[StationSubscription], runs: pd.DatetimeIndex) -> None:
+        """Compute the window state for every distinct signature, all at once as (signatures x readings).
+
+        Also finds, for every run, its latest observation and how many
+        observations its lookback window holds.
+        """
+        self.latest = np.searchsorted(self.times, runs.asi8, side="right") - 1
+        self.readings = self.latest + 1 - np.searchsorted(self.times, runs.asi8 - self.lookback.value, side="left")
+        for subscription in subscriptions:
+            self.rows.setdefault(tuple(subscription_signature(subscription)), len(self.rows))
+        if not self.rows:
+            return
+        # Pass/fail runs depend only on the thresholds (all but window and release), which many signatures share
+        thresholds: Dict[Tuple[float, ...], int] = {}
+        threshold_rows = [thresholds.setdefault(signature[:5], len(thresholds)) for signature in self.rows]
+        (speed_min, speed_max, direction_min, direction_max, gust_max) = (
+            np.array(column, dtype=float)[:, None] for column in zip(*thresholds)
+        )
+        with np.errstate(invalid="ignore"):
+            passed = (
+                (speed_min <= self.speed)
+                & (self.speed <= speed_max)
+                & (direction_min <= self.direction)
+                & (self.direction <= direction_max)
+                & ~(self.gust_differential > gust_max)
+                & ~(self.rain > 0)
+            )
+        # Length so far of the current run of passing (or failing) readings; a rebuild starts new runs
+        positions = np.arange(len(self.times), dtype=np.int32)
+        changed = np.ones_like(passed)
+        changed[:, 1:] = passed[:, 1:] != passed[:, :-1]
+        changed[:, self.segment_start == positions] = True
+        run_length = (positions + 1 - _last_break(changed))[threshold_rows]
+        passed = passed[threshold_rows]
+
+        window, release = (np.array(column, dtype=np.int32)[:, None] for column in list(zip(*self.rows))[5:])
+        # On once the last `window` readings all passed, off once the last `release` all failed
+        switched_on = passed & (run_length >= window)
+        # With release_readings 1 every failing reading switches off: on exactly when switched on
+        self.active = switched_on
+        latched = np.flatnonzero(release[:, 0] > 1)
+        if len(latched):
+            # Otherwise the latest event wins, encoded as 2*position (+1 when on); a rebuild at
+            # position p counts as an "off" just before any event at p
+            events = np.where(
+                switched_on[latched],
+                2 * positions + 1,
+                np.where(~passed[latched] & (run_length[latched] >= release[latched]), 2 * positions, np.int32(-1)),
+            )
+            latest_event = np.maximum(np.maximum.accumulate(events, axis=-1), 2 * self.segment_start)
+            self.active[latched] = (latest_event & 1).astype(bool)
+
+    def weather_runs(self, subscription: StationSubscription) -> np.ndarray:
+        """Indices of the runs at which the subscription's weather window was on.
+
+        A run sees the observations from the last `lookback`; with fewer than
+        `window_readings` of them check_station_conditions reports insufficient data.
+        """
+        row = self.rows[tuple(subscription_signature(subscription))]
+        runs = self.weather.get(row)
+        if runs is None:
+            on = self.readings >= subscription.window_readings
+            if len(self.times):
+                on &= self.active[row][np.maximum(self.latest, 0)]
+            runs = self.weather[row] = np.flatnonzero(on)
+        return runs
+
+
+class TimeMasks:
+    """The time checks of check_station_conditions for every run, memoized per timezone and location."""
+
+    def __init__(self, runs: pd.DatetimeIndex):
+        self.runs = runs
+        day_of_year = runs.dayofyear.to_numpy()
+        self.winter = (day_of_year < WINTER_BEFORE_DAY) | (day_of_year > WINTER_AFTER_DAY)
+        self.local: Dict[str, pd.DatetimeIndex] = {}
+        self.daytime: Dict[Tuple, np.ndarray] = {}
+        self.user: Dict[Tuple, np.ndarray] = {}
+
+    def _local(self, timezone: str) -> pd.DatetimeIndex:
+        local = self.local.get(timezone)
+        if local is None:
+            local = self.local[timezone] = self.runs.tz_convert(timezone)
+        return local
+
+    def station_daytime(self, subscription: StationSubscription, timezone: str) -> np.ndarray:
+        key = (subscription.latitude, subscription.longitude, timezone)
+        mask = self.daytime.get(key)
+        if mask is None:
+            local = self._local(timezone)
+            if subscription.latitude is not None and subscription.longitude is not None:
+                mask = sun_daytime_mask(subscription.latitude, subscription.longitude, local, timezone)
+            else:
+                mask = hour_window_mask(local.hour, DAYTIME_HOURS)
+            self.daytime[key] = mask
+        return mask
+
+    def user_hours(self, user: UserConfig) -> np.ndarray:
+        """Outside quiet hours and, in summer unless winter midday is enabled, outside midday."""
+        key = (user.timezone, user.quiet_start_minute, user.quiet_end_minute, user.enable_winter_midday)
+        mask = self.user.get(key)
+        if mask is None:
+            local = self._local(user.timezone)
+            minutes = local.hour * 60 + local.minute
+            quiet = quiet_hours_mask(
+                minutes,
+                -1 if user.quiet_start_minute is None else user.quiet_start_minute,
+                -1 if user.quiet_end_minute is None else user.quiet_end_minute,
+            )
+            mask = ~quiet
+            if not user.enable_winter_midday:
+                mask &= self.winter | ~hour_window_mask(local.hour, MIDDAY_HOURS)
+            self.user[key] = mask
+        return mask
+
+
+def _sends(available: np.ndarray, cooldown_runs: int) -> np.ndarray:
+    """Of the sorted available runs, those that notify: the first, then each first `cooldown_runs` after the last."""
+    runs = available.tolist()
+    sends = []
+    i = 0
+    while i < len(runs):
+        sends.append(runs[i])
+        i = bisect.bisect_left(runs, runs[i] + cooldown_runs, i + 1)
+    return np.array(sends, dtype=np.int64)
+
+
+def localize_observations(
+    observations: pd.DataFrame, timezone: str = DEFAULT_TIMEZONE
+) -> Tuple[pd.DataFrame, pd.DatetimeIndex]:
+    """Observations with their local wall-clock `date_time` as UTC instants.
+
+    The archive keeps Synoptic's local times without an offset, so readings in
+    the hour repeated when daylight saving time ends are dropped.
+    """
+    utc = pd.DatetimeIndex(observations["date_time"]).tz_localize(timezone, ambiguous="NaT", nonexistent="NaT")
+    keep = ~utc.isna()
+    return observations[keep].reset_index(drop=True), utc[keep].tz_convert("UTC")
+
+
+def replay(
+    users: List[UserConfig],
+    observations: Dict[str, pd.DataFrame],
+    start,
+    end,
+    station_timezone: str = DEFAULT_TIMEZONE,
+) -> BacktestResult:
+    """Replay every scheduled run in [start, end) for all users against archived observations.
+
+    Applies the rules of lambda_handler: a subscription notifies when its
+    weather window is on and the daytime, quiet-hours and midday checks pass,
+    unless that user x station notified within the cooldown; each run sends
+    at most one notification per user, for the highest-priority station.
+    Telegram sends are assumed to succeed and there is no cooldown carried in
+    from before `start`. `observations` maps station_id to archived frames,
+    whose times are local to `station_timezone`.
+    """
+    runs = run_times(start, end)
+    masks = TimeMasks(runs)
+
+    stations: Dict[str, StationReplay] = {}
+    subscribers: Dict[str, List[StationSubscription]] = {}
+    for user in users:
+        for subscription in user.stations:
+            if subscription.enabled:
+                subscribers.setdefault(subscription.station_id, []).append(subscription)
+    for station_id, subscriptions in subscribers.items():
+        frame = observations.get(station_id)
+        if frame is None:
+            frame = pd.DataFrame(
+                columns=["date_time", "wind_speed_set_1", "wind_direction_set_1", "wind_gust_set_1",
+                         "precip_accum_five_minute_set_1"]
+            )
+        frame, utc_times = localize_observations(frame, station_timezone)
+        # The station is fetched once with the longest lookback any subscriber needs, at the cadence
+        # the fetch schedule would learn from its observations
+        cadence = learn_cadence(utc_times.to_series())
+        cadence_minutes = cadence / 60 if cadence else None
+        lookback = max(subscription_lookback(subscription, cadence_minutes) for subscription in subscriptions)
+        station = stations[station_id] = StationReplay(frame, utc_times, pd.Timedelta(minutes=lookback))
+        station.prepare(subscriptions, runs)
+
+    summary_rows = []
+    sent_runs: List[np.ndarray] = []
+    sent_keys: List[Tuple[str, str]] = []
+    for user in users:
+        user_hours = masks.user_hours(user)
+        # Runs are evenly spaced, so the cooldown is a whole number of runs (at least the next one)
+        cooldown = pd.Timedelta(hours=user.notification_cooldown_hours)
+        cooldown_runs = max(1, -(-cooldown.value // RUN_INTERVAL.value))
+        notified = np.zeros(len(runs), dtype=bool)
+        for subscription in user.stations:
+            if not subscription.enabled:
+                continue
+            # Only runs with the weather on are looked at from here
+            weather = stations[subscription.station_id].weather_runs(subscription)
+            met = weather[user_hours[weather] & masks.station_daytime(subscription, user.timezone)[weather]]
+            # A run stops at the first station that notifies; lower priorities are not checked
+            available = met[~notified[met]]
+            sends = _sends(available, cooldown_runs)
+            notified[sends] = True
+            summary_rows.append(
+                (
+                    user.user_id,
+                    subscription.station_id,
+                    subscription.priority,
+                    len(weather),
+                    len(met),
+                    len(available) - len(sends),
+                    len(sends),
+                    runs[sends[0]] if len(sends) else pd.NaT,
+                    runs[sends[-1]] if len(sends) else pd.NaT,
+                )
+            )
+            sent_runs.append(sends)
+            sent_keys.append((user.user_id, subscription.station_id))
+
+    counts = [len(sends) for sends in sent_runs]
+    notifications = pd.DataFrame(
+        {
+            "time": runs[np.concatenate(sent_runs)] if sent_runs else runs[:0],
+            "user_id": np.repeat(np.array([key[0] for key in sent_keys], dtype=object), counts),
+            "station_id": np.repeat(np.array([key[1] for key in sent_keys], dtype=object), counts),
+        }
+    ).sort_values(["time", "user_id"], ignore_index=True)
+    logger.info(f"Replayed {len(runs)} runs for {len(users)} users: {len(notifications)} notifications")
+    return BacktestResult(pd.DataFrame(summary_rows, columns=SUMMARY_COLUMNS), notifications)
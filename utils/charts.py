@@ -0,0 +1,74 @@
+import io
+from typing import Dict, Tuple
+
+import pandas as pd
+
+CHART_ROWS = 24  # two hours of 5-minute observations
+
+ChartKey = Tuple[str, str]
+
+
+def render_wind_chart(station_data: pd.DataFrame, title: str = "", rows: int = CHART_ROWS) -> bytes:
+    """PNG of wind speed, gusts and direction over the last `rows` observations.
+
+    Uses the object-oriented matplotlib API (no pyplot global state), so it is
+    safe to call from worker threads and processes.
+    """
+    import matplotlib.dates as m_dates
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    data = station_data.tail(rows)
+    times = data["date_time"]
+    if times.dt.tz is not None:
+        times = times.dt.tz_localize(None)  # keep local wall-clock time
+
+    fig = Figure(figsize=(6, 3.2), dpi=100)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    ax.plot(times, data["wind_speed_set_1"], color="tab:blue", linewidth=2, label="Speed")
+    ax.plot(times, data["wind_gust_set_1"], color="tab:red", linestyle="--", label="Gust")
+    ax.set_ylabel("mph")
+    ax.set_ylim(bottom=0)
+    ax.grid(alpha=0.3)
+    ax.xaxis.set_major_formatter(m_dates.DateFormatter("%H:%M"))
+
+    direction_ax = ax.twinx()
+    direction_ax.scatter(times, data["wind_direction_set_1"], color="tab:green", s=12, label="Direction")
+    direction_ax.set_ylim(0, 360)
+    direction_ax.set_yticks([0, 90, 180, 270, 360])
+    direction_ax.set_yticklabels(["N", "E", "S", "W", "N"])
+
+    handles = ax.get_legend_handles_labels()
+    direction_handles = direction_ax.get_legend_handles_labels()
+    ax.legend(handles[0] + direction_handles[0], handles[1] + direction_handles[1], loc="upper left", fontsize=8)
+    if title:
+        ax.set_title(title)
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+class ChartCache:
+    """Wind chart PNGs keyed by (station, latest observation), each rendered at most once.
+
+    Only each station's newest chart is kept, so a long-lived process holds at
+    most one PNG per station.
+    """
+
+    def __init__(self):
+        self.pngs: Dict[str, Tuple[ChartKey, bytes]] = {}
+
+    @staticmethod
+    def key(station_id: str, station_data: pd.DataFrame) -> ChartKey:
+        return station_id, pd.Timestamp(station_data["date_time"].iloc[-1]).isoformat()
+
+    def png(self, key: ChartKey, station_data: pd.DataFrame, title: str = "") -> bytes:
+        cached = self.pngs.get(key[0])
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        png = render_wind_chart(station_data, title)
+        self.pngs[key[0]] = (key, png)
+        return png
@@ -0,0 +1,173 @@
+import datetime
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.records import StationSubscription
+from utils.serialization import write_json_atomic
+from utils.time_context import as_utc
+
+logger = logging.getLogger(__name__)
+
+# Order of the per-reading weather checks in WindowState.streaks
+CHECKS = ("wind_speed", "wind_direction", "gusts", "precipitation")
+
+DEFAULT_WINDOW_READINGS = 3
+DEFAULT_RELEASE_READINGS = 1
+# Drop state for subscriptions that have not seen an observation for this long
+STATE_TTL = datetime.timedelta(days=2)
+
+
+def reading_checks(speed, direction, gust, rain, subscription: StationSubscription) -> Tuple[bool, ...]:
+    """Pass/fail of each check in CHECKS for a single observation.
+
+    A missing speed or direction fails its check; a missing gust or
+    precipitation (stations that don't report them) counts as no gust excess
+    and no rain.
+    """
+    return (
+        subscription.wind_speed_min <= speed <= subscription.wind_speed_max,
+        subscription.wind_direction_min <= direction <= subscription.wind_direction_max,
+        not gust - speed > subscription.max_gust_differential,
+        not rain > 0,
+    )
+
+
+def subscription_signature(subscription: StationSubscription) -> List[float]:
+    """Everything that affects window state; a change resets the state."""
+    return [
+        subscription.wind_speed_min,
+        subscription.wind_speed_max,
+        subscription.wind_direction_min,
+        subscription.wind_direction_max,
+        subscription.max_gust_differential,
+        subscription.window_readings,
+        subscription.release_readings,
+    ]
+
+
+class WindowState:
+    """Rolling-window state for one user x station.
+
+    `streaks` counts consecutive passing readings per check, so "every reading
+    in the last N passed" is just `streak >= N` and each new observation is O(1).
+    Conditions switch on once every check has passed for `window_readings`
+    readings and only switch off after `release_readings` consecutive readings
+    in which some check failed.
+    """
+
+    __slots__ = ("signature", "last_time", "streaks", "fail_streak", "active")
+
+    def __init__(self, signature: List[float]):
+        self.signature = signature
+        self.last_time: Optional[pd.Timestamp] = None
+        self.streaks = [0] * len(CHECKS)
+        self.fail_streak = 0
+        self.active = False
+
+    def update(self, passed: Tuple[bool, ...], window_readings: int, release_readings: int) -> None:
+        streaks = self.streaks
+        for i, ok in enumerate(passed):
+            streaks[i] = streaks[i] + 1 if ok else 0
+        self.fail_streak = 0 if all(passed) else self.fail_streak + 1
+
+        if not self.active:
+            self.active = min(streaks) >= window_readings
+        elif self.fail_streak >= release_readings:
+            self.active = False
+
+    def check_passed(self, window_readings: int) -> Dict[str, bool]:
+        return {name: streak >= window_readings for name, streak in zip(CHECKS, self.streaks)}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "signature": self.signature,
+            "last_time": self.last_time.isoformat() if self.last_time is not None else None,
+            "streaks": self.streaks,
+            "fail_streak": self.fail_streak,
+            "active": self.active,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WindowState":
+        state = cls(data["signature"])
+        state.last_time = pd.Timestamp(data["last_time"]) if data["last_time"] else None
+        state.streaks = list(data["streaks"])
+        state.fail_streak = data["fail_streak"]
+        state.active = data["active"]
+        return state
+
+
+class RollingConditionEngine:
+    """Window states for every user x station, advanced only by observations not seen before.
+
+    With a `path` the states are persisted between runs as JSON, so each run
+    processes just the rows that arrived since the previous one. Without it
+    (or after a gap, or a change to the subscription's thresholds) the state is
+    rebuilt from the whole frame, which gives the same result as a fresh check.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.states: Dict[str, WindowState] = {}
+
+    @staticmethod
+    def key(user_id: str, station_id: str) -> str:
+        return f"{user_id}:{station_id}"
+
+    def evaluate(self, user_id: str, subscription: StationSubscription, station_data) -> WindowState:
+        key = self.key(user_id, subscription.station_id)
+        signature = subscription_signature(subscription)
+        times = station_data["date_time"]
+        state = self.states.get(key)
+
+        start = 0
+        if (
+            state is not None
+            and state.signature == signature
+            and state.last_time is not None
+            and len(times)
+            and state.last_time >= times.iloc[0]
+        ):
+            start = int(times.searchsorted(state.last_time, side="right"))
+        else:
+            state = self.states[key] = WindowState(signature)
+
+        if start < len(times):
+            window = subscription.window_readings
+            release = subscription.release_readings
+            new_rows = zip(
+                station_data["wind_speed_set_1"].to_numpy(dtype=float)[start:],
+                station_data["wind_direction_set_1"].to_numpy(dtype=float)[start:],
+                station_data["wind_gust_set_1"].to_numpy(dtype=float)[start:],
+                station_data["precip_accum_five_minute_set_1"].to_numpy(dtype=float)[start:],
+            )
+            for speed, direction, gust, rain in new_rows:
+                state.update(reading_checks(speed, direction, gust, rain, subscription), window, release)
+            state.last_time = times.iloc[-1]
+        return state
+
+    def load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                self.states = {key: WindowState.from_dict(data) for key, data in json.load(f).items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.states = {}
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        cutoff = pd.Timestamp.now(tz="UTC") - STATE_TTL
+        states = {
+            key: state.to_dict()
+            for key, state in self.states.items()
+            if state.last_time is not None and as_utc(state.last_time) >= cutoff
+        }
+        try:
+            write_json_atomic(self.path, states)
+        except OSError as e:
+            logger.warning(f"Could not write condition state to {self.path}: {e}")
@@ -0,0 +1,187 @@
+import datetime
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set
+
+from utils.serialization import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+# Columns of user_configurations_with_stations that lambda_handler actually reads
+CONFIG_COLUMNS = [
+    "user_id",
+    "telegram_chat_id",
+    "username",
+    "first_name",
+    "last_name",
+    "notification_cooldown_hours",
+    "timezone",
+    "notifications_enabled",
+    "include_weather_chart",
+    "message_rows",
+    "enable_winter_midday",
+    "quiet_hours_start",
+    "quiet_hours_end",
+    "station_id",
+    "station_name",
+    "station_description",
+    "latitude",
+    "longitude",
+    "api_provider",
+    "api_config",
+    "wind_speed_min",
+    "wind_speed_max",
+    "wind_direction_min",
+    "wind_direction_max",
+    "max_gust_differential",
+    "priority",
+    "custom_name",
+    "station_enabled",
+    "min_visibility_miles",
+    "max_precipitation_rate",
+    "window_readings",
+    "release_readings",
+]
+
+# Tables whose updated_at marks a change to one user's configuration -> column holding the user id
+USER_CHANGE_SOURCES = {
+    "users": "id",
+    "user_preferences": "user_id",
+    "user_station_configs": "user_id",
+}
+
+# Deleted rows leave no updated_at behind, so re-pull the whole view at least this often
+FULL_REFRESH_SECONDS = 3600
+# Overlap each incremental window to absorb clock skew between the runner and Postgres
+CLOCK_SKEW_SECONDS = 60
+# Keep PostgREST `in.(...)` filters well under URL length limits
+USER_ID_CHUNK_SIZE = 100
+
+CACHE_DIR = os.getenv(
+    "SOARBOT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"),
+)
+
+
+class ConfigSnapshotCache:
+    """Local snapshot of `user_configurations_with_stations` refreshed incrementally.
+
+    Each `load()` asks Supabase only which users changed since the last sync
+    (by `updated_at` on users, user_preferences and user_station_configs) and
+    re-fetches the view rows for just those users. A change to `wind_stations`,
+    a missing/corrupt snapshot or one older than `full_refresh_seconds` triggers
+    a full re-fetch. Only CONFIG_COLUMNS are selected.
+    """
+
+    def __init__(self, client, path: str, full_refresh_seconds: int = FULL_REFRESH_SECONDS):
+        self.client = client
+        self.path = path
+        self.full_refresh_seconds = full_refresh_seconds
+        self.last_sync_mode: Optional[str] = None
+
+    def load(self) -> List[Dict[str, Any]]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        snapshot = self._read()
+        try:
+            if snapshot is None or self._is_stale(snapshot, now):
+                rows = self._fetch_all()
+                self._write(rows, now, now)
+                self.last_sync_mode = "full"
+                return rows
+
+            since = datetime.datetime.fromisoformat(snapshot["synced_at"]) - datetime.timedelta(
+                seconds=CLOCK_SKEW_SECONDS
+            )
+            changed_user_ids = self._changed_user_ids(since)
+            if changed_user_ids is None:
+                rows = self._fetch_all()
+                self._write(rows, now, now)
+                self.last_sync_mode = "full"
+                return rows
+
+            rows = snapshot["rows"]
+            if changed_user_ids:
+                rows = [row for row in rows if row["user_id"] not in changed_user_ids]
+                rows.extend(self._fetch_users(sorted(changed_user_ids)))
+            self._write(rows, now, datetime.datetime.fromisoformat(snapshot["full_refresh_at"]))
+            self.last_sync_mode = f"incremental ({len(changed_user_ids)} users changed)"
+            return rows
+        except Exception as e:
+            if snapshot is None:
+                raise
+            logger.warning(f"Config sync failed, using snapshot from {snapshot['synced_at']}: {e}")
+            self.last_sync_mode = "stale"
+            return snapshot["rows"]
+
+    def _is_stale(self, snapshot: Dict[str, Any], now: datetime.datetime) -> bool:
+        full_refresh_at = datetime.datetime.fromisoformat(snapshot["full_refresh_at"])
+        return (now - full_refresh_at).total_seconds() > self.full_refresh_seconds
+
+    def _changed_user_ids(self, since: datetime.datetime) -> Optional[Set[str]]:
+        """User ids with configuration changes since `since`; None if a full refresh is needed."""
+        since_iso = since.isoformat()
+        station_changes = (
+            self.client.table("wind_stations")
+            .select("id")
+            .gt("updated_at", since_iso)
+            .limit(1)
+            .execute()
+        )
+        if station_changes.data:
+            return None
+
+        changed: Set[str] = set()
+        for table, user_column in USER_CHANGE_SOURCES.items():
+            result = (
+                self.client.table(table)
+                .select(user_column)
+                .gt("updated_at", since_iso)
+                .execute()
+            )
+            changed.update(row[user_column] for row in result.data)
+        return changed
+
+    def _fetch_all(self) -> List[Dict[str, Any]]:
+        result = (
+            self.client.table("user_configurations_with_stations")
+            .select(",".join(CONFIG_COLUMNS))
+            .execute()
+        )
+        return result.data
+
+    def _fetch_users(self, user_ids: List[str]) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        for start in range(0, len(user_ids), USER_ID_CHUNK_SIZE):
+            result = (
+                self.client.table("user_configurations_with_stations")
+                .select(",".join(CONFIG_COLUMNS))
+                .in_("user_id", user_ids[start:start + USER_ID_CHUNK_SIZE])
+                .execute()
+            )
+            rows.extend(result.data)
+        return rows
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+            if snapshot.get("columns") != CONFIG_COLUMNS:
+                return None
+            return snapshot
+        except (OSError, ValueError):
+            return None
+
+    def _write(
+        self, rows: List[Dict[str, Any]], synced_at: datetime.datetime, full_refresh_at: datetime.datetime
+    ) -> None:
+        snapshot = {
+            "columns": CONFIG_COLUMNS,
+            "synced_at": synced_at.isoformat(),
+            "full_refresh_at": full_refresh_at.isoformat(),
+            "rows": rows,
+        }
+        try:
+            write_json_atomic(self.path, snapshot)
+        except OSError as e:
+            logger.warning(f"Could not write config snapshot to {self.path}: {e}")
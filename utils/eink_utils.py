@@ -1,14 +1,25 @@
+import io
 import os
+from functools import lru_cache
 
 import matplotlib.pyplot as plt
 from PIL import Image, ImageDraw, ImageFont
 
-absolute_path = os.path.dirname(__file__)
+from utils.weather_utils import check_for_strong_gusts, check_rain, check_wind, format_message
+
+# fonts/ and images/ live at the repository root
+absolute_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@lru_cache(maxsize=8)
+def load_font(size):
+    """Load the mononoki font once per size; the screen worker reuses it every refresh."""
+    return ImageFont.truetype(os.path.join(absolute_path, './fonts/mononoki-Regular.ttf'), size)
 
 
 def draw_station_data(draw, station_data, left, top, right, bottom):
-    text = format_message(station_data, rows=10, html=False)
-    font18 = ImageFont.truetype(os.path.join(absolute_path, './fonts/mononoki-Regular.ttf'), 25)
+    text = format_message(station_data, rows=10, message_format='eink')
+    font18 = load_font(25)
     draw.text((left, top), text, font=font18)
 
 
@@ -44,7 +55,7 @@ def draw_statuses(draw, image, station_data, y_displacement):
     _, wind_dir_is_acceptable, wind_speed_is_acceptable = check_wind(station_data)
     is_raining = check_rain(station_data)
     strong_gusts = check_for_strong_gusts(station_data)
-    font18 = ImageFont.truetype(os.path.join(absolute_path, './fonts/mononoki-Regular.ttf'), 18)
+    font18 = load_font(18)
     draw.text((120, 600 + y_displacement), 'SPEED', font=font18)
     draw.text((110, 700 + y_displacement), 'DIRECTION', font=font18)
     draw.text((286, 600 + y_displacement), 'GUSTS', font=font18)
@@ -61,14 +72,8 @@ def draw_statuses(draw, image, station_data, y_displacement):
     draw.line((line2_x[0], line2_y) + (line2_x[1], line2_y), fill='black', width=5)  # l
 
 
-def update_image(epd, station_data):
-    # app_log.info('In update_image')
-    # app_log.info('starting init')
-    try:
-        epd.init()
-        # app_log.info(f'Init done')
-    except:
-        print('epd.init() failed')
+def draw_frame(epd, station_data):
+    """Draw the layout for `station_data` as a portrait 1-bit image sized for `epd`."""
     screen_w = epd.width
     screen_h = epd.height
     image = Image.new('1', (screen_h, screen_w), 255)
@@ -85,11 +90,31 @@ def update_image(epd, station_data):
     draw_station_data(draw, station_data, 110, table_y_position + 2 + y_displacement, screen_w - 10, 0 + 10)
     draw.line((100, table_y_position + 29 + y_displacement, 371, table_y_position + 29 + y_displacement), fill='black',
               width=3)  # horizontal
-    epd.display(epd.getbuffer(image))
+    return image
+
+
+def render_frame(epd, station_data):
+    """Draw the layout for `station_data` and pack it into the panel's buffer format."""
+    return epd.getbuffer(draw_frame(epd, station_data))
+
+
+def show_frame(epd, buffer):
+    """Wake the panel, push a packed buffer and put the panel back to sleep."""
+    # app_log.info('starting init')
+    try:
+        epd.init()
+        # app_log.info(f'Init done')
+    except:
+        print('epd.init() failed')
+    epd.display(buffer)
     # app_log.info(f'Update Image done. Setting epd to sleep')
     epd.sleep()
 
 
+def update_image(epd, station_data):
+    show_frame(epd, render_frame(epd, station_data))
+
+
 def initiate_screen(epd):
     # app_log.info('starting init')
     try:
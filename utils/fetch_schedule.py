@@ -0,0 +1,163 @@
+import datetime
+import json
+import logging
+import random
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.providers import NUMERIC_OBSERVATION_COLUMNS, FetchResult, StationRequest, fetch_stations
+from utils.serialization import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+# Learned cadences are clamped to this range
+MIN_CADENCE_SECONDS = 5 * 60
+MAX_CADENCE_SECONDS = 60 * 60
+# Cadence is learned from the most recent observation intervals
+CADENCE_SAMPLES = 12
+# Off-schedule reports (ASOS specials) only ever shorten intervals, so use an upper percentile
+CADENCE_PERCENTILE = 75
+# Come due at a random point up to this fraction of the cadence before the predicted observation,
+# so stations on the same cadence spread out but are never pushed past the run that should fetch them
+JITTER_FRACTION = 0.1
+# Always re-fetch a station at least this often, to pick up off-schedule (e.g. ASOS special) reports
+MAX_STALENESS_SECONDS = 30 * 60
+# Forget stations nobody has subscribed to for this long
+STATION_TTL_SECONDS = 2 * 24 * 3600
+
+
+def learn_cadence(date_times: pd.Series) -> Optional[float]:
+    """Regular seconds between observations, from the upper quartile of recent deltas, clamped."""
+    times = date_times.dropna().drop_duplicates().sort_values().tail(CADENCE_SAMPLES + 1)
+    deltas = times.diff().dt.total_seconds().to_numpy()[1:]
+    deltas = deltas[deltas > 0]
+    if len(deltas) == 0:
+        return None
+    cadence = np.percentile(deltas, CADENCE_PERCENTILE)
+    return float(np.clip(cadence, MIN_CADENCE_SECONDS, MAX_CADENCE_SECONDS))
+
+
+def _frame_to_json(df: pd.DataFrame) -> Dict[str, List[Any]]:
+    data = df.astype(object).where(df.notna(), None).to_dict(orient="list")
+    data["date_time"] = [t.isoformat() for t in df["date_time"]]
+    return data
+
+
+def _frame_from_json(data: Dict[str, List[Any]]) -> pd.DataFrame:
+    df = pd.DataFrame(data)
+    df["date_time"] = pd.to_datetime(df["date_time"])
+    # NaN is saved as null; a column that was all NaN would otherwise come back as object
+    for column in NUMERIC_OBSERVATION_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(float)
+    return df
+
+
+class FetchScheduler:
+    """Only fetches stations whose next observation is due; serves the rest from the last fetch.
+
+    Per station it remembers the learned cadence, the newest observation
+    time, when that observation was first seen and the last fetched frame.
+    A station is due once `first_seen + cadence - jitter` has passed, when
+    its last fetch is older than MAX_STALENESS_SECONDS, or when nothing is
+    known about it yet. Observation times are station-local without an
+    offset, so the prediction is anchored on when we first saw the newest
+    observation rather than its timestamp.
+    """
+
+    def __init__(self, path: Optional[str] = None, rng: Optional[random.Random] = None):
+        self.path = path
+        self.rng = rng or random.Random()
+        self.stations: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _key(station: StationRequest) -> str:
+        return f"{station.provider}:{station.station_id}"
+
+    def cadences(self) -> Dict[Tuple[str, str], float]:
+        """Learned minutes between observations per (provider, station_id)."""
+        cadences = {}
+        for key, entry in self.stations.items():
+            if entry.get("cadence_seconds"):
+                provider, station_id = key.split(":", 1)
+                cadences[(provider, station_id)] = entry["cadence_seconds"] / 60
+        return cadences
+
+    def is_due(self, station: StationRequest, now: datetime.datetime) -> bool:
+        entry = self.stations.get(self._key(station))
+        if entry is None or entry.get("frame") is None:
+            return True
+        last_fetched = datetime.datetime.fromisoformat(entry["last_fetched"])
+        if (now - last_fetched).total_seconds() >= MAX_STALENESS_SECONDS:
+            return True
+        return now >= datetime.datetime.fromisoformat(entry["next_due"])
+
+    def fetch(
+        self,
+        stations: Iterable[StationRequest],
+        now: Optional[datetime.datetime] = None,
+        fetch: Callable[[List[StationRequest]], Dict[Tuple[str, str], FetchResult]] = fetch_stations,
+    ) -> Dict[Tuple[str, str], FetchResult]:
+        """Fetch due stations with `fetch` and return results for every station (cached for the rest)."""
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        stations = list(stations)
+        due = [station for station in stations if self.is_due(station, now)]
+        results = fetch(due) if due else {}
+
+        for station in due:
+            data = results.get((station.provider, station.station_id))
+            if isinstance(data, pd.DataFrame) and len(data):
+                self._record(station, data, now)
+
+        for station in stations:
+            key = (station.provider, station.station_id)
+            if key not in results:
+                results[key] = _frame_from_json(self.stations[self._key(station)]["frame"])
+        logger.info(f"Fetched {len(due)} of {len(stations)} stations; {len(stations) - len(due)} not due yet")
+        return results
+
+    def _record(self, station: StationRequest, data: pd.DataFrame, now: datetime.datetime) -> None:
+        entry = self.stations.setdefault(self._key(station), {})
+        latest = data["date_time"].max().isoformat()
+        if entry.get("latest_observation") != latest:
+            entry["latest_observation"] = latest
+            entry["first_seen"] = now.isoformat()
+        entry["cadence_seconds"] = learn_cadence(data["date_time"]) or entry.get(
+            "cadence_seconds", MIN_CADENCE_SECONDS
+        )
+        cadence = entry["cadence_seconds"]
+        jitter = self.rng.uniform(0, JITTER_FRACTION * cadence)
+        first_seen = datetime.datetime.fromisoformat(entry["first_seen"])
+        next_due = first_seen + datetime.timedelta(seconds=cadence - jitter)
+        if next_due <= now:
+            # The expected observation is late; check again on the next run
+            next_due = now
+        entry["next_due"] = next_due.isoformat()
+        entry["last_fetched"] = now.isoformat()
+        entry["frame"] = _frame_to_json(data)
+
+    def load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                self.stations = json.load(f)
+        except (OSError, ValueError):
+            self.stations = {}
+
+    def save(self, now: Optional[datetime.datetime] = None) -> None:
+        if not self.path:
+            return
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        self.stations = {
+            key: entry
+            for key, entry in self.stations.items()
+            if (now - datetime.datetime.fromisoformat(entry["last_fetched"])).total_seconds()
+            < STATION_TTL_SECONDS
+        }
+        try:
+            write_json_atomic(self.path, self.stations)
+        except OSError as e:
+            logger.warning(f"Could not write fetch schedule to {self.path}: {e}")
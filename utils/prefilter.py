@@ -0,0 +1,92 @@
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from utils.records import StationSubscription
+
+# Set to 1 to let the database pick the subscriptions worth evaluating (candidate_subscriptions RPC)
+PREFILTER_ENV = "SOARBOT_SQL_PREFILTER"
+PREFILTER_FUNCTION = "candidate_subscriptions"
+
+
+def prefilter_enabled(value: Optional[Any] = None) -> bool:
+    """Whether to prefilter, from an explicit value or SOARBOT_SQL_PREFILTER."""
+    if value is None:
+        value = os.getenv(PREFILTER_ENV, "")
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+def summary_readings(subscriptions: Iterable[StationSubscription]) -> Dict[Tuple[str, str], int]:
+    """Readings to summarize per station: enough to cover every subscriber's window and release.
+
+    Conditions that are on have passed every check on at least one of the last
+    `release_readings` readings, and conditions that switch on have passed on
+    all of the last `window_readings`, so a range over this many readings never
+    rules out a subscription that could be met.
+    """
+    readings: Dict[Tuple[str, str], int] = {}
+    for subscription in subscriptions:
+        key = (subscription.api_provider, subscription.station_id)
+        needed = max(subscription.window_readings, subscription.release_readings)
+        readings[key] = max(readings.get(key, 0), needed)
+    return readings
+
+
+def _value(value) -> Optional[float]:
+    return None if value is None or math.isnan(value) else round(float(value), 2)
+
+
+def station_summaries(
+    fetched: Dict[Tuple[str, str], Any], readings: Dict[Tuple[str, str], int]
+) -> List[Dict[str, Any]]:
+    """Observation ranges over each station's recent readings, the input of candidate_subscriptions.
+
+    Missing speeds and directions are skipped, and a check with none at all is
+    sent as null, which no threshold matches. Missing gusts and precipitation
+    count as no gust excess and no rain, as in the rolling window.
+    """
+    summaries = []
+    for station_key, count in readings.items():
+        station_data = fetched.get(station_key)
+        if not isinstance(station_data, pd.DataFrame) or len(station_data) == 0:
+            continue
+        recent = station_data.tail(count)
+        speed = recent["wind_speed_set_1"]
+        direction = recent["wind_direction_set_1"]
+        summaries.append(
+            {
+                "station_id": station_key[1],
+                "min_speed": _value(speed.min()),
+                "max_speed": _value(speed.max()),
+                "min_direction": _value(direction.min()),
+                "max_direction": _value(direction.max()),
+                "min_gust_differential": _value((recent["wind_gust_set_1"].fillna(speed) - speed).min()),
+                "min_precipitation": _value(recent["precip_accum_five_minute_set_1"].fillna(0).min()),
+            }
+        )
+    return summaries
+
+
+def could_match(summary: Dict[str, Any], subscription: StationSubscription) -> bool:
+    """The threshold half of candidate_subscriptions, for use outside the database."""
+    values = [summary[name] for name in summary if name != "station_id"]
+    if any(value is None for value in values):
+        return False
+    return (
+        summary["max_speed"] >= subscription.wind_speed_min
+        and summary["min_speed"] <= subscription.wind_speed_max
+        and summary["max_direction"] >= subscription.wind_direction_min
+        and summary["min_direction"] <= subscription.wind_direction_max
+        and summary["min_gust_differential"] <= subscription.max_gust_differential
+        and summary["min_precipitation"] <= 0
+    )
+
+
+def fetch_candidates(client, summaries: List[Dict[str, Any]]) -> Set[Tuple[str, str]]:
+    """(user_id, station_id) of subscriptions that could be met and are out of cooldown."""
+    if not summaries:
+        return set()
+    result = client.rpc(PREFILTER_FUNCTION, {"summaries": summaries}).execute()
+    return {(str(row["user_id"]), row["station_id"]) for row in result.data or []}
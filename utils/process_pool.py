@@ -0,0 +1,74 @@
+import multiprocessing as mp
+import os
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Set to a worker count (or "auto" for one per CPU) to evaluate subscriptions in a process pool
+WORKERS_ENV = "SOARBOT_EVAL_WORKERS"
+
+StationSnapshot = Dict[str, np.ndarray]
+
+# Per-worker state, set once by the pool initializer
+_WORKER: Dict[str, Any] = {}
+
+
+def eval_workers(value: Optional[Any] = None) -> int:
+    """Worker count from an explicit value or SOARBOT_EVAL_WORKERS; 1 means evaluate in-process."""
+    if value is None:
+        value = os.getenv(WORKERS_ENV, "1")
+    if str(value).lower() == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+def snapshot_frame(df: pd.DataFrame) -> StationSnapshot:
+    """Column arrays of an observations frame: cheap to pickle, no pandas index or block metadata."""
+    return {column: df[column].to_numpy() for column in df.columns}
+
+
+def frame_from_snapshot(snapshot: StationSnapshot) -> pd.DataFrame:
+    return pd.DataFrame(snapshot)
+
+
+def _init_worker(evaluate: Callable, snapshots: Dict[Hashable, StationSnapshot]) -> None:
+    _WORKER["evaluate"] = evaluate
+    _WORKER["snapshots"] = snapshots
+    _WORKER["frames"] = {}
+
+
+def _run(task: Tuple[Hashable, tuple]) -> Any:
+    station_key, args = task
+    frames = _WORKER["frames"]
+    frame = frames.get(station_key)
+    if frame is None:
+        # Each worker rebuilds a station's frame once, however many subscribers it evaluates
+        frame = frames[station_key] = frame_from_snapshot(_WORKER["snapshots"][station_key])
+    return _WORKER["evaluate"](frame, *args)
+
+
+def _context():
+    # fork hands the snapshots to workers without pickling them; fall back where it doesn't exist
+    if "fork" in mp.get_all_start_methods():
+        return mp.get_context("fork")
+    return mp.get_context()
+
+
+def map_over_stations(
+    evaluate: Callable[..., Any],
+    snapshots: Dict[Hashable, StationSnapshot],
+    tasks: Sequence[Tuple[Hashable, tuple]],
+    workers: int,
+) -> List[Any]:
+    """Run `evaluate(station_frame, *args)` for each (station_key, args) task in a process pool.
+
+    Station snapshots go to each worker once through the pool initializer;
+    tasks only carry the station key and the per-subscription arguments.
+    Results come back in task order.
+    """
+    if not tasks:
+        return []
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with _context().Pool(workers, initializer=_init_worker, initargs=(evaluate, snapshots)) as pool:
+        return pool.map(_run, tasks, chunksize=chunksize)
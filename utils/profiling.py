@@ -0,0 +1,92 @@
+import cProfile
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Set to "cprofile" or "pyinstrument" to dump a profile of each run into PROFILE_DIR
+PROFILE_ENV = "SOARBOT_PROFILE"
+PROFILE_DIR_ENV = "SOARBOT_PROFILE_DIR"
+
+
+class StageTimer:
+    """Collects wall-clock durations per named stage of a run.
+
+    Wrap work in `with timer.span("fetch"):`; spans may repeat (e.g. once per
+    user x station) and `summary()` aggregates them for run_metrics.
+    """
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations.setdefault(stage, []).append(time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """{stage: {count, total_ms, p50_ms, p95_ms}} in the order stages first ran."""
+        summary = {}
+        for stage, durations in self.durations.items():
+            ms = np.asarray(durations) * 1000
+            summary[stage] = {
+                "count": len(durations),
+                "total_ms": round(float(ms.sum()), 2),
+                "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            }
+        return summary
+
+
+@contextmanager
+def maybe_profile(name: str, mode: Optional[str] = None, directory: Optional[str] = None) -> Iterator[None]:
+    """Profile the enclosed block when SOARBOT_PROFILE is set, writing the result to a file.
+
+    "cprofile" writes `<name>-<timestamp>.prof` (open with snakeviz or pstats);
+    "pyinstrument" writes an HTML report if pyinstrument is installed.
+    """
+    mode = (mode if mode is not None else os.getenv(PROFILE_ENV, "")).lower()
+    if not mode:
+        yield
+        return
+
+    directory = directory or os.getenv(PROFILE_DIR_ENV, "profiles")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument is not installed; falling back to cProfile")
+            mode = "cprofile"
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                with open(f"{path}.html", "w") as f:
+                    f.write(profiler.output_html())
+                logger.info(f"Wrote profile to {path}.html")
+            return
+
+    if mode != "cprofile":
+        logger.warning(f"Unknown {PROFILE_ENV} value {mode!r}; using cProfile")
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(f"{path}.prof")
+        logger.info(f"Wrote profile to {path}.prof")
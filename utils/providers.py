@@ -0,0 +1,305 @@
+import datetime
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from utils.weather_utils import REQUEST_TIMEOUT_SECONDS, SESSION, config, parse_synoptic_response
+
+logger = logging.getLogger(__name__)
+
+# Common observation schema every adapter normalizes to (Synoptic column names, mph, local wall-clock time)
+OBSERVATION_COLUMNS = [
+    "date_time",
+    "air_temp_set_1",
+    "wind_speed_set_1",
+    "wind_gust_set_1",
+    "wind_direction_set_1",
+    "precip_accum_five_minute_set_1",
+    "wind_cardinal_direction_set_1d",
+]
+
+NUMERIC_OBSERVATION_COLUMNS = [
+    column for column in OBSERVATION_COLUMNS if column not in ("date_time", "wind_cardinal_direction_set_1d")
+]
+
+DEFAULT_LOOKBACK_MINUTES = 120
+FETCH_WORKERS = 4
+
+CARDINAL_DIRECTIONS = np.array(
+    ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE", "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"]
+)
+
+
+class StationRequest(NamedTuple):
+    """One station to fetch, deduplicated across all subscribers."""
+
+    provider: str
+    station_id: str
+    lookback_minutes: int
+    api_config: dict
+
+
+def cardinal_direction(degrees) -> np.ndarray:
+    """16-point compass labels for wind directions in degrees (NaN -> None)."""
+    degrees = np.asarray(degrees, dtype=float)
+    labels = CARDINAL_DIRECTIONS[np.round(np.nan_to_num(degrees) / 22.5).astype(int) % 16].astype(object)
+    labels[np.isnan(degrees)] = None
+    return labels
+
+
+def normalize_observations(df: pd.DataFrame) -> pd.DataFrame:
+    """Order columns per OBSERVATION_COLUMNS, adding missing ones as NaN, sorted by time.
+
+    Numeric columns are always float, even when every value was null.
+    """
+    for column in OBSERVATION_COLUMNS:
+        if column not in df.columns:
+            df[column] = np.nan
+    df = df[OBSERVATION_COLUMNS].copy()
+    for column in NUMERIC_OBSERVATION_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors="coerce").astype(float)
+    return df.sort_values("date_time", ignore_index=True)
+
+
+class RateLimiter:
+    """Spaces calls evenly so at most `requests_per_minute` start in any minute (thread-safe)."""
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / requests_per_minute
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class StationProvider:
+    """Adapter for one weather API.
+
+    Subclasses set `name`, `max_batch_size` (stations per request),
+    `requests_per_minute` and `cadence_minutes` (how often the provider
+    publishes new observations), and implement `fetch_batch`, returning
+    normalized observations per station id.
+    """
+
+    name = ""
+    max_batch_size = 1
+    requests_per_minute = 60
+    cadence_minutes = 5
+
+    def __init__(self, base_url: Optional[str] = None):
+        if base_url:
+            self.base_url = base_url
+        self.limiter = RateLimiter(self.requests_per_minute)
+
+    def fetch_batch(self, stations: List[StationRequest]) -> Dict[str, pd.DataFrame]:
+        raise NotImplementedError
+
+
+class SynopticProvider(StationProvider):
+    """Synoptic Data timeseries API; many stations per request via a comma-separated `stid`."""
+
+    name = "synoptic"
+    max_batch_size = 20
+    requests_per_minute = 120
+    cadence_minutes = 5
+    base_url = os.getenv("SYNOPTIC_API_URL", "https://api.synopticdata.com/v2")
+
+    def fetch_batch(self, stations: List[StationRequest]) -> Dict[str, pd.DataFrame]:
+        return self._timeseries(
+            [station.station_id for station in stations],
+            {"recent": max(station.lookback_minutes for station in stations)},
+            getattr(config, "token", None) or stations[0].api_config.get("token"),
+        )
+
+    def fetch_range(
+        self, station_ids: List[str], start: datetime.datetime, end: datetime.datetime, token: Optional[str] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """Observations between `start` and `end` (UTC) per station, normalized like fetch_batch.
+
+        `token` takes precedence over the configured token.
+        """
+        return self._timeseries(
+            station_ids,
+            {"start": start.strftime("%Y%m%d%H%M"), "end": end.strftime("%Y%m%d%H%M")},
+            token or getattr(config, "token", None),
+        )
+
+    def _timeseries(self, station_ids: List[str], window: dict, token: Optional[str]) -> Dict[str, pd.DataFrame]:
+        if not token:
+            raise ValueError("No API token available")
+        response = SESSION.get(
+            f"{self.base_url}/stations/timeseries",
+            params={
+                "token": token,
+                **window,
+                "stid": ",".join(station_ids),
+                "units": "english",
+                "obtimezone": "LOCAL",
+            },
+            timeout=REQUEST_TIMEOUT_SECONDS,
+        )
+        response.raise_for_status()
+        wdata = response.json()
+
+        results = {}
+        for index, station in enumerate(wdata.get("STATION") or []):
+            if station.get("OBSERVATIONS"):
+                results[station["STID"]] = normalize_observations(parse_synoptic_response(wdata, index))
+        return results
+
+
+class WeatherUndergroundProvider(StationProvider):
+    """Weather Underground (weather.com PWS) API; one station per request, 5-minute observations."""
+
+    name = "weather_underground"
+    max_batch_size = 1
+    requests_per_minute = 30
+    cadence_minutes = 5
+    base_url = os.getenv("WEATHER_UNDERGROUND_API_URL", "https://api.weather.com/v2/pws")
+
+    def fetch_batch(self, stations: List[StationRequest]) -> Dict[str, pd.DataFrame]:
+        (station,) = stations
+        api_key = station.api_config.get("api_key") or os.getenv("WEATHER_UNDERGROUND_API_KEY")
+        if not api_key:
+            raise ValueError("No Weather Underground API key available")
+        response = SESSION.get(
+            f"{self.base_url}/observations/all/1day",
+            params={"stationId": station.station_id, "format": "json", "units": "e", "apiKey": api_key},
+            timeout=REQUEST_TIMEOUT_SECONDS,
+        )
+        response.raise_for_status()
+        observations = (response.json() or {}).get("observations") or []
+        if not observations:
+            return {}
+
+        imperial = pd.DataFrame([obs.get("imperial") or {} for obs in observations])
+        df = pd.DataFrame(
+            {
+                "date_time": pd.to_datetime([obs["obsTimeLocal"] for obs in observations]),
+                "air_temp_set_1": imperial.get("tempAvg"),
+                "wind_speed_set_1": imperial.get("windspeedAvg"),
+                "wind_gust_set_1": imperial.get("windgustHigh"),
+                "wind_direction_set_1": [obs.get("winddirAvg") for obs in observations],
+                # precipRate is in/hr; approximate the 5-minute accumulation Synoptic reports
+                "precip_accum_five_minute_set_1": imperial.get("precipRate") * 5 / 60
+                if "precipRate" in imperial
+                else np.nan,
+            }
+        )
+        df["wind_cardinal_direction_set_1d"] = cardinal_direction(df["wind_direction_set_1"])
+        cutoff = df["date_time"].max() - pd.Timedelta(minutes=station.lookback_minutes)
+        return {station.station_id: normalize_observations(df[df["date_time"] >= cutoff])}
+
+
+PROVIDERS: Dict[str, StationProvider] = {}
+
+
+def register_provider(provider: StationProvider) -> StationProvider:
+    """Make `provider` available for stations whose api_provider equals provider.name."""
+    PROVIDERS[provider.name] = provider
+    return provider
+
+
+def get_provider(name: str) -> StationProvider:
+    provider = PROVIDERS.get(name)
+    if provider is None:
+        raise ValueError(f"API provider {name} not supported")
+    return provider
+
+
+register_provider(SynopticProvider())
+register_provider(WeatherUndergroundProvider())
+
+
+FetchResult = Union[pd.DataFrame, Exception]
+
+
+def _fetch(provider: StationProvider, batch: List[StationRequest]) -> Dict[str, FetchResult]:
+    provider.limiter.wait()
+    try:
+        data = provider.fetch_batch(batch)
+    except Exception as e:
+        logger.error(f"{provider.name} fetch failed for {[s.station_id for s in batch]}: {e}")
+        return {station.station_id: e for station in batch}
+    return {station.station_id: data.get(station.station_id, pd.DataFrame()) for station in batch}
+
+
+def fetch_stations(
+    stations: Iterable[StationRequest], max_workers: int = FETCH_WORKERS
+) -> Dict[Tuple[str, str], FetchResult]:
+    """Fetch every station concurrently, batched per provider and paced by its rate limit.
+
+    Returns observations per (provider, station_id); a station whose request
+    failed maps to the exception instead, and one with no observations to an
+    empty DataFrame.
+    """
+    batches: List[Tuple[StationProvider, List[StationRequest]]] = []
+    results: Dict[Tuple[str, str], FetchResult] = {}
+    by_provider: Dict[str, List[StationRequest]] = {}
+    for station in stations:
+        by_provider.setdefault(station.provider, []).append(station)
+
+    for name, pending in by_provider.items():
+        try:
+            provider = get_provider(name)
+        except ValueError as e:
+            logger.warning(str(e))
+            results.update({(name, station.station_id): e for station in pending})
+            continue
+        for start in range(0, len(pending), provider.max_batch_size):
+            batches.append((provider, pending[start:start + provider.max_batch_size]))
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+            for (provider, _), batch_results in zip(
+                batches, pool.map(lambda job: _fetch(*job), batches)
+            ):
+                results.update({(provider.name, sid): data for sid, data in batch_results.items()})
+    return results
+
+
+def subscription_lookback(subscription, cadence_minutes: Optional[float] = None) -> int:
+    """Minutes of observations a subscription needs to evaluate its condition window.
+
+    The configured `lookback_minutes`, extended to cover at least one cadence
+    more than the window so hourly stations return enough readings to fill
+    it. Without a learned `cadence_minutes` the provider's cadence is used.
+    """
+    if not cadence_minutes:
+        provider = PROVIDERS.get(subscription.api_provider)
+        cadence_minutes = provider.cadence_minutes if provider else StationProvider.cadence_minutes
+    return max(
+        int(subscription.api_config.get("lookback_minutes", DEFAULT_LOOKBACK_MINUTES)),
+        int(np.ceil((subscription.window_readings + 1) * cadence_minutes)),
+    )
+
+
+def station_requests(
+    subscriptions, cadences: Optional[Dict[Tuple[str, str], float]] = None
+) -> List[StationRequest]:
+    """Unique stations across subscriptions, each with the longest lookback any subscriber needs.
+
+    `cadences` gives learned minutes between observations per (provider,
+    station_id); see `subscription_lookback`.
+    """
+    cadences = cadences or {}
+    stations: Dict[Tuple[str, str], StationRequest] = {}
+    for subscription in subscriptions:
+        key = (subscription.api_provider, subscription.station_id)
+        lookback = subscription_lookback(subscription, cadences.get(key))
+        existing = stations.get(key)
+        if existing is None or lookback > existing.lookback_minutes:
+            stations[key] = StationRequest(key[0], key[1], lookback, subscription.api_config)
+    return list(stations.values())
@@ -0,0 +1,169 @@
+import sys
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from utils.time_context import parse_minute_of_day
+
+
+class StationSubscription(NamedTuple):
+    """One user's settings for one station, with thresholds already converted to floats."""
+
+    station_id: str
+    station_name: str
+    station_description: Optional[str]
+    api_provider: str
+    api_config: Dict[str, Any]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    wind_speed_min: float
+    wind_speed_max: float
+    wind_direction_min: float
+    wind_direction_max: float
+    max_gust_differential: float
+    priority: int
+    custom_name: Optional[str]
+    enabled: bool
+    min_visibility_miles: Optional[float]
+    max_precipitation_rate: Optional[float]
+    # Readings that must all pass to switch conditions on / failing readings to switch them off
+    window_readings: int
+    release_readings: int
+
+    @property
+    def display_name(self) -> str:
+        return self.custom_name or self.station_name
+
+
+class UserConfig(NamedTuple):
+    """A user, their global preferences and their station subscriptions in priority order."""
+
+    user_id: str
+    telegram_chat_id: str
+    username: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    notification_cooldown_hours: float
+    timezone: str
+    include_weather_chart: bool
+    message_rows: int
+    enable_winter_midday: bool
+    # Quiet hours as minutes after midnight in `timezone`, parsed once at load time
+    quiet_start_minute: Optional[int]
+    quiet_end_minute: Optional[int]
+    stations: Tuple[StationSubscription, ...]
+
+
+class StationDetail:
+    """Per user x station outcome of a run, serialized into run_metrics.station_details."""
+
+    __slots__ = (
+        "user_id",
+        "station_id",
+        "station_name",
+        "enabled",
+        "priority",
+        "has_data",
+        "api_error",
+        "conditions_result",
+        "cooldown_active",
+        "cooldown_remaining_hours",
+        "notification_sent",
+        "notification_error",
+        "latest_weather_data",
+    )
+
+    def __init__(self, user_id: str, subscription: StationSubscription):
+        self.user_id = user_id
+        self.station_id = subscription.station_id
+        self.station_name = subscription.station_name
+        self.enabled = subscription.enabled
+        self.priority = subscription.priority
+        self.has_data = False
+        self.api_error: Optional[str] = None
+        self.conditions_result: Optional[Dict[str, Any]] = None
+        self.cooldown_active = False
+        self.cooldown_remaining_hours: Optional[float] = None
+        self.notification_sent = False
+        self.notification_error: Optional[str] = None
+        self.latest_weather_data: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _float(value, default: Optional[float] = None) -> Optional[float]:
+    return default if value is None else float(value)
+
+
+def build_user_configs(rows: Iterable[Dict[str, Any]]) -> List[UserConfig]:
+    """Group `user_configurations_with_stations` rows into UserConfig records.
+
+    Strings repeated across rows (station codes, names, providers, timezones) are
+    interned and each station's api_config dict is shared between subscribers.
+    """
+    users: Dict[str, Tuple[Dict[str, Any], List[StationSubscription]]] = {}
+    # Per-station fields are identical for every subscriber; build them once per station
+    station_fields: Dict[str, Tuple[Any, ...]] = {}
+    make_subscription = StationSubscription._make
+
+    for row in rows:
+        user_id = row["user_id"]
+        user_entry = users.get(user_id)
+        if user_entry is None:
+            user_entry = users[user_id] = (row, [])
+
+        station_id = row["station_id"]
+        fields = station_fields.get(station_id)
+        if fields is None:
+            station_id = sys.intern(station_id)
+            fields = station_fields[station_id] = (
+                station_id,
+                sys.intern(row["station_name"] or station_id),
+                row.get("station_description"),
+                sys.intern(row.get("api_provider") or "synoptic"),
+                row.get("api_config") or {},
+                _float(row.get("latitude")),
+                _float(row.get("longitude")),
+            )
+
+        user_entry[1].append(
+            make_subscription(
+                fields
+                + (
+                    _float(row["wind_speed_min"], 8.5),
+                    _float(row["wind_speed_max"], 16.0),
+                    _float(row["wind_direction_min"], 130.0),
+                    _float(row["wind_direction_max"], 180.0),
+                    _float(row["max_gust_differential"], 5.0),
+                    int(row["priority"] if row["priority"] is not None else 1),
+                    row.get("custom_name"),
+                    bool(row["station_enabled"]),
+                    _float(row.get("min_visibility_miles")),
+                    _float(row.get("max_precipitation_rate")),
+                    int(row.get("window_readings") or 3),
+                    int(row.get("release_readings") or 1),
+                )
+            )
+        )
+
+    configs = []
+    for user_id, (row, stations) in users.items():
+        # Sort stations by priority for each user
+        stations.sort(key=lambda station: station.priority)
+        configs.append(
+            UserConfig(
+                user_id=user_id,
+                telegram_chat_id=row["telegram_chat_id"],
+                username=row.get("username"),
+                first_name=row.get("first_name"),
+                last_name=row.get("last_name"),
+                notification_cooldown_hours=_float(row.get("notification_cooldown_hours"), 4.0),
+                timezone=sys.intern(row.get("timezone") or "America/Denver"),
+                include_weather_chart=bool(row.get("include_weather_chart")),
+                message_rows=int(row.get("message_rows") or 6),
+                enable_winter_midday=bool(row.get("enable_winter_midday", True)),
+                quiet_start_minute=parse_minute_of_day(row.get("quiet_hours_start")),
+                quiet_end_minute=parse_minute_of_day(row.get("quiet_hours_end")),
+                stations=tuple(stations),
+            )
+        )
+    return configs
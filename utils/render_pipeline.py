@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from queue import Empty
+
+logger = logging.getLogger(__name__)
+
+# A frame the panel failed to show is retried after this long, unless a newer one arrives first
+PANEL_RETRY_SECONDS = 5
+
+
+class LatestSlot:
+    """Single-slot, latest-wins queue.
+
+    `put` replaces any item that hasn't been consumed yet, so a slow consumer
+    always picks up the newest item and stale ones are dropped.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._item = None
+        self._has_item = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._condition:
+            if self._has_item:
+                self.dropped += 1
+            self._item = item
+            self._has_item = True
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._has_item, timeout):
+                raise Empty
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+    def put_back(self, item):
+        """Return an item that couldn't be handled, unless a newer one has arrived meanwhile."""
+        with self._condition:
+            if not self._has_item:
+                self._item = item
+                self._has_item = True
+                self._condition.notify()
+
+
+class ScreenPipeline:
+    """Fetch -> render -> panel pipeline, one thread per stage.
+
+    - `fetch()` returns station data (a DataFrame with `date_time`) or an empty frame.
+    - `render(station_data)` returns a frame ready for the panel (e.g. a packed buffer).
+    - `show(frame)` pushes the frame to the panel and blocks until the refresh is done.
+
+    Stages are connected by `LatestSlot`s, so the next fetch overlaps the current
+    panel refresh and frames that were superseded before reaching the panel are dropped.
+    `heartbeat.value` is stamped by the fetch loop and `panel_busy_since.value` is set
+    while the panel is refreshing (0 when idle), for an external watchdog to inspect.
+    `on_shown(image_update)` is only called once `show` returns; a frame whose
+    `show` raised is retried after `retry_delay` seconds unless a newer one replaced it.
+    """
+
+    def __init__(self, fetch, render, show, interval, last_image_update,
+                 heartbeat=None, panel_busy_since=None, on_shown=None,
+                 retry_delay=PANEL_RETRY_SECONDS):
+        self.fetch = fetch
+        self.render = render
+        self.show = show
+        self.interval = interval
+        self.last_fetched = last_image_update
+        self.heartbeat = heartbeat
+        self.panel_busy_since = panel_busy_since
+        self.on_shown = on_shown
+        self.retry_delay = retry_delay
+        self.data_slot = LatestSlot()
+        self.frame_slot = LatestSlot()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for name, target in (('fetch', self._fetch_loop), ('render', self._render_loop),
+                             ('panel', self._panel_loop)):
+            thread = threading.Thread(target=target, name=f'screen-{name}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _beat(self):
+        if self.heartbeat is not None:
+            self.heartbeat.value = time.time()
+
+    def _fetch_loop(self):
+        while not self._stop.is_set():
+            self._beat()
+            try:
+                station_data = self.fetch()
+                if len(station_data) == 0:
+                    logger.error('station data empty... retrying next cycle')
+                elif station_data['date_time'].iloc[-1] > self.last_fetched:
+                    self.last_fetched = station_data['date_time'].iloc[-1]
+                    self.data_slot.put(station_data)
+            except Exception as fetch_exception:
+                logger.error(f'Exception {fetch_exception} occurred in fetch stage.')
+            self._beat()
+            self._stop.wait(self.interval)
+
+    def _render_loop(self):
+        while not self._stop.is_set():
+            try:
+                station_data = self.data_slot.get(timeout=1)
+            except Empty:
+                continue
+            try:
+                frame = self.render(station_data)
+                self.frame_slot.put((station_data['date_time'].iloc[-1], frame))
+            except Exception as render_exception:
+                logger.error(f'Exception {render_exception} occurred in render stage.')
+
+    def _panel_loop(self):
+        while not self._stop.is_set():
+            try:
+                image_update, frame = self.frame_slot.get(timeout=1)
+            except Empty:
+                continue
+            if self.panel_busy_since is not None:
+                self.panel_busy_since.value = time.time()
+            try:
+                self.show(frame)
+            except Exception as panel_exception:
+                logger.error(f'Exception {panel_exception} occurred in panel stage.')
+                self._stop.wait(self.retry_delay)
+                self.frame_slot.put_back((image_update, frame))
+                continue
+            finally:
+                if self.panel_busy_since is not None:
+                    self.panel_busy_since.value = 0
+            if self.on_shown is not None:
+                self.on_shown(image_update)
@@ -1,4 +1,7 @@
-from typing import Any
+import json
+import os
+from contextlib import contextmanager
+from typing import Any, Iterator
 
 
 def make_serializable(obj: Any) -> Any:
@@ -62,3 +65,24 @@ def make_serializable(obj: Any) -> Any:
     return obj
 
 
+@contextmanager
+def atomic_write(path: str) -> Iterator[str]:
+    """Yield a temporary path to write; on success it replaces `path` in one step.
+
+    Readers (and a crash mid-write) only ever see the old or the new file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_json_atomic(path: str, data: Any, **dump_kwargs: Any) -> None:
+    """json.dump `data` to `path` via atomic_write."""
+    with atomic_write(path) as tmp_path:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, **dump_kwargs)
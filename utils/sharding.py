@@ -0,0 +1,120 @@
+import glob
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+# Counters in run_metrics that are summed across shards
+SUMMED_METRICS = [
+    "users_found",
+    "users_checked",
+    "stations_total",
+    "stations_checked",
+    "stations_with_data",
+    "stations_disabled",
+    "conditions_met_count",
+    "cooldown_blocks",
+    "notifications_sent",
+    "notification_failures",
+    "api_errors",
+    "database_errors",
+]
+
+
+def parse_shard_spec(event: Optional[Dict[str, Any]]) -> Tuple[int, int]:
+    """(shard, shards) from a lambda event such as {"shard": 2, "shards": 4}; unsharded is (0, 1)."""
+    event = event or {}
+    shards = int(event.get("shards", 1))
+    shard = int(event.get("shard", 0))
+    if shards < 1 or not 0 <= shard < shards:
+        raise ValueError(f"Invalid shard spec {shard}/{shards}")
+    return shard, shards
+
+
+def shard_of(user_id: str, shards: int) -> int:
+    """Stable shard for a user: the same on every run, process and Python version (unlike hash())."""
+    digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def shard_path(path: str, shard: int, shards: int) -> str:
+    """Per-shard variant of a cache file path, so parallel shards never overwrite each other."""
+    if shards == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{shard}-of-{shards}{ext}"
+
+
+def _check_run_id(run_id: Optional[str]) -> str:
+    if not run_id or not all(c.isalnum() or c in "-_." for c in str(run_id)):
+        raise ValueError(f"Sharded runs need a run id of letters, digits, '-', '_' or '.', got {run_id!r}")
+    return str(run_id)
+
+
+def write_shard_metrics(
+    run_metrics: Dict[str, Any], directory: str, run_id: str, shard: int, shards: int
+) -> str:
+    """Write one shard's run_metrics for the merge step, keyed by run so stale shards are never merged."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"run_metrics.{_check_run_id(run_id)}.shard-{shard}-of-{shards}.json")
+    with open(path, "w") as f:
+        json.dump(run_metrics, f)
+    return path
+
+
+def shard_metrics_paths(directory: str, run_id: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, f"run_metrics.{_check_run_id(run_id)}.shard-*.json")))
+
+
+def read_shard_metrics(directory: str, run_id: str) -> List[Dict[str, Any]]:
+    shard_metrics = []
+    for path in shard_metrics_paths(directory, run_id):
+        with open(path) as f:
+            shard_metrics.append(json.load(f))
+    return shard_metrics
+
+
+def _merge_stage_timings(shard_metrics: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Counts and totals add up; p50 is the count-weighted mean of shard p50s and p95 the worst shard's."""
+    merged: Dict[str, Dict[str, float]] = {}
+    for metrics in shard_metrics:
+        for stage, timing in (metrics.get("stage_timings") or {}).items():
+            entry = merged.setdefault(stage, {"count": 0, "total_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0})
+            entry["p50_ms"] += timing["p50_ms"] * timing["count"]
+            entry["count"] += timing["count"]
+            entry["total_ms"] += timing["total_ms"]
+            entry["p95_ms"] = max(entry["p95_ms"], timing["p95_ms"])
+    for entry in merged.values():
+        entry["total_ms"] = round(entry["total_ms"], 2)
+        entry["p50_ms"] = round(entry["p50_ms"] / entry["count"], 2) if entry["count"] else 0.0
+    return merged
+
+
+def merge_run_metrics(shard_metrics: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine the run_metrics of every shard of one run into a single run record."""
+    if not shard_metrics:
+        raise ValueError("No shard metrics to merge")
+    shards = {metrics.get("shards", 1) for metrics in shard_metrics}
+    if len(shards) != 1:
+        raise ValueError(f"Shard metrics come from different shard counts: {sorted(shards)}")
+    expected = shards.pop()
+    seen = sorted(metrics.get("shard", 0) for metrics in shard_metrics)
+    missing = sorted(set(range(expected)) - set(seen))
+
+    merged: Dict[str, Any] = {key: sum(m.get(key, 0) for m in shard_metrics) for key in SUMMED_METRICS}
+    merged["start_time"] = min(m["start_time"] for m in shard_metrics)
+    merged["end_time"] = max((m["end_time"] for m in shard_metrics if m.get("end_time")), default=None)
+    # Shards run in parallel, so the run took as long as the slowest shard
+    merged["runtime_seconds"] = max(m.get("runtime_seconds", 0) for m in shard_metrics)
+    merged["winter_mode"] = any(m.get("winter_mode") for m in shard_metrics)
+    merged["station_details"] = [d for m in shard_metrics for d in m.get("station_details") or []]
+    merged["stage_timings"] = _merge_stage_timings(shard_metrics)
+
+    errors = [
+        f"shard {m.get('shard', 0)}: {m['error_message']}" for m in shard_metrics if m.get("error_message")
+    ]
+    if missing:
+        errors.append(f"missing shards: {missing}")
+    merged["success"] = all(m.get("success") for m in shard_metrics) and not missing
+    merged["error_message"] = "; ".join(errors) or None
+    return merged
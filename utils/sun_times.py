@@ -0,0 +1,59 @@
+import datetime
+from functools import lru_cache
+from typing import Tuple
+
+import pytz
+from astral import Observer
+from astral.sun import sun
+
+DEFAULT_TIMEZONE = "America/Denver"
+# South Side Flight Park; used when a station has no coordinates
+DEFAULT_LATITUDE = 40.5247
+DEFAULT_LONGITUDE = -111.8638
+
+
+@lru_cache(maxsize=64)
+def _tz(timezone: str) -> datetime.tzinfo:
+    return pytz.timezone(timezone)
+
+
+@lru_cache(maxsize=8192)
+def _sun_times(
+    latitude: float, longitude: float, date: datetime.date, timezone: str
+) -> Tuple[datetime.datetime, datetime.datetime]:
+    s = sun(Observer(latitude=latitude, longitude=longitude), date=date, tzinfo=timezone)
+    return s["sunrise"], s["sunset"]
+
+
+def get_sun_times(
+    latitude, longitude, date: datetime.date, timezone: str = DEFAULT_TIMEZONE
+) -> Tuple[datetime.datetime, datetime.datetime]:
+    """Return (sunrise, sunset) as aware datetimes in `timezone`, memoized per location and day.
+
+    Coordinates are rounded to 4 decimals (~10 m) so Decimal/str values from
+    Supabase and floats from config share cache entries.
+    """
+    return _sun_times(round(float(latitude), 4), round(float(longitude), 4), date, timezone)
+
+
+def precompute_year(latitude, longitude, year: int, timezone: str = DEFAULT_TIMEZONE) -> int:
+    """Warm the cache with every day of `year` for one location; returns the number of days."""
+    day = datetime.date(year, 1, 1)
+    days = 0
+    while day.year == year:
+        get_sun_times(latitude, longitude, day, timezone)
+        day += datetime.timedelta(days=1)
+        days += 1
+    return days
+
+
+def is_daytime(latitude, longitude, now: datetime.datetime, timezone: str = DEFAULT_TIMEZONE) -> bool:
+    """True between 10 minutes before sunrise and 30 minutes before sunset (`now` must be aware)."""
+    sunrise, sunset = get_sun_times(latitude, longitude, now.astimezone(_tz(timezone)).date(), timezone)
+    return sunrise - datetime.timedelta(minutes=10) < now < sunset - datetime.timedelta(minutes=30)
+
+
+def is_midday(latitude, longitude, now: datetime.datetime, timezone: str = DEFAULT_TIMEZONE) -> bool:
+    """True from 2 hours after sunrise until 3 hours before sunset (`now` must be aware)."""
+    sunrise, sunset = get_sun_times(latitude, longitude, now.astimezone(_tz(timezone)).date(), timezone)
+    return sunrise + datetime.timedelta(hours=2) < now < sunset - datetime.timedelta(hours=3)
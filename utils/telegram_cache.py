@@ -0,0 +1,117 @@
+import datetime
+import hashlib
+import logging
+import os
+import sqlite3
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Uploaded files are re-sent by file_id for this long
+FILE_ID_TTL = datetime.timedelta(days=1)
+# An identical message to the same chat within this window is treated as already delivered
+# (a retried run); anything that changes the text, such as a new observation, sends again
+MESSAGE_DEDUP_WINDOW = datetime.timedelta(hours=1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_ids (
+    content_hash TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sent_messages (
+    chat_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    PRIMARY KEY (chat_id, content_hash)
+);
+CREATE INDEX IF NOT EXISTS sent_messages_sent_at ON sent_messages (sent_at);
+"""
+
+
+def content_hash(content: Union[str, bytes]) -> str:
+    if isinstance(content, str):
+        content = content.encode()
+    return hashlib.sha256(content).hexdigest()
+
+
+def _now() -> float:
+    return datetime.datetime.now(datetime.timezone.utc).timestamp()
+
+
+class TelegramCache:
+    """Telegram file_ids by content hash and recently sent message hashes per chat.
+
+    Backed by SQLite in autocommit mode, so every send is recorded the moment
+    it succeeds: a run that dies half way and is retried skips the chats that
+    were already notified. Without a `path` the cache lives in memory. Any
+    SQLite error is logged and treated as a cache miss.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.path or ":memory:", isolation_level=None)
+            self.connection.executescript(SCHEMA)
+        return self.connection
+
+    def file_id(self, key: str) -> Optional[str]:
+        try:
+            row = self._connect().execute(
+                "SELECT file_id FROM file_ids WHERE content_hash = ? AND stored_at >= ?",
+                (key, _now() - FILE_ID_TTL.total_seconds()),
+            ).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Telegram cache lookup failed: {e}")
+            return None
+        return row[0] if row else None
+
+    def remember_file_id(self, key: str, file_id: str) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO file_ids (content_hash, file_id, stored_at) VALUES (?, ?, ?)",
+            (key, file_id, _now()),
+        )
+
+    def forget_file_id(self, key: str) -> None:
+        self._write("DELETE FROM file_ids WHERE content_hash = ?", (key,))
+
+    def was_sent(self, chat_id: str, key: str, window: datetime.timedelta = MESSAGE_DEDUP_WINDOW) -> bool:
+        try:
+            row = self._connect().execute(
+                "SELECT 1 FROM sent_messages WHERE chat_id = ? AND content_hash = ? AND sent_at >= ?",
+                (str(chat_id), key, _now() - window.total_seconds()),
+            ).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Telegram cache lookup failed: {e}")
+            return False
+        return row is not None
+
+    def record_sent(self, chat_id: str, key: str) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO sent_messages (chat_id, content_hash, sent_at) VALUES (?, ?, ?)",
+            (str(chat_id), key, _now()),
+        )
+
+    def evict(self) -> None:
+        """Drop file_ids and message hashes older than their TTLs."""
+        now = _now()
+        self._write("DELETE FROM file_ids WHERE stored_at < ?", (now - FILE_ID_TTL.total_seconds(),))
+        self._write(
+            "DELETE FROM sent_messages WHERE sent_at < ?", (now - MESSAGE_DEDUP_WINDOW.total_seconds(),)
+        )
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _write(self, sql: str, params: tuple) -> None:
+        try:
+            self._connect().execute(sql, params)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Telegram cache write failed: {e}")
@@ -0,0 +1,94 @@
+import datetime
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from utils.sun_times import get_sun_times
+
+# Fixed-hour windows used when a station has no coordinates / for the summer midday rule
+DAYTIME_HOURS = (6, 20)
+MIDDAY_HOURS = (11, 15)
+
+
+def as_utc(value) -> pd.Timestamp:
+    """`value` as a UTC Timestamp; naive values are taken to be UTC already."""
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp.tz_convert("UTC")
+
+
+def parse_minute_of_day(value) -> Optional[int]:
+    """Parse a TIME value ("22:00", "22:00:00", datetime.time) into minutes after midnight."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime.time):
+        return value.hour * 60 + value.minute
+    hours, minutes = str(value).split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+class TimeContext:
+    """"Now" for one run, resolved once per distinct timezone.
+
+    Every check in a run sees the same instant, and pytz lookups plus
+    localization happen once per timezone instead of once per user x station.
+    """
+
+    def __init__(self, now_utc: Optional[datetime.datetime] = None):
+        self.now_utc = now_utc or datetime.datetime.now(pytz.UTC)
+        self._local: Dict[str, datetime.datetime] = {}
+
+    def local_now(self, timezone: str) -> datetime.datetime:
+        local = self._local.get(timezone)
+        if local is None:
+            local = self._local[timezone] = self.now_utc.astimezone(pytz.timezone(timezone))
+        return local
+
+    def minute_of_day(self, timezone: str) -> int:
+        local = self.local_now(timezone)
+        return local.hour * 60 + local.minute
+
+
+def in_quiet_hours(minute: int, start: Optional[int], end: Optional[int]) -> bool:
+    """True if `minute` falls in [start, end]; windows with start > end wrap past midnight."""
+    if start is None or end is None:
+        return False
+    if start < end:
+        return start <= minute <= end
+    return minute >= start or minute <= end
+
+
+def quiet_hours_mask(minutes, starts, ends) -> np.ndarray:
+    """Vectorized `in_quiet_hours`; a negative start or end means no quiet hours."""
+    minutes, starts, ends = np.broadcast_arrays(
+        np.asarray(minutes), np.asarray(starts), np.asarray(ends)
+    )
+    configured = (starts >= 0) & (ends >= 0)
+    same_day = (starts < ends) & (minutes >= starts) & (minutes <= ends)
+    wraps = (starts >= ends) & ((minutes >= starts) | (minutes <= ends))
+    return configured & (same_day | wraps)
+
+
+def hour_window_mask(hours, window) -> np.ndarray:
+    """True where `hours` lies within the inclusive (first, last) hour window."""
+    hours = np.asarray(hours)
+    return (hours >= window[0]) & (hours <= window[1])
+
+
+def sun_daytime_mask(latitude, longitude, local_times: pd.DatetimeIndex, timezone: str) -> np.ndarray:
+    """Vectorized sun-based daytime check (sunrise-10m to sunset-30m) for aware local times.
+
+    Sun times are looked up once per distinct date through the sun-times cache.
+    """
+    dates = local_times.normalize()
+    unique_dates = dates.unique()
+    sunrise = {}
+    sunset = {}
+    for day in unique_dates:
+        rise, set_ = get_sun_times(latitude, longitude, day.date(), timezone)
+        sunrise[day] = pd.Timestamp(rise) - pd.Timedelta(minutes=10)
+        sunset[day] = pd.Timestamp(set_) - pd.Timedelta(minutes=30)
+    starts = pd.DatetimeIndex(dates.map(sunrise))
+    ends = pd.DatetimeIndex(dates.map(sunset))
+    return np.asarray((local_times > starts) & (local_times < ends))
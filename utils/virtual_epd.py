@@ -0,0 +1,69 @@
+import time
+
+from PIL import Image
+
+# Same resolution as configs/epd7in5_V2.py
+EPD_WIDTH = 800
+EPD_HEIGHT = 480
+
+
+class VirtualEPD:
+    """Headless stand-in for `configs.epd7in5_V2.EPD`.
+
+    Exposes the same methods the e-ink code calls (`init`, `getbuffer`, `display`,
+    `Clear`, `sleep`) but keeps the last packed buffer in memory instead of sending
+    it over SPI, so frames can be exported as PNG and compared or benchmarked on
+    any machine. `transfer_delay_s` optionally simulates the SPI transfer time.
+    """
+
+    def __init__(self, width=EPD_WIDTH, height=EPD_HEIGHT, transfer_delay_s=0.0):
+        self.width = width
+        self.height = height
+        self.transfer_delay_s = transfer_delay_s
+        self.buffer = None
+        self.frames_displayed = 0
+        self.asleep = True
+
+    def init(self):
+        self.asleep = False
+        return 0
+
+    def getbuffer(self, image):
+        """Pack an image exactly like EPD.getbuffer: 1 bit per pixel, MSB first, 0 = black.
+
+        Portrait images (height x width) are rotated into the panel's landscape
+        orientation the same way the driver maps `newx = y, newy = height - x - 1`.
+        """
+        image_monocolor = image.convert('1')
+        imwidth, imheight = image_monocolor.size
+        if imwidth == self.height and imheight == self.width:
+            image_monocolor = image_monocolor.transpose(Image.Transpose.ROTATE_90)
+        elif not (imwidth == self.width and imheight == self.height):
+            return [0xFF] * (int(self.width / 8) * self.height)
+        return list(image_monocolor.tobytes())
+
+    def display(self, image):
+        # The driver sends the inverted byte stream; do the same work so transfer timing is comparable.
+        self.buffer = bytes(~byte & 0xFF for byte in image)
+        if self.transfer_delay_s:
+            time.sleep(self.transfer_delay_s)
+        self.frames_displayed += 1
+
+    def Clear(self):
+        self.buffer = bytes(int(self.width * self.height / 8))
+
+    def sleep(self):
+        self.asleep = True
+
+    def to_image(self, portrait=True):
+        """Return the last displayed frame as a 1-bit image (portrait = as drawn)."""
+        if self.buffer is None:
+            raise ValueError("Nothing has been displayed yet")
+        packed = bytes(~byte & 0xFF for byte in self.buffer)
+        image = Image.frombytes('1', (self.width, self.height), packed)
+        if portrait:
+            image = image.transpose(Image.Transpose.ROTATE_270)
+        return image
+
+    def save_png(self, path, portrait=True):
+        self.to_image(portrait=portrait).save(path, format='PNG')
@@ -1,11 +1,19 @@
 import datetime
 import json
+from functools import reduce
+import numpy as np
 import pandas as pd
 import requests
 import pytz
 import os
-from astral import LocationInfo
-from astral.sun import sun
+
+from utils.sun_times import (
+    DEFAULT_LATITUDE,
+    DEFAULT_LONGITUDE,
+    DEFAULT_TIMEZONE,
+    is_daytime,
+    is_midday,
+)
 
 # Try to import config, fallback to environment variables
 try:
@@ -27,6 +35,11 @@ except ImportError:
     
     config = Config()
 
+# Shared HTTP session so long-lived callers (the e-ink worker) reuse connections
+SESSION = requests.Session()
+# Upper bound for any single Synoptic request so a stalled network call can't hang a cycle
+REQUEST_TIMEOUT_SECONDS = 30
+
 def get_station_data_by_id(station_id: str, lookback_minutes: int = 30, api_config: dict = None) -> pd.DataFrame:
     """
     Get weather data for any Synoptic station by station ID
@@ -51,7 +64,7 @@ def get_station_data_by_id(station_id: str, lookback_minutes: int = 30, api_conf
             f"&state=ut&units=english&obtimezone=LOCAL"
         )
         
-        response = requests.get(request_string)
+        response = SESSION.get(request_string, timeout=REQUEST_TIMEOUT_SECONDS)
         response.raise_for_status()
         
         wdata = json.loads(response.text)
@@ -84,22 +97,46 @@ def get_station_data_by_id(station_id: str, lookback_minutes: int = 30, api_conf
         print(f"Error getting data for station {station_id}: {e}")
         return pd.DataFrame()
 
-def format_message(station_data, rows=6, html=True):
-    station_data["wind_cardinal_direction_set_1d"].fillna("-", inplace=True)
-    if html:
-        message = "<pre>"  # ""TIME  |  WIND SPEEDgGUST | WIND DIRECTION \n"
-    else:
-        message = "       Speed   Dir \n"
-    for index, row in station_data.tail(rows).iloc[::-1].iterrows():
-        message += "{:%H:%M} {:>3.0f}g{:<2.0f}   {:<5} \n".format(
-            row["date_time"],
-            row["wind_speed_set_1"],
-            row["wind_gust_set_1"],
-            row["wind_cardinal_direction_set_1d"],
-        )
-    if html:
-        message += "</pre>"
-    return message
+# Text wrapped around the observation rows for each output format
+MESSAGE_FORMATS = {
+    "html": ("<pre>", "</pre>"),  # TIME  |  WIND SPEEDgGUST | WIND DIRECTION
+    "markdown": ("```\n", "```"),
+    "plain": ("", ""),
+    "eink": ("       Speed   Dir \n", ""),
+}
+
+
+def format_message(station_data, rows=6, html=True, message_format=None):
+    """Format the latest `rows` observations, newest first, as a fixed-width table.
+
+    `message_format` is a key of MESSAGE_FORMATS; when omitted, `html` chooses
+    between "html" and the e-ink layout. Columns are formatted in bulk and the
+    caller's DataFrame is never modified.
+    """
+    if message_format is None:
+        message_format = "html" if html else "eink"
+    header, footer = MESSAGE_FORMATS[message_format]
+    latest = station_data.tail(rows)
+    if len(latest) == 0:
+        return header + footer
+
+    date_times = latest["date_time"]
+    if date_times.dt.tz is not None:
+        date_times = date_times.dt.tz_localize(None)  # keep local wall-clock time
+    date_times = date_times.to_numpy()[::-1]  # newest first
+    minute_of_day = (date_times - date_times.astype("datetime64[D]")) // np.timedelta64(1, "m")
+    hours = np.char.zfill((minute_of_day // 60).astype(str), 2)
+    minutes = np.char.zfill((minute_of_day % 60).astype(str), 2)
+    speeds = np.char.mod("%3.0f", latest["wind_speed_set_1"].to_numpy(dtype=float)[::-1])
+    gusts = np.char.mod("%-2.0f", latest["wind_gust_set_1"].to_numpy(dtype=float)[::-1])
+    directions = np.char.ljust(
+        latest["wind_cardinal_direction_set_1d"].fillna("-").to_numpy(dtype=str)[::-1], 5
+    )
+    lines = reduce(
+        np.char.add,
+        [hours, ":", minutes, " ", speeds, "g", gusts, "   ", directions, " \n"],
+    )
+    return header + "".join(lines.tolist()) + footer
 
 
 def get_station_data(lookback_minutes=30):
@@ -107,19 +144,36 @@ def get_station_data(lookback_minutes=30):
         token=config.token, lookback_minutes=lookback_minutes
     )
 
-    page = requests.get(request_string)
+    page = SESSION.get(request_string, timeout=REQUEST_TIMEOUT_SECONDS)
     wdata = json.loads(page.text)
-    latest_recordings_df = pd.DataFrame(wdata["STATION"][0]["OBSERVATIONS"])
+    return parse_synoptic_response(wdata)
+
+
+def parse_synoptic_response(wdata, station_index=0):
+    """Turn a Synoptic timeseries response (parsed JSON) into the observations DataFrame"""
+    latest_recordings_df = pd.DataFrame(wdata["STATION"][station_index]["OBSERVATIONS"])
     latest_recordings_df["date_time"] = pd.to_datetime(
         latest_recordings_df.date_time.str[:-5]
     )
-    latest_recordings_df["wind_speed_set_1"] *= 1.15078  # kph to mph
-    latest_recordings_df["wind_gust_set_1"] *= 1.15078
+    # Measured values are numeric; a variable that was null throughout (e.g. calm ASOS gusts) would stay object
+    for column in latest_recordings_df.columns:
+        if column.endswith("_set_1"):
+            latest_recordings_df[column] = pd.to_numeric(latest_recordings_df[column], errors="coerce")
+    # kph to mph; gusts are missing from some stations' responses
+    for column in ("wind_speed_set_1", "wind_gust_set_1"):
+        if column in latest_recordings_df.columns:
+            latest_recordings_df[column] *= 1.15078
     return latest_recordings_df
 
 
-def check_wind(station_data):
-    last_3_wind_speeds = station_data.tail(3)[["wind_speed_set_1"]]
+def load_station_data_fixture(path):
+    """Load a recorded Synoptic timeseries JSON file into the observations DataFrame"""
+    with open(path) as fixture:
+        return parse_synoptic_response(json.load(fixture))
+
+
+def check_wind(station_data, readings=3):
+    last_3_wind_speeds = station_data.tail(readings)[["wind_speed_set_1"]]
     wind_bottom_value = 8.5
     wind_top_value = 16
     wind_speed_is_acceptable = (
@@ -131,7 +185,7 @@ def check_wind(station_data):
         .iloc[0]
     )
 
-    last_3_wind_directions = station_data.tail(3)[["wind_direction_set_1"]]
+    last_3_wind_directions = station_data.tail(readings)[["wind_direction_set_1"]]
     bottom_wind_dir_value = 130
     top_win_dir_value = 180
     wind_dir_is_acceptable = (
@@ -146,61 +200,32 @@ def check_wind(station_data):
     return wind_is_acceptable, wind_dir_is_acceptable, wind_speed_is_acceptable
 
 
-def check_rain(station_data):
-    last_3_rain_readings = station_data.tail(3)[["precip_accum_five_minute_set_1"]]
+def check_rain(station_data, readings=3):
+    last_3_rain_readings = station_data.tail(readings)[["precip_accum_five_minute_set_1"]]
     has_rained_recently = (last_3_rain_readings > 0).any().iloc[0]
     return has_rained_recently
 
 
-def check_for_strong_gusts(station_data):
+def check_for_strong_gusts(station_data, readings=3):
     last_3_gust_readings = (
-        station_data.tail(3)["wind_gust_set_1"]
-        - station_data.tail(3)["wind_speed_set_1"]
+        station_data.tail(readings)["wind_gust_set_1"]
+        - station_data.tail(readings)["wind_speed_set_1"]
     )
     gust_limit = 5
     gust_over_limit = (last_3_gust_readings > gust_limit).any()
     return gust_over_limit
 
 
-def check_daytime():
-    current_time = datetime.datetime.now(pytz.timezone("America/Denver"))
-    loc = LocationInfo(
-        "Salt Lake City",
-        region="UT, USA",
-        timezone="US/Mountain",
-        latitude=40.5247,
-        longitude=-111.8638,
-    )
-    s = sun(loc.observer, date=current_time, tzinfo="US/Mountain")
-    approx_sunrise = (s["sunrise"] - datetime.timedelta(minutes=10)).replace(
-        tzinfo=pytz.timezone("America/Denver")
-    )
-    approx_sunset = (s["sunset"] - datetime.timedelta(minutes=30)).replace(
-        tzinfo=pytz.timezone("America/Denver")
-    )
-    is_daytime = approx_sunrise < current_time < approx_sunset
-    return is_daytime
+def check_daytime(latitude=DEFAULT_LATITUDE, longitude=DEFAULT_LONGITUDE, timezone=DEFAULT_TIMEZONE):
+    """Returns True between ~10 minutes before sunrise and 30 minutes before sunset at the given location"""
+    current_time = datetime.datetime.now(pytz.timezone(timezone))
+    return is_daytime(latitude, longitude, current_time, timezone)
 
 
-def check_midday():
+def check_midday(latitude=DEFAULT_LATITUDE, longitude=DEFAULT_LONGITUDE, timezone=DEFAULT_TIMEZONE):
     """Returns True if it's either over 2 hours after sunrise and over 3 hours before sunset"""
-    current_time = datetime.datetime.now()
-    loc = LocationInfo(
-        "Salt Lake City",
-        region="UT, USA",
-        timezone="US/Mountain",
-        latitude=40.5247,
-        longitude=-111.8638,
-    )
-    s = sun(loc.observer, date=current_time, tzinfo="US/Mountain")
-    two_h_after_sunrise = (s["sunrise"] + datetime.timedelta(hours=2)).replace(
-        tzinfo=pytz.timezone("America/Denver")
-    )
-    three_h_before_sunset = (s["sunset"] - datetime.timedelta(hours=3)).replace(
-        tzinfo=pytz.timezone("America/Denver")
-    )
-    is_midday = two_h_after_sunrise < current_time < three_h_before_sunset
-    return is_midday
+    current_time = datetime.datetime.now(pytz.timezone(timezone))
+    return is_midday(latitude, longitude, current_time, timezone)
 
 
 def check_all_conditions(station_data, winter):